@@ -1,12 +1,11 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager, current_user
 from flask_cors import CORS
 from .config import Config
 
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 
@@ -18,7 +17,10 @@ def create_app(config_class=Config):
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    # Flask-Migrate pulls in alembic and only serves `flask db`; web workers never load it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     login_manager.init_app(app)
 
     # Import models to ensure they are known to Flask-Migrate
@@ -38,16 +40,29 @@ def create_app(config_class=Config):
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(business_bp)
     app.register_blueprint(admin_bp)
+
+    from .commands import register_commands
+    register_commands(app)
+
+    from .utils.rollups import register_listeners
+    register_listeners()
+
+    from .utils import compression, metrics, profiler, query_accounting, serving, static_assets
+    serving.init_app(app)
+    compression.init_app(app)
+    metrics.init_app(app)
+    query_accounting.init_app(app)
+    profiler.init_app(app)
+    static_assets.init_app(app)
     
     @app.context_processor
     def inject_settings():
         from .models.user import SystemSetting
-        app_name_setting = SystemSetting.query.filter_by(key='app_name').first()
-        logo_url_setting = SystemSetting.query.filter_by(key='logo_url').first()
+        settings = {s.key: s.value for s in SystemSetting.query.filter(SystemSetting.key.in_(('app_name', 'logo_url')))}
         
         return {
-            'app_name': app_name_setting.value if app_name_setting else 'POS',
-            'logo_url': logo_url_setting.value if logo_url_setting else '',
+            'app_name': settings.get('app_name', 'POS'),
+            'logo_url': settings.get('logo_url', ''),
             'current_user': current_user
         }
 
@@ -0,0 +1,170 @@
+import json
+import sys
+
+import click
+from flask import current_app
+
+
+def register_commands(app):
+    """
+    Register project CLI commands (`flask <command>`).
+    """
+
+    @app.cli.command('export-data')
+    @click.option('--format', 'fmt', default='csv', type=click.Choice(['csv', 'jsonl', 'parquet']),
+                  help='Output format.')
+    @click.option('--output', '-o', default='-', help='Output file, "-" for stdout.')
+    @click.option('--gzip', 'use_gzip', is_flag=True, help='Gzip the output on the fly (csv/jsonl).')
+    @click.option('--keyword', default='', help='Filter by keyword/title/content.')
+    @click.option('--source', default='', help='Filter by source.')
+    @click.option('--date-from', default='', help='Created at or after (YYYY-MM-DD).')
+    @click.option('--date-to', default='', help='Created on or before (YYYY-MM-DD).')
+    @click.option('--batch-size', default=None, type=int, help='Rows fetched per round trip.')
+    def export_data(fmt, output, use_gzip, keyword, source, date_from, date_to, batch_size):
+        """Stream OpinionData joined with OpinionDetail to a file."""
+        from app.utils.exporter import (ExportError, build_export_query, check_format,
+                                        export_stream, iter_export_rows)
+
+        compress = 'gzip' if use_gzip else None
+        try:
+            check_format(fmt)
+            stmt = build_export_query(keyword=keyword, source=source,
+                                      date_from=date_from, date_to=date_to)
+        except ExportError as e:
+            raise click.ClickException(str(e))
+
+        batch_size = batch_size or current_app.config['EXPORT_BATCH_SIZE']
+        chunks = export_stream(fmt, iter_export_rows(stmt, batch_size=batch_size), compress=compress)
+
+        out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        if output != '-':
+            click.echo(f'Exported to {output}', err=True)
+
+    @app.cli.command('import-data')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+    @click.option('--format', 'fmt', default=None, type=click.Choice(['ndjson', 'csv']),
+                  help='Input format (guessed from the file name by default).')
+    @click.option('--keyword', default=None, help='Keyword for records that carry none.')
+    @click.option('--chunk-size', default=None, type=int, help='Rows per de-dup/insert statement.')
+    @click.option('--rejects', 'rejects_path', default=None, help='Write the reported rejects as NDJSON here.')
+    def import_data(path, fmt, keyword, chunk_size, rejects_path):
+        """Stream an NDJSON/CSV archive (optionally .gz) into OpinionData."""
+        from app.utils.importer import guess_format, import_records, iter_records
+
+        fmt = fmt or guess_format(path)
+        chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+        commit_chunks = current_app.config['IMPORT_COMMIT_CHUNKS']
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        stats = None
+        try:
+            records = iter_records(stream, fmt, path)
+            for stats in import_records(records, chunk_size=chunk_size,
+                                        commit_chunks=commit_chunks, default_keyword=keyword):
+                click.echo(f"processed={stats.processed} inserted={stats.inserted} "
+                           f"duplicates={stats.duplicates} rejected={stats.rejected}", err=True)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        if rejects_path and stats:
+            with open(rejects_path, 'w', encoding='utf-8') as f:
+                for reject in stats.rejects:
+                    f.write(json.dumps(reject, ensure_ascii=False) + '\n')
+        click.echo(json.dumps(stats.to_dict(), ensure_ascii=False))
+
+    @app.cli.command('sentiment-backfill')
+    @click.option('--all', 'rescore_all', is_flag=True, help='Rescore rows that already have a score.')
+    @click.option('--workers', default=None, type=int, help='Worker processes (0 = inline).')
+    @click.option('--batch-size', default=2000, type=int, help='Rows per worker batch.')
+    def sentiment_backfill(rescore_all, workers, batch_size):
+        """Compute lexicon sentiment scores for stored OpinionData rows."""
+        from app.utils.sentiment import backfill_sentiment
+
+        total = backfill_sentiment(only_missing=not rescore_all, batch_size=batch_size, workers=workers,
+                                   progress=lambda n: click.echo(f'scored={n}', err=True))
+        click.echo(f'Scored {total} rows')
+
+    @app.cli.command('reindex-keywords')
+    @click.option('--batch-size', default=1000, type=int, help='Documents per batch.')
+    def reindex_keywords(batch_size):
+        """Rebuild the TF-IDF keyword index from scratch."""
+        from app.utils.keyword_index import rebuild_index
+
+        total = rebuild_index(batch_size=batch_size, progress=lambda n: click.echo(f'indexed={n}', err=True))
+        click.echo(f'Indexed {total} documents')
+
+    @app.cli.command('reextract')
+    @click.option('--rule-id', default=None, type=int, help='Only items of this rule\'s site.')
+    @click.option('--workers', default=None, type=int, help='Worker processes (0 = inline).')
+    @click.option('--batch-size', default=200, type=int, help='Items per worker batch and commit.')
+    @click.option('--dry-run', is_flag=True, help='Report what would change without writing.')
+    def reextract_command(rule_id, workers, batch_size, dry_run):
+        """Re-run scraping rules over archived pages, without refetching."""
+        from app.utils.page_archive import get_archive
+        from app.utils.reextract import reextract
+
+        archive = get_archive(current_app)
+        if archive is None:
+            raise click.ClickException('PAGE_ARCHIVE_DIR is not set')
+        try:
+            stats = reextract(archive, rule_id=rule_id, batch_size=batch_size, workers=workers, dry_run=dry_run,
+                              progress=lambda s: click.echo(f"scanned={s['scanned']} archived={s['archived']} "
+                                                            f"updated={s['updated']}", err=True))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(stats))
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--batch-size', default=5000, type=int, help='Rows read per batch.')
+    def rebuild_rollups_command(batch_size):
+        """Recompute the dashboard rollups from OpinionData."""
+        from app.utils.rollups import rebuild_rollups
+
+        total = rebuild_rollups(batch_size=batch_size, progress=lambda n: click.echo(f'counted={n}', err=True))
+        click.echo(f'Rolled up {total} items')
+
+    @app.cli.command('build-static')
+    @click.option('--clean', is_flag=True, help='Remove earlier builds first.')
+    def build_static_command(clean):
+        """Fingerprint and precompress app/static into STATIC_BUILD_DIR."""
+        import shutil
+        from app.utils.static_assets import brotli, build
+
+        build_dir = current_app.config['STATIC_BUILD_DIR']
+        if not build_dir:
+            raise click.ClickException('STATIC_BUILD_DIR is not set')
+        if clean:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        manifest = build(current_app.static_folder, build_dir)
+        click.echo(f"Built {len(manifest['files'])} files ({len(manifest['encodings'])} precompressed, "
+                   f"brotli {'on' if brotli is not None else 'off'}) into {build_dir}")
+
+    @app.cli.command('import-report')
+    @click.option('--top', default=25, type=int, help='Modules to list.')
+    @click.option('--sort', 'sort_by', default='cumulative', type=click.Choice(['cumulative', 'self']),
+                  help='Order by time including (cumulative) or excluding (self) sub-imports.')
+    @click.option('--statement', default=None, help='Python statement to time (default: create_app()).')
+    def import_report_command(top, sort_by, statement):
+        """Time the imports of a fresh app start with python -X importtime."""
+        from app.utils.import_report import STARTUP_STATEMENT, heavy_loaded, run_importtime, total_us
+
+        try:
+            timings = run_importtime(statement or STARTUP_STATEMENT)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        key = (lambda t: t.cumulative_us) if sort_by == 'cumulative' else (lambda t: t.self_us)
+        click.echo(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for timing in sorted(timings, key=key, reverse=True)[:top]:
+            click.echo(f'{timing.self_us / 1000:9.1f} {timing.cumulative_us / 1000:9.1f}  '
+                       f"{'  ' * timing.depth}{timing.module}")
+        click.echo(f'{len(timings)} modules imported in {total_us(timings) / 1000:.1f} ms')
+        heavy = heavy_loaded(timings)
+        if heavy:
+            click.echo(f"Loaded at startup: {', '.join(heavy)}", err=True)
@@ -5,3 +5,98 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(os.getcwd(), 'app_v2.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Rows fetched per round trip when streaming warehouse exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Bulk import: rows per de-dup/insert statement, and statements per transaction
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+    IMPORT_COMMIT_CHUNKS = int(os.environ.get('IMPORT_COMMIT_CHUNKS', 20))
+
+    # Auto-save on /business/analysis: scraped items de-duplicated, inserted and committed at once
+    # (a batch also closes at the end of each result page)
+    AUTOSAVE_BATCH_SIZE = int(os.environ.get('AUTOSAVE_BATCH_SIZE', 50))
+
+    # AI analysis: in-flight requests per engine and per-request timeout (seconds)
+    AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', 4))
+    AI_REQUEST_TIMEOUT = int(os.environ.get('AI_REQUEST_TIMEOUT', 60))
+
+    # Background task threads and topic clustering feature size
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 2))
+    TOPIC_HASH_DIMS = int(os.environ.get('TOPIC_HASH_DIMS', 4096))
+
+    # Burst detection: bucket length (seconds), buckets per sliding window, EWMA smoothing,
+    # z-score threshold and minimum bucket count that may be flagged
+    BURST_BUCKET_SECONDS = int(os.environ.get('BURST_BUCKET_SECONDS', 60))
+    BURST_WINDOW_BUCKETS = int(os.environ.get('BURST_WINDOW_BUCKETS', 60))
+    BURST_ALPHA = float(os.environ.get('BURST_ALPHA', 0.1))
+    BURST_THRESHOLD = float(os.environ.get('BURST_THRESHOLD', 3.0))
+    BURST_MIN_COUNT = int(os.environ.get('BURST_MIN_COUNT', 5))
+
+    # Map-reduce summarization: token budget per chunk sent to the model
+    SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 1500))
+
+    # Scraper search endpoints and the pause between result pages (seconds); load tests
+    # point the endpoints at benchmarks/fake_server.py
+    SCRAPER_BAIDU_URL = os.environ.get('SCRAPER_BAIDU_URL', 'https://www.baidu.com/s')
+    SCRAPER_SOHU_URL = os.environ.get('SCRAPER_SOHU_URL', 'https://www.sohu.com/web')
+    SCRAPER_PAGE_DELAY_MIN = float(os.environ.get('SCRAPER_PAGE_DELAY_MIN', 1.0))
+    SCRAPER_PAGE_DELAY_MAX = float(os.environ.get('SCRAPER_PAGE_DELAY_MAX', 2.0))
+
+    # Raw page archive written on every deep crawl fetch (empty disables it), and the
+    # segment size at which it rolls over to a new file (MB)
+    PAGE_ARCHIVE_DIR = os.environ.get('PAGE_ARCHIVE_DIR', os.path.join(os.getcwd(), 'page_archive'))
+    PAGE_ARCHIVE_SEGMENT_MB = int(os.environ.get('PAGE_ARCHIVE_SEGMENT_MB', 256))
+
+    # Deep crawl pipeline: fetch threads, parse processes (0 parses in the request thread),
+    # fetched pages waiting for a parser, and search redirect links resolved at once per page
+    CRAWL_FETCH_WORKERS = int(os.environ.get('CRAWL_FETCH_WORKERS', 8))
+    CRAWL_PARSE_WORKERS = int(os.environ.get('CRAWL_PARSE_WORKERS', os.cpu_count() or 1))
+    CRAWL_QUEUE_SIZE = int(os.environ.get('CRAWL_QUEUE_SIZE', 32))
+    SCRAPER_RESOLVE_WORKERS = int(os.environ.get('SCRAPER_RESOLVE_WORKERS', 8))
+
+    # Cover image proxy: thumbnail cache directory (empty sends /business/cover to the original
+    # URLs), its size limit (MB), largest image fetched (MB), fetch timeout (seconds), how long a
+    # failed cover is not retried (seconds), browser cache lifetime (seconds), and prefetch threads
+    # (0 disables prefetching) with the covers they may have queued. Private and loopback hosts
+    # are refused unless COVER_ALLOW_PRIVATE_HOSTS is set (e.g. for benchmarks/fake_server.py)
+    COVER_CACHE_DIR = os.environ.get('COVER_CACHE_DIR', os.path.join(os.getcwd(), 'cover_cache'))
+    COVER_CACHE_MB = int(os.environ.get('COVER_CACHE_MB', 512))
+    COVER_MAX_IMAGE_MB = int(os.environ.get('COVER_MAX_IMAGE_MB', 5))
+    COVER_FETCH_TIMEOUT = int(os.environ.get('COVER_FETCH_TIMEOUT', 10))
+    COVER_RETRY_SECONDS = int(os.environ.get('COVER_RETRY_SECONDS', 600))
+    COVER_MAX_AGE = int(os.environ.get('COVER_MAX_AGE', 30 * 24 * 3600))
+    COVER_PREFETCH_WORKERS = int(os.environ.get('COVER_PREFETCH_WORKERS', 2))
+    COVER_PREFETCH_QUEUE = int(os.environ.get('COVER_PREFETCH_QUEUE', 500))
+    COVER_ALLOW_PRIVATE_HOSTS = os.environ.get('COVER_ALLOW_PRIVATE_HOSTS', '').lower() in ('1', 'true', 'yes')
+
+    # Fingerprinted, precompressed copies of app/static (empty serves app/static as is) and
+    # the browser cache lifetime of the fingerprinted URLs (seconds)
+    STATIC_BUILD_DIR = os.environ.get('STATIC_BUILD_DIR', os.path.join(os.getcwd(), 'static_build'))
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 365 * 24 * 3600))
+
+    # JSON/NDJSON response compression: gzip level (brotli quality when installed; 0 turns it
+    # off) and the smallest whole response compressed (bytes; streams are always compressed)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 500))
+
+    # Production serving (wsgi.py, gunicorn.conf.py): how long open streams keep running after
+    # SIGTERM or a worker recycle before they are cut short at their next event (seconds)
+    SHUTDOWN_DRAIN_SECONDS = int(os.environ.get('SHUTDOWN_DRAIN_SECONDS', 30))
+
+    # Bearer token required by /metrics (empty leaves it open to the scraper)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    # Request profiler: share of requests profiled at random (0 leaves only admin requests
+    # with the X-Profile header or ?_profile=), stack sampling interval (ms), where profiles
+    # are written and how many are kept
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+    PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(os.getcwd(), 'profiles'))
+    PROFILER_KEEP = int(os.environ.get('PROFILER_KEEP', 200))
+
+    # Query accounting: a statement shape run this many times in one request is logged as a
+    # likely N+1 with its traceback, and so is a request running more statements than the
+    # budget (0 turns either check off)
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 10))
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 100))
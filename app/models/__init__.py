@@ -3,3 +3,9 @@ from .business import Business
 from .opinion import OpinionData, OpinionDetail
 from .rule import ScrapingRule
 from .ai_engine import AIEngine
+from .analysis import AnalysisResult, SummaryChunk
+from .keyword import IndexTerm, IndexPosting, IndexDocument
+from .topic import TopicModel, TopicCluster
+from .rollup import OpinionRollup
+from .table_version import TableVersion
+from .task import BackgroundTask
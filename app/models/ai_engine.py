@@ -10,6 +10,8 @@ class AIEngine(db.Model):
     api_key = db.Column(db.String(256), nullable=False)
     model_name = db.Column(db.String(64), nullable=False) # e.g., gpt-4, gpt-3.5-turbo
     is_active = db.Column(db.Boolean, default=True)
+    max_concurrency = db.Column(db.Integer, nullable=True, comment='In-flight request cap, empty for AI_MAX_CONCURRENCY')
+    weight = db.Column(db.Integer, nullable=False, default=1, server_default='1', comment='Relative share of routed requests')
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -21,6 +23,8 @@ class AIEngine(db.Model):
             'api_key': self.api_key, # Security warning: usually shouldn't expose this
             'model_name': self.model_name,
             'is_active': self.is_active,
+            'max_concurrency': self.max_concurrency,
+            'weight': self.weight,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
         }
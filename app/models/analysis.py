@@ -0,0 +1,60 @@
+from app import db
+from datetime import datetime
+import json
+
+class AnalysisResult(db.Model):
+    __tablename__ = 'analysis_results'
+    __table_args__ = (
+        # Cache key: identical content analysed by the same model and prompt is never re-billed
+        db.Index('ix_analysis_results_cache_key', 'model_name', 'prompt_version', 'content_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    opinion_id = db.Column(db.Integer, db.ForeignKey('opinion_data.id'), nullable=False, index=True)
+    engine_id = db.Column(db.Integer, db.ForeignKey('ai_engines.id', ondelete='SET NULL'), nullable=True)
+    model_name = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    sentiment = db.Column(db.String(16), nullable=True, comment='positive/neutral/negative')
+    summary = db.Column(db.Text, nullable=True)
+    tags = db.Column(db.Text, nullable=True, comment='JSON list')
+    prompt_tokens = db.Column(db.Integer, nullable=True)
+    completion_tokens = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    def tag_list(self):
+        try:
+            return json.loads(self.tags) if self.tags else []
+        except ValueError:
+            return []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'opinion_id': self.opinion_id,
+            'engine_id': self.engine_id,
+            'model_name': self.model_name,
+            'prompt_version': self.prompt_version,
+            'sentiment': self.sentiment,
+            'summary': self.summary,
+            'tags': self.tag_list(),
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+class SummaryChunk(db.Model):
+    __tablename__ = 'summary_chunks'
+    __table_args__ = (
+        # One summary per chunk text, model and prompt; edited articles only miss on changed chunks
+        db.Index('ix_summary_chunks_cache_key', 'model_name', 'prompt_version', 'stage', 'content_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    model_name = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    stage = db.Column(db.String(8), nullable=False, comment='map/reduce')
+    content_hash = db.Column(db.String(64), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    prompt_tokens = db.Column(db.Integer, nullable=True)
+    completion_tokens = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
@@ -0,0 +1,25 @@
+from app import db
+from datetime import datetime
+
+class IndexTerm(db.Model):
+    __tablename__ = 'index_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    df = db.Column(db.Integer, nullable=False, default=0, comment='Document frequency')
+
+class IndexPosting(db.Model):
+    __tablename__ = 'index_postings'
+
+    term_id = db.Column(db.Integer, db.ForeignKey('index_terms.id'), primary_key=True)
+    opinion_id = db.Column(db.Integer, db.ForeignKey('opinion_data.id'), primary_key=True, index=True)
+    tf = db.Column(db.Integer, nullable=False, default=1)
+
+class IndexDocument(db.Model):
+    __tablename__ = 'index_documents'
+
+    opinion_id = db.Column(db.Integer, db.ForeignKey('opinion_data.id'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    vector = db.Column(db.Text, nullable=True, comment='Top TF-IDF weights, L2-normalized JSON {term_id: weight}')
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
@@ -8,13 +8,16 @@ class OpinionData(db.Model):
     keyword = db.Column(db.String(128), nullable=True)
     title = db.Column(db.String(512), nullable=False)
     url = db.Column(db.String(1024), nullable=True)
-    original_url = db.Column(db.String(1024), nullable=True)
+    original_url = db.Column(db.String(1024), nullable=True, index=True)
     source = db.Column(db.String(128), nullable=True)
     cover_url = db.Column(db.String(1024), nullable=True)
     content = db.Column(db.Text, nullable=True)
     is_deep_crawled = db.Column(db.Boolean, default=False)
+    sentiment_score = db.Column(db.Float, nullable=True, index=True, comment='Lexicon sentiment in [-1, 1]')
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic_clusters.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    # Indexed for the list version read by app/utils/http_cache.py
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
     def to_dict(self):
         return {
@@ -26,6 +29,8 @@ class OpinionData(db.Model):
             'cover_url': self.cover_url,
             'content': self.content,
             'is_deep_crawled': self.is_deep_crawled,
+            'sentiment_score': self.sentiment_score,
+            'topic_id': self.topic_id,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
 
@@ -0,0 +1,18 @@
+from app import db
+
+class OpinionRollup(db.Model):
+    __tablename__ = 'opinion_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket', 'keyword', 'source', name='uq_opinion_rollups_key'),
+        db.Index('ix_opinion_rollups_series', 'granularity', 'keyword', 'bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False, comment='hour/day')
+    bucket = db.Column(db.DateTime, nullable=False, comment='Bucket start')
+    keyword = db.Column(db.String(128), nullable=False, default='')
+    source = db.Column(db.String(128), nullable=False, default='')
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    deep_count = db.Column(db.Integer, nullable=False, default=0)
+    sentiment_sum = db.Column(db.Float, nullable=False, default=0.0)
+    sentiment_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,8 @@
+from app import db
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String(64), primary_key=True, comment='Table name')
+    version = db.Column(db.Integer, nullable=False, default=0,
+                        comment='Bumped by bulk writes that keep updated_at, see app.utils.http_cache')
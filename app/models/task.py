@@ -0,0 +1,17 @@
+from app import db
+from datetime import datetime
+
+class BackgroundTask(db.Model):
+    __tablename__ = 'background_tasks'
+
+    id = db.Column(db.String(32), primary_key=True, comment='uuid4 hex')
+    name = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending', comment='pending/running/success/failed')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    msg = db.Column(db.String(256), nullable=False, default='')
+    result = db.Column(db.Text, nullable=True, comment='JSON')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='Last status or progress write')
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
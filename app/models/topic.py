@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+import json
+
+class TopicModel(db.Model):
+    __tablename__ = 'topic_models'
+
+    id = db.Column(db.Integer, primary_key=True)
+    keyword = db.Column(db.String(128), nullable=True, unique=True, comment='Monitored keyword, NULL for all items')
+    k = db.Column(db.Integer, nullable=False)
+    dims = db.Column(db.Integer, nullable=False, comment='Hashed feature dimensions')
+    centroids = db.Column(db.LargeBinary, nullable=False, comment='float32 k x dims')
+    counts = db.Column(db.LargeBinary, nullable=False, comment='float64 per-centroid update counts')
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    clusters = db.relationship('TopicCluster', backref='model', lazy='dynamic',
+                               cascade='all, delete-orphan')
+
+class TopicCluster(db.Model):
+    __tablename__ = 'topic_clusters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, db.ForeignKey('topic_models.id'), nullable=False, index=True)
+    label_index = db.Column(db.Integer, nullable=False, comment='Row in the centroid matrix')
+    label = db.Column(db.String(256), nullable=True)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    term_weights = db.Column(db.Text, nullable=True, comment='JSON {term_id: summed weight}, top terms only')
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'model_id': self.model_id,
+            'label_index': self.label_index,
+            'label': self.label,
+            'size': self.size,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def weights(self):
+        return {int(t): w for t, w in json.loads(self.term_weights).items()} if self.term_weights else {}
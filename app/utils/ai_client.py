@@ -0,0 +1,141 @@
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class AIClientError(Exception):
+    def __init__(self, msg, status=None, retry_after=None):
+        super().__init__(msg)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def chat_completions_url(api_url):
+    """
+    Accept either a base URL (https://api.deepseek.com/v1) or the full endpoint.
+    """
+    api_url = (api_url or '').rstrip('/')
+    if api_url.endswith('/chat/completions'):
+        return api_url
+    return api_url + '/chat/completions'
+
+
+class ChatClient:
+    """
+    Minimal OpenAI-compatible chat-completions client.
+    One requests.Session per client keeps a keep-alive connection pool of `pool_size`.
+    """
+
+    def __init__(self, api_url, api_key, model_name, pool_size=4, timeout=60):
+        self.url = chat_completions_url(api_url)
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+        })
+
+    def chat(self, messages, **params):
+        """
+        Send one chat completion.
+
+        Returns:
+            dict: {'content': str, 'usage': dict, 'headers': dict}
+        """
+        payload = {'model': self.model_name, 'messages': messages}
+        payload.update(params)
+        try:
+            response = self.session.post(self.url, data=json.dumps(payload), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise AIClientError(f'请求AI接口失败: {e}')
+
+        if response.status_code != 200:
+            raise AIClientError(f'AI接口返回状态 {response.status_code}: {response.text[:200]}',
+                                status=response.status_code,
+                                retry_after=response.headers.get('Retry-After'))
+        try:
+            body = response.json()
+            content = body['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise AIClientError(f'AI接口返回格式错误: {response.text[:200]}', status=response.status_code)
+
+        return {'content': content or '', 'usage': body.get('usage') or {}, 'headers': dict(response.headers)}
+
+    def stream(self, messages, **params):
+        """
+        Open a streamed chat completion. Raises AIClientError before any token
+        when the request is rejected, so callers can still fail over.
+
+        Returns:
+            ChatStream: Iterates content deltas; close() drops the upstream connection.
+        """
+        payload = {'model': self.model_name, 'messages': messages, 'stream': True,
+                   'stream_options': {'include_usage': True}}
+        payload.update(params)
+        try:
+            response = self.session.post(self.url, data=json.dumps(payload), timeout=self.timeout, stream=True)
+        except requests.RequestException as e:
+            raise AIClientError(f'请求AI接口失败: {e}')
+        if response.status_code != 200:
+            text = response.text[:200]
+            response.close()
+            raise AIClientError(f'AI接口返回状态 {response.status_code}: {text}',
+                                status=response.status_code,
+                                retry_after=response.headers.get('Retry-After'))
+        return ChatStream(response)
+
+    def close(self):
+        self.session.close()
+
+
+class ChatStream:
+    """
+    Server-sent events of an OpenAI-compatible streamed completion.
+    `content` accumulates the deltas; `usage` is filled from the final chunk when sent.
+    `finished` is only set by `[DONE]` or a finish_reason of "stop": a connection
+    that just ends leaves it False, and the content is then incomplete.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.headers = dict(response.headers)
+        self.content = ''
+        self.usage = {}
+        self.finished = False
+
+    def __iter__(self):
+        try:
+            for line in self.response.iter_lines(decode_unicode=False):
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    self.finished = True
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                if chunk.get('usage'):
+                    self.usage = chunk['usage']
+                for choice in chunk.get('choices') or []:
+                    if choice.get('finish_reason') == 'stop':
+                        self.finished = True
+                    delta = (choice.get('delta') or {}).get('content')
+                    if delta:
+                        self.content += delta
+                        yield delta
+        except requests.RequestException as e:
+            raise AIClientError(f'AI接口流式响应中断: {e}')
+        finally:
+            self.response.close()
+
+    def close(self):
+        self.response.close()
+
@@ -0,0 +1,338 @@
+"""
+Routing of chat requests across the active AI engines.
+
+The router keeps one pooled ChatClient per engine together with its live
+state: requests in flight, a rolling latency and error window, the provider's
+rate-limit headers and a circuit breaker. Each request goes to the available
+engine with the fewest requests in flight per unit of weight (lower latency
+breaks ties) and never exceeds the engine's concurrency cap, waiting for a
+free slot when every engine is busy. Failures caused by the engine (network
+errors, 5xx, 429, bad credentials) fail over to the next engine; malformed
+requests (400/413/422) are raised as is since no engine would accept them.
+
+State lives in the worker process and is rebuilt when an engine's URL, key
+or model changes.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from app.utils.ai_client import AIClientError, ChatClient
+
+# Consecutive failures that open an engine's circuit, and how long it stays open (seconds)
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30.0
+# Outcomes and latencies kept per engine for the rolling statistics
+WINDOW = 100
+# Smoothing factor of the latency moving average used for tie-breaking
+LATENCY_ALPHA = 0.2
+# Pause after a 429 without Retry-After (seconds)
+DEFAULT_RETRY_AFTER = 1.0
+# Statuses that reject the request itself; any other engine would reject it too
+REQUEST_ERRORS = (400, 413, 422)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_duration(value):
+    """
+    Seconds from a Retry-After value or an OpenAI-style reset header ('1s', '6m0s', '20ms').
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+class EngineState:
+    def __init__(self, engine, client, max_concurrency):
+        self.engine_id = engine.id
+        self.model_name = engine.model_name
+        self.provider = engine.provider
+        self.cache_key = (engine.api_url, engine.api_key, engine.model_name)
+        self.client = client
+        self.max_concurrency = engine.max_concurrency or max_concurrency
+        self.weight = max(engine.weight or 1, 1)
+        self.outstanding = 0
+        self.latency = None
+        self.latencies = deque(maxlen=WINDOW)
+        self.outcomes = deque(maxlen=WINDOW)
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.throttled_until = 0.0
+        self.rate_remaining = None
+        self.requests = 0
+
+    def circuit(self, now):
+        if self.failures < BREAKER_FAILURES:
+            return 'closed'
+        return 'open' if now < self.open_until else 'half_open'
+
+    def available(self, now):
+        """Can take one more request right now."""
+        if self.outstanding >= self.max_concurrency or now < self.throttled_until:
+            return False
+        circuit = self.circuit(now)
+        if circuit == 'open':
+            return False
+        # Half-open lets exactly one probe through
+        return circuit == 'closed' or not self.probing
+
+    def load(self):
+        return (self.outstanding + 1) / self.weight, self.latency or 0.0
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return round(1 - sum(self.outcomes) / len(self.outcomes), 4)
+
+    def to_dict(self, now):
+        latencies = sorted(self.latencies)
+        return {
+            'engine_id': self.engine_id,
+            'provider': self.provider,
+            'model_name': self.model_name,
+            'weight': self.weight,
+            'max_concurrency': self.max_concurrency,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'latency_avg': round(self.latency, 4) if self.latency is not None else None,
+            'latency_p50': round(latencies[len(latencies) // 2], 4) if latencies else None,
+            'latency_p95': round(latencies[int(len(latencies) * 0.95)], 4) if latencies else None,
+            'error_rate': self.error_rate(),
+            'circuit': self.circuit(now),
+            'rate_limit_remaining': self.rate_remaining,
+            'throttled_for': round(max(self.throttled_until - now, 0.0), 3),
+        }
+
+
+class EngineRouter:
+    def __init__(self):
+        self.states = {}
+        self.cond = threading.Condition()
+
+    def sync(self, engines, max_concurrency=4, timeout=60):
+        """
+        Make the router match the given AIEngine rows, keeping state for unchanged engines.
+        """
+        with self.cond:
+            for engine in engines:
+                state = self.states.get(engine.id)
+                key = (engine.api_url, engine.api_key, engine.model_name)
+                if state is not None and state.cache_key == key:
+                    state.max_concurrency = engine.max_concurrency or max_concurrency
+                    state.weight = max(engine.weight or 1, 1)
+                    state.provider = engine.provider
+                    continue
+                if state is not None:
+                    state.client.close()
+                pool_size = engine.max_concurrency or max_concurrency
+                client = ChatClient(engine.api_url, engine.api_key, engine.model_name,
+                                    pool_size=pool_size, timeout=timeout)
+                self.states[engine.id] = EngineState(engine, client, max_concurrency)
+            self.cond.notify_all()
+
+    def capacity(self, engine_ids):
+        with self.cond:
+            return sum(self.states[i].max_concurrency for i in engine_ids if i in self.states)
+
+    def _acquire(self, engine_ids, exclude, deadline):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                candidates = [self.states[i] for i in engine_ids if i in self.states and i not in exclude]
+                if not candidates:
+                    return None
+                ready = [s for s in candidates if s.available(now)]
+                if ready:
+                    state = min(ready, key=EngineState.load)
+                    state.outstanding += 1
+                    state.requests += 1
+                    if state.circuit(now) == 'half_open':
+                        state.probing = True
+                    return state
+                if all(s.circuit(now) == 'open' for s in candidates):
+                    raise AIClientError('AI引擎均处于熔断状态，请稍后再试')
+                if now >= deadline:
+                    raise AIClientError('等待可用AI引擎超时')
+                # Slots free up on release(); throttles and breakers expire on their own
+                wake = [s.throttled_until for s in candidates if s.throttled_until > now]
+                wake += [s.open_until for s in candidates if s.circuit(now) == 'open']
+                wait = min([deadline] + wake) - now
+                self.cond.wait(max(min(wait, 1.0), 0.01))
+
+    def _release(self, state, latency=None, headers=None, error=None):
+        now = time.monotonic()
+        with self.cond:
+            state.outstanding -= 1
+            state.probing = False
+            if headers:
+                self._read_rate_limits(state, headers, now)
+            if error is None and latency is None:
+                # Cancelled by the caller: says nothing about the engine
+                pass
+            elif error is None:
+                state.failures = 0
+                state.outcomes.append(1)
+                state.latencies.append(latency)
+                state.latency = latency if state.latency is None else \
+                    state.latency + LATENCY_ALPHA * (latency - state.latency)
+            else:
+                state.outcomes.append(0)
+                if error.status == 429:
+                    state.throttled_until = now + (parse_duration(error.retry_after) or DEFAULT_RETRY_AFTER)
+                else:
+                    state.failures += 1
+                    if state.failures >= BREAKER_FAILURES:
+                        state.open_until = now + BREAKER_COOLDOWN
+            self.cond.notify_all()
+
+    @staticmethod
+    def _read_rate_limits(state, headers, now):
+        headers = {k.lower(): v for k, v in headers.items()}
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        if remaining is None:
+            return
+        try:
+            state.rate_remaining = int(remaining)
+        except ValueError:
+            return
+        if state.rate_remaining <= 0:
+            reset = parse_duration(headers.get('x-ratelimit-reset-requests')) or DEFAULT_RETRY_AFTER
+            state.throttled_until = max(state.throttled_until, now + reset)
+
+    def _open(self, engine_ids, timeout, call):
+        """
+        Run call(client) on the best available engine, failing over on engine errors.
+        The engine's slot stays taken; the caller releases it.
+
+        Returns:
+            tuple: (EngineState, call result, start time)
+        """
+        with self.cond:
+            engine_ids = list(engine_ids) if engine_ids is not None else list(self.states)
+        deadline = time.monotonic() + timeout
+        tried = set()
+        last_error = None
+        while True:
+            state = self._acquire(engine_ids, tried, deadline)
+            if state is None:
+                raise last_error or AIClientError('没有可用的AI引擎，请先在AI引擎管理中添加并启用')
+            tried.add(state.engine_id)
+            started = time.monotonic()
+            try:
+                return state, call(state.client), started
+            except AIClientError as e:
+                if e.status in REQUEST_ERRORS:
+                    # The request itself was rejected; not the engine's fault
+                    self._release(state, latency=time.monotonic() - started)
+                    raise
+                self._release(state, error=e)
+                last_error = e
+
+    def chat(self, messages, engine_ids=None, timeout=60, **params):
+        """
+        Send one chat completion through the best available engine, failing over on engine errors.
+
+        Args:
+            messages (list): Chat messages.
+            engine_ids (iterable): Engines allowed for this request; all synced engines by default.
+            timeout (float): Longest wait for a free slot before giving up.
+
+        Returns:
+            dict: ChatClient.chat() result plus 'engine_id' and 'model_name'.
+        """
+        state, reply, started = self._open(engine_ids, timeout, lambda client: client.chat(messages, **params))
+        self._release(state, latency=time.monotonic() - started, headers=reply['headers'])
+        reply['engine_id'] = state.engine_id
+        reply['model_name'] = state.model_name
+        return reply
+
+    def stream(self, messages, engine_ids=None, timeout=60, **params):
+        """
+        Open a streamed completion on the best available engine. Failover only happens
+        before the first token; the engine's slot is held until the stream ends or is closed.
+
+        Returns:
+            RoutedStream
+        """
+        state, stream, started = self._open(engine_ids, timeout, lambda client: client.stream(messages, **params))
+        return RoutedStream(self, state, stream, started)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.cond:
+            return [s.to_dict(now) for _, s in sorted(self.states.items())]
+
+
+class RoutedStream:
+    """A ChatStream bound to the router slot it occupies."""
+
+    def __init__(self, router, state, stream, started):
+        self.router = router
+        self.state = state
+        self.stream = stream
+        self.started = started
+        self.engine_id = state.engine_id
+        self.model_name = state.model_name
+        self.released = False
+
+    @property
+    def content(self):
+        return self.stream.content
+
+    @property
+    def usage(self):
+        return self.stream.usage
+
+    @property
+    def finished(self):
+        return self.stream.finished
+
+    def _finish(self, **outcome):
+        if not self.released:
+            self.released = True
+            self.router._release(self.state, **outcome)
+
+    def __iter__(self):
+        try:
+            yield from self.stream
+        except AIClientError as e:
+            self._finish(error=e)
+            raise
+        else:
+            if self.stream.finished:
+                self._finish(latency=time.monotonic() - self.started, headers=self.stream.headers)
+            else:
+                self._finish(error=AIClientError('AI接口流式响应未完成'))
+        finally:
+            # Abandoned iteration (GeneratorExit) frees the slot without judging the engine
+            self._finish()
+
+    def close(self):
+        """Drop the upstream connection, e.g. when the client went away."""
+        self.stream.close()
+        self._finish()
+
+
+_router = EngineRouter()
+
+
+def get_router(engines, max_concurrency=4, timeout=60):
+    """Process-wide router synced with the given AIEngine rows."""
+    _router.sync(engines, max_concurrency=max_concurrency, timeout=timeout)
+    return _router
+
+
+def router_stats():
+    return _router.stats()
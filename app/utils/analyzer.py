@@ -0,0 +1,281 @@
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import AIEngine, AnalysisResult, OpinionData
+from app.utils.ai_client import AIClientError
+from app.utils.ai_router import get_router
+from app.utils.summarizer import estimate_tokens, summarize_texts
+
+# Bump whenever SYSTEM_PROMPT or the expected output changes; old cache entries then stop matching
+PROMPT_VERSION = 'v1'
+
+SYSTEM_PROMPT = (
+    '你是一名政企舆情分析师。阅读给定的新闻或帖子，只输出一个 JSON 对象，格式为：'
+    '{"sentiment": "positive|neutral|negative", "summary": "不超过100字的摘要", "tags": ["标签1", "标签2"]}。'
+    '不要输出 JSON 之外的任何内容。'
+)
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+# Keep requests well inside common context windows
+MAX_CONTENT_CHARS = 6000
+
+
+def item_body(item):
+    detail = item.detail
+    return (detail.content if detail and detail.content else item.content) or ''
+
+
+def item_title(item):
+    detail = item.detail
+    return (detail.title if detail and detail.title else item.title) or ''
+
+
+def build_content(item, summary=None):
+    """
+    Text sent to the model: the deep-crawled body when present, else the list summary.
+    Long bodies are replaced by their map-reduce summary when one is given.
+    """
+    title = item_title(item)
+    if summary:
+        return f'标题：{title}\n\n正文摘要：{summary}'
+    return f'标题：{title}\n\n正文：{item_body(item)[:MAX_CONTENT_CHARS]}'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def source_hash(item):
+    """
+    Cache key of an item's analysis: the hash of its title and full body, so a
+    cached long item is found without summarizing it first.
+    """
+    return content_hash(f'{item_title(item)}\n\n{item_body(item)}')
+
+
+def parse_analysis(text):
+    """
+    Extract {'sentiment', 'summary', 'tags'} from a model reply, tolerating code fences and prose.
+    """
+    match = re.search(r'\{.*\}', text or '', re.S)
+    data = {}
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            data = {}
+
+    sentiment = str(data.get('sentiment', '')).lower()
+    if sentiment not in SENTIMENTS:
+        sentiment = 'neutral'
+    tags = data.get('tags') or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in re.split(r'[,，、]', tags) if t.strip()]
+    summary = data.get('summary') or (text or '').strip()[:200]
+
+    return {'sentiment': sentiment, 'summary': summary, 'tags': [str(t) for t in tags][:10]}
+
+
+def _analyze_one(router, engine_ids, text, timeout):
+    """Runs in a worker thread: HTTP only, no database access."""
+    reply = router.chat([
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': text},
+    ], engine_ids=engine_ids, timeout=timeout, temperature=0)
+    result = parse_analysis(reply['content'])
+    result['usage'] = reply['usage']
+    result['engine_id'] = reply['engine_id']
+    result['model_name'] = reply['model_name']
+    return result
+
+
+def cached_results(model_names, hashes):
+    """
+    Look up previous results for any of `model_names` and `hashes` in one query.
+
+    Returns:
+        dict: (model_name, content_hash) -> AnalysisResult
+    """
+    if not hashes or not model_names:
+        return {}
+    rows = AnalysisResult.query.filter(
+        AnalysisResult.model_name.in_(list(model_names)),
+        AnalysisResult.prompt_version == PROMPT_VERSION,
+        AnalysisResult.content_hash.in_(list(hashes))
+    ).all()
+    return {(r.model_name, r.content_hash): r for r in rows}
+
+
+def active_engines(engine_id=None):
+    query = AIEngine.query.filter(AIEngine.is_active == True)  # noqa: E712
+    if engine_id:
+        query = query.filter(AIEngine.id == engine_id)
+    return query.order_by(AIEngine.id).all()
+
+
+def needs_summary(item):
+    return estimate_tokens(item_body(item)) > current_app.config['SUMMARY_CHUNK_TOKENS']
+
+
+def prepare_texts(items, engines):
+    """
+    Model input per item id. Bodies over one chunk budget are condensed by the
+    map-reduce summarizer first instead of being truncated.
+    """
+    long_bodies = {item.id: item_body(item) for item in items if needs_summary(item)}
+    summaries = summarize_texts(long_bodies, engines)['summaries'] if long_bodies else {}
+    return {item.id: build_content(item, summaries.get(item.id, {}).get('summary')) for item in items}
+
+
+def _cache_hit(opinion_id, text_hash, engines, cache):
+    hit = next((cache[(e.model_name, text_hash)] for e in engines if (e.model_name, text_hash) in cache), None)
+    if hit is not None and hit.opinion_id != opinion_id:
+        # Same content stored under another item: copy the result instead of re-billing
+        hit = AnalysisResult(opinion_id=opinion_id, engine_id=hit.engine_id, model_name=hit.model_name,
+                             prompt_version=PROMPT_VERSION, content_hash=hit.content_hash,
+                             sentiment=hit.sentiment, summary=hit.summary, tags=hit.tags)
+        db.session.add(hit)
+    return hit
+
+
+def _store_result(opinion_id, engine_id, model_name, text_hash, data, usage):
+    result = AnalysisResult(
+        opinion_id=opinion_id,
+        engine_id=engine_id,
+        model_name=model_name,
+        prompt_version=PROMPT_VERSION,
+        content_hash=text_hash,
+        sentiment=data['sentiment'],
+        summary=data['summary'],
+        tags=json.dumps(data['tags'], ensure_ascii=False),
+        prompt_tokens=usage.get('prompt_tokens'),
+        completion_tokens=usage.get('completion_tokens'),
+    )
+    db.session.add(result)
+    return result
+
+
+def analyze_items(ids, engine_id=None):
+    """
+    Analyse OpinionData rows with the active AI engines.
+
+    Items whose (model, prompt version, content hash) already has a result reuse it.
+    The rest go through the engine router (app.utils.ai_router), which spreads them
+    over all engines within each engine's concurrency cap and fails over on errors.
+
+    Returns:
+        dict: {'results': [AnalysisResult.to_dict()], 'cached': int, 'analyzed': int, 'errors': [..]}
+    """
+    engines = active_engines(engine_id)
+    if not engines:
+        raise AIClientError('没有可用的AI引擎，请先在AI引擎管理中添加并启用')
+
+    items = OpinionData.query.options(joinedload(OpinionData.detail)).filter(OpinionData.id.in_(ids)).all()
+    hashes = {item.id: source_hash(item) for item in items}
+    cache = cached_results({e.model_name for e in engines}, set(hashes.values()))
+
+    results = []
+    pending = []
+    cached = 0
+    for item in items:
+        hit = _cache_hit(item.id, hashes[item.id], engines, cache)
+        if hit is None:
+            pending.append(item)
+            continue
+        results.append(hit)
+        cached += 1
+    # Only items missing from the cache are summarized
+    texts = prepare_texts(pending, engines)
+
+    concurrency = current_app.config['AI_MAX_CONCURRENCY']
+    timeout = current_app.config['AI_REQUEST_TIMEOUT']
+    router = get_router(engines, max_concurrency=concurrency, timeout=timeout)
+    engine_ids = [engine.id for engine in engines]
+
+    errors = []
+    if pending:
+        # Enough threads to fill every engine's cap; the router picks the engine per request
+        workers = min(len(pending), router.capacity(engine_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(item, executor.submit(_analyze_one, router, engine_ids, texts[item.id], timeout))
+                       for item in pending]
+            # Results are written from this thread only; worker threads never touch the session
+            for item, future in futures:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    errors.append({'id': item.id, 'msg': str(e)})
+                    continue
+                results.append(_store_result(item.id, data['engine_id'], data['model_name'], hashes[item.id],
+                                             data, data['usage']))
+
+    db.session.commit()
+    return {
+        'results': [r.to_dict() for r in results],
+        'cached': cached,
+        'analyzed': len(results) - cached,
+        'errors': errors,
+    }
+
+
+def stream_analysis(opinion_id, engine_id=None):
+    """
+    Analyse one item with a streamed completion, yielding events as they happen:
+    {'type': 'summarizing'} while a long body is condensed, {'type': 'start', ...},
+    {'type': 'token', 'content'}, then {'type': 'result', 'data'} once the result
+    is stored, or {'type': 'error', 'msg'}. A cached result is returned straight
+    away, before any summarizing. Closing the generator (client gone) drops the upstream
+    request and stores nothing; neither does a stream that ends before the model
+    finished, so a retry asks the model again.
+    """
+    engines = active_engines(engine_id)
+    if not engines:
+        raise AIClientError('没有可用的AI引擎，请先在AI引擎管理中添加并启用')
+    item = OpinionData.query.options(joinedload(OpinionData.detail)).filter(OpinionData.id == opinion_id).first()
+    if item is None:
+        raise AIClientError('数据不存在')
+
+    text_hash = source_hash(item)
+    hit = _cache_hit(item.id, text_hash, engines, cached_results({e.model_name for e in engines}, {text_hash}))
+    if hit is not None:
+        db.session.commit()
+        yield {'type': 'result', 'cached': True, 'data': hit.to_dict()}
+        return
+
+    if needs_summary(item):
+        # The map-reduce takes several model calls; tell the client before they start
+        yield {'type': 'summarizing', 'id': item.id}
+    text = prepare_texts([item], engines)[item.id]
+
+    timeout = current_app.config['AI_REQUEST_TIMEOUT']
+    router = get_router(engines, max_concurrency=current_app.config['AI_MAX_CONCURRENCY'], timeout=timeout)
+    stream = router.stream([
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': text},
+    ], engine_ids=[e.id for e in engines], timeout=timeout, temperature=0)
+    try:
+        yield {'type': 'start', 'id': item.id, 'engine_id': stream.engine_id, 'model_name': stream.model_name}
+        for delta in stream:
+            yield {'type': 'token', 'content': delta}
+    finally:
+        stream.close()
+    if not stream.finished:
+        yield {'type': 'error', 'msg': 'AI接口流式响应未完成，结果未保存，请重试'}
+        return
+
+    result = _store_result(item.id, stream.engine_id, stream.model_name, text_hash,
+                           parse_analysis(stream.content), stream.usage)
+    db.session.commit()
+    yield {'type': 'result', 'cached': False, 'data': result.to_dict()}
+
+
+def latest_result(opinion_id):
+    return AnalysisResult.query.filter_by(opinion_id=opinion_id) \
+        .order_by(AnalysisResult.created_at.desc(), AnalysisResult.id.desc()).first()
@@ -0,0 +1,210 @@
+"""
+Streaming burst detection on incoming items.
+
+Every keyword and every source is a series with a ring buffer of per-bucket
+arrival counts (one bucket per BURST_BUCKET_SECONDS, BURST_WINDOW_BUCKETS of
+them) and an exponentially weighted mean/variance of the closed buckets. An
+item costs one counter increment plus a z-score check against that baseline;
+buckets are rolled lazily, at most one window's worth per gap. Nothing is read
+back from the database, so state lives in the worker process and starts cold
+after a restart (the first WARMUP_BUCKETS closed buckets never alert). With
+several gunicorn workers each detector sees only the items saved through its
+worker.
+"""
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from blinker import Namespace
+
+_signals = Namespace()
+# Sent with event=<dict> whenever a series crosses the threshold
+burst_detected = _signals.signal('burst-detected')
+
+DIMENSIONS = ('keyword', 'source')
+# Closed buckets needed before a series' baseline is trusted
+WARMUP_BUCKETS = 3
+# Series kept in memory; the least recently fed ones are dropped first
+MAX_SERIES = 5000
+# Recent events kept for the API
+MAX_EVENTS = 200
+
+
+class _Series:
+    __slots__ = ('counts', 'epoch', 'window_count', 'mean', 'var', 'closed', 'alerted_epoch')
+
+    def __init__(self, size, epoch):
+        self.counts = array('I', bytes(4 * size))
+        self.epoch = epoch
+        self.window_count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.closed = 0
+        self.alerted_epoch = None
+
+
+class BurstDetector:
+    """
+    Args:
+        bucket_seconds (int): Bucket length.
+        window_buckets (int): Ring buffer size, i.e. the sliding window length in buckets.
+        alpha (float): EWMA smoothing factor for the baseline.
+        threshold (float): z-score of the current bucket that counts as a burst.
+        min_count (int): Buckets with fewer items are never flagged.
+    """
+
+    def __init__(self, bucket_seconds=60, window_buckets=60, alpha=0.1, threshold=3.0, min_count=5):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_count = min_count
+        self.series = OrderedDict()
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(bucket_seconds=config['BURST_BUCKET_SECONDS'], window_buckets=config['BURST_WINDOW_BUCKETS'],
+                   alpha=config['BURST_ALPHA'], threshold=config['BURST_THRESHOLD'],
+                   min_count=config['BURST_MIN_COUNT'])
+
+    def _close(self, s, count):
+        """Fold one finished bucket into the EWMA baseline."""
+        diff = count - s.mean
+        s.mean += self.alpha * diff
+        s.var = (1 - self.alpha) * (s.var + self.alpha * diff * diff)
+        s.closed += 1
+
+    def _roll(self, s, epoch):
+        gap = epoch - s.epoch
+        if gap <= 0:
+            return
+        size = self.window_buckets
+        self._close(s, s.counts[s.epoch % size])
+        # Empty buckets in between: a gap longer than the window leaves nothing to keep
+        for _ in range(min(gap, size) - 1):
+            self._close(s, 0)
+        for i in range(1, min(gap, size) + 1):
+            slot = (s.epoch + i) % size
+            s.window_count -= s.counts[slot]
+            s.counts[slot] = 0
+        s.epoch = epoch
+
+    def _score(self, s, count):
+        # Poisson floor on the spread so a flat baseline does not make every extra item a burst
+        spread = math.sqrt(max(s.var, s.mean, 1.0))
+        return (count - s.mean) / spread
+
+    def _get(self, key, epoch):
+        s = self.series.get(key)
+        if s is None:
+            s = self.series[key] = _Series(self.window_buckets, epoch)
+            if len(self.series) > MAX_SERIES:
+                self.series.popitem(last=False)
+        else:
+            self.series.move_to_end(key)
+        return s
+
+    def observe(self, keyword=None, source=None, n=1, now=None):
+        """
+        Count n arriving items for a keyword and a source.
+
+        Returns:
+            list: Burst events raised by this observation.
+        """
+        now = time.time() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        raised = []
+        with self._lock:
+            for dimension, value in zip(DIMENSIONS, (keyword, source)):
+                value = (value or '').strip()
+                if not value:
+                    continue
+                s = self._get((dimension, value), epoch)
+                self._roll(s, epoch)
+                slot = epoch % self.window_buckets
+                s.counts[slot] += n
+                s.window_count += n
+                count = s.counts[slot]
+                if s.closed < WARMUP_BUCKETS or count < self.min_count or s.alerted_epoch == epoch:
+                    continue
+                score = self._score(s, count)
+                if score >= self.threshold:
+                    s.alerted_epoch = epoch
+                    self.seq += 1
+                    event = {
+                        'seq': self.seq,
+                        'dimension': dimension,
+                        'value': value,
+                        'bucket': datetime.fromtimestamp(epoch * self.bucket_seconds).strftime('%Y-%m-%d %H:%M:%S'),
+                        'count': count,
+                        'baseline': round(s.mean, 3),
+                        'score': round(score, 2),
+                        'window_count': s.window_count,
+                        'detected_at': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+                    }
+                    self.events.append(event)
+                    raised.append(event)
+        for event in raised:
+            burst_detected.send(self, event=event)
+        return raised
+
+    def observe_items(self, items, now=None):
+        """Feed scraper-shaped dicts, grouped so each series is touched once per call."""
+        groups = {}
+        for item in items:
+            key = (item.get('keyword'), item.get('source'))
+            groups[key] = groups.get(key, 0) + 1
+        raised = []
+        for (keyword, source), n in groups.items():
+            raised.extend(self.observe(keyword, source, n=n, now=now))
+        return raised
+
+    def recent_events(self, since=0, limit=50):
+        with self._lock:
+            events = [e for e in self.events if e['seq'] > since]
+        return events[-limit:]
+
+    def snapshot(self, dimension=None, limit=20, now=None):
+        """
+        Current series ordered by sliding-window count.
+
+        Returns:
+            list: [{'dimension', 'value', 'window_count', 'current', 'baseline', 'score'}]
+        """
+        now = time.time() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        rows = []
+        with self._lock:
+            for (dim, value), s in self.series.items():
+                if dimension and dim != dimension:
+                    continue
+                self._roll(s, epoch)
+                current = s.counts[epoch % self.window_buckets]
+                rows.append({
+                    'dimension': dim,
+                    'value': value,
+                    'window_count': s.window_count,
+                    'current': current,
+                    'baseline': round(s.mean, 3),
+                    'score': round(self._score(s, current), 2),
+                })
+        rows.sort(key=lambda r: r['window_count'], reverse=True)
+        return rows[:limit]
+
+
+_init_lock = threading.Lock()
+
+
+def get_detector(app):
+    """The application's detector, created from its config on first use."""
+    with _init_lock:
+        detector = app.extensions.get('burst_detector')
+        if detector is None:
+            detector = app.extensions['burst_detector'] = BurstDetector.from_config(app.config)
+        return detector
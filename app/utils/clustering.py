@@ -0,0 +1,339 @@
+"""
+Topic clustering of OpinionData with mini-batch k-means.
+
+Features are the documents' precomputed TF-IDF vectors from the keyword index,
+feature-hashed into a fixed number of dimensions so that new vocabulary never
+changes the centroid shape. Clustering is spherical (cosine) k-means trained
+with Sculley-style mini-batch updates: each centroid is the running mean of
+every vector ever assigned to it, which also lets new items be folded in one
+small batch at a time without refitting.
+
+Every item belongs to at most one model: its keyword's own model when there
+is one, else the warehouse-wide model (keyword NULL). A global fit only
+covers the items no keyword model claims, and a keyword fit takes its items
+over from the global model. Cluster sizes are recounted from the items after
+every fit.
+"""
+import heapq
+import json
+from collections import Counter, defaultdict
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, func, or_, select
+
+from app import db
+from app.models import IndexDocument, IndexTerm, OpinionData, TopicCluster, TopicModel
+from app.utils.http_cache import bump_version
+
+# Term weights kept per cluster for labelling
+LABEL_TERMS = 50
+
+
+def hash_vectors(vectors, dims):
+    """
+    Feature-hash sparse {term_id: weight} vectors into an (n, dims) float32 matrix
+    with L2-normalized rows. A sign bit keeps colliding terms from only ever adding up.
+    """
+    rows, cols, vals = [], [], []
+    for i, vector in enumerate(vectors):
+        for term_id, weight in vector.items():
+            h = (int(term_id) * 2654435761) & 0xffffffff
+            rows.append(i)
+            cols.append(h % dims)
+            vals.append(-weight if h >> 31 else weight)
+    X = np.zeros((len(vectors), dims), dtype=np.float32)
+    if rows:
+        np.add.at(X, (np.asarray(rows), np.asarray(cols)), np.asarray(vals, dtype=np.float32))
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return X / norms
+
+
+class MiniBatchKMeans:
+    """
+    Args:
+        k (int): Number of clusters.
+        dims (int): Feature dimensions.
+        centroids (ndarray): Existing (k, dims) running means, to continue training.
+        counts (ndarray): Number of vectors folded into each centroid so far.
+    """
+
+    def __init__(self, k, dims, centroids=None, counts=None, seed=0):
+        self.k = k
+        self.dims = dims
+        self.centroids = centroids
+        self.counts = counts if counts is not None else np.zeros(k)
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def initialized(self):
+        return self.centroids is not None
+
+    def init(self, X):
+        """k-means++ seeding on cosine distance."""
+        n = X.shape[0]
+        first = self.rng.integers(n)
+        chosen = [first]
+        distance = 1.0 - X @ X[first]
+        for _ in range(1, min(self.k, n)):
+            weights = np.clip(distance, 0, None) ** 2
+            total = weights.sum()
+            nxt = self.rng.choice(n, p=weights / total) if total > 0 else self.rng.integers(n)
+            chosen.append(nxt)
+            distance = np.minimum(distance, 1.0 - X @ X[nxt])
+        self.centroids = X[chosen].astype(np.float32).copy()
+        if len(chosen) < self.k:
+            pad = np.zeros((self.k - len(chosen), self.dims), dtype=np.float32)
+            self.centroids = np.vstack([self.centroids, pad])
+
+    def _normalized(self):
+        norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return self.centroids / norms
+
+    def predict(self, X):
+        if X.shape[0] == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.argmax(X @ self._normalized().T, axis=1)
+
+    def partial_fit(self, X):
+        """
+        One mini-batch step. Per-sample learning rate 1/count makes each centroid
+        the running mean of its members, computed here for the whole batch at once.
+
+        Returns:
+            ndarray: Cluster index per row of X.
+        """
+        if not self.initialized:
+            self.init(X)
+        labels = self.predict(X)
+        m = np.bincount(labels, minlength=self.k).astype(np.float64)
+        sums = np.zeros_like(self.centroids, dtype=np.float64)
+        np.add.at(sums, labels, X)
+        touched = m > 0
+        new_counts = self.counts + m
+        self.centroids[touched] = ((self.centroids[touched] * self.counts[touched, None] + sums[touched])
+                                   / new_counts[touched, None]).astype(np.float32)
+        self.counts = new_counts
+        return labels
+
+    def dump(self):
+        return self.centroids.astype(np.float32).tobytes(), self.counts.astype(np.float64).tobytes()
+
+    @classmethod
+    def load(cls, model):
+        centroids = np.frombuffer(model.centroids, dtype=np.float32).reshape(model.k, model.dims).copy()
+        counts = np.frombuffer(model.counts, dtype=np.float64).copy()
+        return cls(model.k, model.dims, centroids=centroids, counts=counts)
+
+
+def _keyword_filter(stmt, keyword):
+    """Restrict stmt to the items of keyword's model: the keyword's, or for None the unclaimed ones."""
+    if keyword:
+        return stmt.where(OpinionData.keyword == keyword)
+    claimed = select(TopicModel.keyword).where(TopicModel.keyword.isnot(None))
+    return stmt.where(or_(OpinionData.keyword.is_(None), OpinionData.keyword.not_in(claimed)))
+
+
+def _batches(keyword, batch_size):
+    """Keyset-paginated (opinion_id, vector) batches of indexed documents."""
+    last_id = 0
+    while True:
+        stmt = select(IndexDocument.opinion_id, IndexDocument.vector) \
+            .join(OpinionData, OpinionData.id == IndexDocument.opinion_id) \
+            .where(IndexDocument.opinion_id > last_id) \
+            .order_by(IndexDocument.opinion_id).limit(batch_size)
+        rows = db.session.execute(_keyword_filter(stmt, keyword)).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [r[0] for r in rows], [json.loads(r[1]) if r[1] else {} for r in rows]
+
+
+def _merge_weights(cluster, extra):
+    weights = Counter(cluster.weights())
+    for term_id, weight in extra.items():
+        weights[int(term_id)] += weight
+    top = dict(heapq.nlargest(LABEL_TERMS, weights.items(), key=lambda kv: kv[1]))
+    cluster.term_weights = json.dumps({str(t): round(w, 4) for t, w in top.items()})
+    return top
+
+
+def _label_clusters(clusters):
+    """Label each cluster with its three heaviest terms."""
+    tops = {c.id: heapq.nlargest(3, c.weights().items(), key=lambda kv: kv[1]) for c in clusters}
+    term_ids = {t for top in tops.values() for t, _ in top}
+    terms = dict(db.session.execute(select(IndexTerm.id, IndexTerm.term).where(IndexTerm.id.in_(term_ids))).all()) \
+        if term_ids else {}
+    for cluster in clusters:
+        cluster.label = ' / '.join(terms[t] for t, _ in tops[cluster.id] if t in terms) or None
+
+
+def _write_topics(assignments):
+    """[(opinion_id, topic_id)] with one executemany; updated_at kept as is, the table version bumped."""
+    if not assignments:
+        return
+    table = OpinionData.__table__
+    db.session.execute(
+        table.update().where(table.c.id == bindparam('b_id'))
+        .values(topic_id=bindparam('b_topic'), updated_at=table.c.updated_at),
+        [{'b_id': i, 'b_topic': t} for i, t in assignments]
+    )
+    bump_version(OpinionData)
+
+
+def _recount_sizes():
+    """Set every cluster's size to the number of items pointing at it."""
+    counts = dict(db.session.execute(
+        select(OpinionData.topic_id, func.count())
+        .where(OpinionData.topic_id.isnot(None)).group_by(OpinionData.topic_id)
+    ).all())
+    for cluster in TopicCluster.query:
+        cluster.size = counts.get(cluster.id, 0)
+
+
+def find_model(keyword):
+    if keyword:
+        return TopicModel.query.filter_by(keyword=keyword).first()
+    return TopicModel.query.filter(TopicModel.keyword.is_(None)).first()
+
+
+def fit_topics(ctx, keyword=None, k=8, batch_size=256, epochs=3):
+    """
+    Fit a topic model for one keyword (or the items no keyword model claims) and
+    assign every indexed item in its scope.
+
+    Args:
+        ctx (TaskContext): Progress reporting (see app.utils.tasks).
+        keyword (str): Monitored keyword; None clusters the rest of the warehouse.
+        k (int): Number of topics.
+        batch_size (int): Documents per mini-batch.
+        epochs (int): Passes over the data.
+
+    Returns:
+        dict: {'model_id': int, 'clusters': [TopicCluster.to_dict()]}
+    """
+    dims = current_app.config['TOPIC_HASH_DIMS']
+    total = db.session.scalar(_keyword_filter(
+        select(func.count()).select_from(IndexDocument)
+        .join(OpinionData, OpinionData.id == IndexDocument.opinion_id), keyword))
+    if not total:
+        raise ValueError('没有可聚类的数据，请先保存数据或执行 flask reindex-keywords')
+
+    k = max(1, min(k, total))
+    batch_size = max(batch_size, k)
+    model = MiniBatchKMeans(k, dims)
+    steps = epochs * ((total + batch_size - 1) // batch_size)
+    done = 0
+    for _ in range(epochs):
+        for _, vectors in _batches(keyword, batch_size):
+            model.partial_fit(hash_vectors(vectors, dims))
+            done += 1
+            ctx.progress(done, steps, '训练中')
+
+    # Reported before the writes below: task progress goes through its own transaction
+    ctx.progress(steps, steps, '分配中')
+
+    # Replace any previous model for this keyword. The scope's items are released first: for a
+    # new keyword model they may still point at global clusters
+    _keyword_filter(OpinionData.query, keyword).update({'topic_id': None}, synchronize_session=False)
+    old = find_model(keyword)
+    if old:
+        db.session.delete(old)
+        db.session.flush()
+
+    centroids, counts = model.dump()
+    record = TopicModel(keyword=keyword or None, k=k, dims=dims, centroids=centroids, counts=counts)
+    db.session.add(record)
+    db.session.flush()
+    clusters = [TopicCluster(model_id=record.id, label_index=i, size=0) for i in range(k)]
+    db.session.add_all(clusters)
+    db.session.flush()
+
+    weights = defaultdict(Counter)
+    for ids, vectors in _batches(keyword, batch_size):
+        labels = model.predict(hash_vectors(vectors, dims))
+        _write_topics([(i, clusters[label].id) for i, label in zip(ids, labels)])
+        for vector, label in zip(vectors, labels):
+            for term_id, weight in vector.items():
+                weights[label][int(term_id)] += weight
+
+    for i, cluster in enumerate(clusters):
+        _merge_weights(cluster, weights[i])
+    # A keyword fit also takes items away from the global model's clusters
+    _recount_sizes()
+    _label_clusters(clusters)
+    db.session.commit()
+    return {'model_id': record.id, 'clusters': [c.to_dict() for c in clusters]}
+
+
+def assign_new_items(opinion_ids):
+    """
+    Fold newly indexed items into existing topic models without refitting:
+    assign the nearest centroid, move it by one mini-batch step and grow the cluster.
+    The keyword's own model is used, else the warehouse-wide one, else nothing happens.
+    """
+    opinion_ids = list(opinion_ids)
+    if not opinion_ids:
+        return 0
+    models = {m.keyword: m for m in TopicModel.query.all()}
+    if not models:
+        return 0
+
+    rows = db.session.execute(
+        select(OpinionData.id, OpinionData.keyword, IndexDocument.vector)
+        .join(IndexDocument, IndexDocument.opinion_id == OpinionData.id)
+        .where(OpinionData.id.in_(opinion_ids), OpinionData.topic_id.is_(None))
+    ).all()
+    groups = defaultdict(list)
+    for opinion_id, keyword, vector in rows:
+        record = models.get(keyword) or models.get(None)
+        if record is not None:
+            groups[record.id].append((opinion_id, json.loads(vector) if vector else {}))
+
+    assigned = 0
+    by_id = {m.id: m for m in models.values()}
+    for model_id, docs in groups.items():
+        record = by_id[model_id]
+        model = MiniBatchKMeans.load(record)
+        vectors = [v for _, v in docs]
+        labels = model.partial_fit(hash_vectors(vectors, record.dims))
+        record.centroids, record.counts = model.dump()
+
+        clusters = {c.label_index: c for c in record.clusters}
+        weights = defaultdict(Counter)
+        for vector, label in zip(vectors, labels):
+            clusters[label].size += 1
+            for term_id, weight in vector.items():
+                weights[label][int(term_id)] += weight
+        for label, extra in weights.items():
+            _merge_weights(clusters[label], extra)
+        _label_clusters([clusters[label] for label in weights])
+        _write_topics([(opinion_id, clusters[label].id) for (opinion_id, _), label in zip(docs, labels)])
+        assigned += len(docs)
+    return assigned
+
+
+def release_items(opinion_ids):
+    """Shrink cluster sizes for items about to be deleted."""
+    opinion_ids = list(opinion_ids)
+    if not opinion_ids:
+        return
+    counts = db.session.execute(
+        select(OpinionData.topic_id, func.count())
+        .where(OpinionData.id.in_(opinion_ids), OpinionData.topic_id.isnot(None))
+        .group_by(OpinionData.topic_id)
+    ).all()
+    for topic_id, count in counts:
+        cluster = db.session.get(TopicCluster, topic_id)
+        if cluster:
+            cluster.size = max(0, cluster.size - count)
+
+
+def list_topics(keyword=None):
+    record = find_model(keyword)
+    if not record:
+        return None, []
+    clusters = record.clusters.order_by(TopicCluster.size.desc()).all()
+    return record, clusters
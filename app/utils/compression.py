@@ -0,0 +1,99 @@
+"""
+Response compression for JSON and NDJSON.
+
+init_app() compresses JSON and NDJSON responses for clients that accept it:
+brotli when the brotli package is installed and the client asks for it,
+otherwise gzip. Whole responses under COMPRESS_MIN_BYTES are left alone.
+Streamed responses (the /business/analysis progress stream, exports) are
+compressed chunk by chunk with a sync flush after every chunk, so each event
+still reaches the browser as soon as it is produced. The stream's close
+callbacks run as before. COMPRESS_LEVEL 0 turns compression off.
+"""
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+MIMETYPES = ('application/json', 'application/x-ndjson')
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def choose_encoding():
+    """'br', 'gzip' or None, by what the client accepts and what is installed."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_stream(chunks, encoding, level):
+    """Compress an iterable of chunks (str as UTF-8), flushing after each one; closes `chunks` when done."""
+    stream = _BrotliStream(level) if encoding == 'br' else _GzipStream(level)
+    try:
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            if data:
+                yield stream.chunk(data)
+        yield stream.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _compress(response):
+    level = current_app.config['COMPRESS_LEVEL']
+    if (not level or response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    encoding = choose_encoding()
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_BYTES']:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=min(level, 11)))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=level, mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(_compress)
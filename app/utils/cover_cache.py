@@ -0,0 +1,406 @@
+"""
+Local cache behind the cover image proxy.
+
+Result covers point at search CDNs that are slow, block foreign referers and
+drop images. The proxy fetches each cover once, without a Referer, shrinks it
+to the SIZES thumbnails when Pillow is installed (without it the original is
+kept and served for every size) and stores the files sharded by the SHA-1 of
+the URL:
+
+    <COVER_CACHE_DIR>/ab/ab12...ef-medium
+
+Serving a file bumps its mtime. When the directory grows past COVER_CACHE_MB,
+the files with the oldest mtimes are removed until it is down to 90%, so it
+is an LRU that several worker processes can share. A cover that could not be
+fetched is not tried again for COVER_RETRY_SECONDS. Covers of newly saved
+items are fetched ahead on a few background threads.
+
+Covers are only fetched from public addresses: check_host() resolves the host
+before the request and check_peer() checks the address the request actually
+connected to, before reading the body.
+"""
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+from app.utils.metrics import Counter
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+# Bounding boxes (width, height): small for the warehouse grid, medium for the analysis cards
+SIZES = {'small': (120, 90), 'medium': (480, 320)}
+DEFAULT_SIZE = 'medium'
+# Name of the single file kept when the image is not resized
+ORIGINAL = 'orig'
+MAX_REDIRECTS = 3
+# Failed URLs remembered before the expired ones are dropped
+MAX_FAILURES = 10000
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+}
+# SVG is left out on purpose: it can carry script and is served from our origin
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+# outcome: hit, miss (fetched now) or error
+COVER_REQUESTS = Counter('cover_requests_total', 'Cover proxy requests by outcome', ('outcome',))
+
+Cover = namedtuple('Cover', 'data content_type etag')
+
+
+class CoverError(Exception):
+    pass
+
+
+def url_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _cover(data):
+    return Cover(data, sniff_type(data) or 'application/octet-stream', hashlib.md5(data).hexdigest())
+
+
+def sniff_type(data):
+    """Image MIME type from the leading bytes, or None for anything else."""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return None
+
+
+def check_host(url, allow_private=False):
+    """Refuse non-HTTP URLs and, unless allowed, hosts resolving to private or loopback addresses."""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise CoverError('不支持的图片地址')
+    if allow_private:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 80, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError):
+        raise CoverError('图片域名无法解析')
+    for info in infos:
+        _check_address(info[4][0])
+
+
+def check_peer(response):
+    """
+    Refuse a streamed requests response whose connection is not to a public address.
+    requests resolves the host again after check_host, and a rebinding DNS
+    server can answer with a private address the second time, so the address
+    actually connected to is checked before the body is read.
+    """
+    sock = getattr(response.raw.connection, 'sock', None)
+    if sock is None:
+        raise CoverError('图片地址无法校验')
+    _check_address(sock.getpeername()[0])
+
+
+def _check_address(address):
+    if not ipaddress.ip_address(address.split('%')[0]).is_global:
+        raise CoverError('图片地址指向内网')
+
+
+def make_thumbnails(data, sizes=SIZES):
+    """
+    {size: JPEG bytes} for every bounding box, or {ORIGINAL: data} when Pillow is
+    missing or cannot read the image.
+    """
+    if Image is None:
+        return {ORIGINAL: data}
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            thumbnails = {}
+            for name, box in sizes.items():
+                thumb = img.copy()
+                thumb.thumbnail(box)
+                if thumb.mode in ('RGBA', 'LA', 'P'):
+                    rgba = thumb.convert('RGBA')
+                    thumb = Image.new('RGB', rgba.size, 'white')
+                    thumb.paste(rgba, mask=rgba.split()[-1])
+                elif thumb.mode not in ('RGB', 'L'):
+                    thumb = thumb.convert('RGB')
+                buffer = io.BytesIO()
+                thumb.save(buffer, 'JPEG', quality=82, optimize=True)
+                thumbnails[name] = buffer.getvalue()
+            return thumbnails
+    except Exception:
+        return {ORIGINAL: data}
+
+
+class CoverCache:
+    """
+    Args:
+        directory (str): Where thumbnails are stored; created on first write.
+        max_bytes (int): Size past which the least recently served files are removed.
+        timeout (float): Per-request fetch timeout (seconds).
+        max_image_bytes (int): Larger downloads are abandoned.
+        retry_seconds (float): How long a failed URL is answered from memory.
+        allow_private (bool): Fetch from private and loopback hosts (tests, the fake server).
+        prefetch_workers (int): Background fetch threads (0: no prefetching).
+        prefetch_queue (int): Covers waiting for a prefetch thread at most; more are skipped.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, timeout=10, max_image_bytes=5 * 1024 * 1024,
+                 retry_seconds=600, allow_private=False, prefetch_workers=2, prefetch_queue=500):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_image_bytes = max_image_bytes
+        self.retry_seconds = retry_seconds
+        self.allow_private = allow_private
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_queue = prefetch_queue
+        self._lock = threading.Lock()
+        # One fetch per URL at a time; URLs share a fixed set of locks
+        self._fetch_locks = [threading.Lock() for _ in range(32)]
+        self._failures = {}
+        self._bytes = None
+        self._executor = None
+        self._queued = set()
+
+    def _path(self, key, size):
+        return os.path.join(self.directory, key[:2], f'{key}-{size}')
+
+    def get(self, url, size=DEFAULT_SIZE):
+        """Cached cover, or None. Counts as a use for the LRU."""
+        key = url_key(url)
+        for name in (size, ORIGINAL):
+            path = self._path(key, name)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return _cover(data)
+        return None
+
+    def load(self, url, size=DEFAULT_SIZE):
+        """
+        Cached cover, fetched and stored first when missing.
+
+        Raises:
+            CoverError: The URL is refused, the fetch failed or it is not an image.
+        """
+        cover = self.get(url, size)
+        if cover is not None:
+            COVER_REQUESTS.inc(outcome='hit')
+            return cover
+        key = url_key(url)
+        with self._fetch_locks[int(key[:8], 16) % len(self._fetch_locks)]:
+            # Another thread may have fetched it while we waited
+            cover = self.get(url, size)
+            if cover is not None:
+                COVER_REQUESTS.inc(outcome='hit')
+                return cover
+            try:
+                variants = self.fetch(url)
+            except CoverError:
+                COVER_REQUESTS.inc(outcome='error')
+                raise
+        COVER_REQUESTS.inc(outcome='miss')
+        return _cover(variants.get(size) or variants[ORIGINAL])
+
+    def fetch(self, url):
+        """
+        Download url and store its thumbnails, replacing any stored before.
+
+        Returns:
+            dict: {size or ORIGINAL: bytes} as stored.
+        """
+        # Loaded on the first miss, not when the app starts
+        import requests
+
+        key = url_key(url)
+        with self._lock:
+            failed_at = self._failures.get(key)
+        if failed_at is not None and time.time() - failed_at < self.retry_seconds:
+            raise CoverError('图片暂时无法获取')
+        try:
+            data = self._download(url)
+            if sniff_type(data) is None:
+                raise CoverError('不是图片')
+        except CoverError:
+            self._failed(key)
+            raise
+        except requests.RequestException as e:
+            self._failed(key)
+            raise CoverError(f'图片获取失败: {e}')
+        written = 0
+        variants = make_thumbnails(data)
+        os.makedirs(os.path.dirname(self._path(key, ORIGINAL)), exist_ok=True)
+        for name, body in variants.items():
+            path = self._path(key, name)
+            tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+            written += len(body)
+        self._grew(written)
+        return variants
+
+    def _download(self, url):
+        import requests
+
+        for _ in range(MAX_REDIRECTS + 1):
+            check_host(url, self.allow_private)
+            with requests.get(url, headers=HEADERS, timeout=self.timeout, stream=True,
+                              allow_redirects=False) as response:
+                if not self.allow_private:
+                    check_peer(response)
+                if response.is_redirect:
+                    url = urljoin(url, response.headers['Location'])
+                    continue
+                if response.status_code != 200:
+                    raise CoverError(f'图片获取失败: HTTP {response.status_code}')
+                chunks = []
+                received = 0
+                for chunk in response.iter_content(64 * 1024):
+                    received += len(chunk)
+                    if received > self.max_image_bytes:
+                        raise CoverError('图片过大')
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        raise CoverError('图片重定向次数过多')
+
+    def _failed(self, key):
+        now = time.time()
+        with self._lock:
+            if len(self._failures) >= MAX_FAILURES:
+                self._failures = {k: t for k, t in self._failures.items() if now - t < self.retry_seconds}
+            self._failures[key] = now
+
+    def _files(self):
+        """(mtime, size, path) of every stored file."""
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return files
+
+    def _grew(self, written):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._bytes += written
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescanned each time: other workers add and remove files too
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def usage(self):
+        files = self._files()
+        return {'files': len(files), 'bytes': sum(size for _, size, _ in files)}
+
+    def prefetch(self, urls):
+        """Fetch the covers not cached yet on the background threads."""
+        if not self.prefetch_workers:
+            return
+        for url in urls:
+            if not url:
+                continue
+            key = url_key(url)
+            with self._lock:
+                if key in self._queued or len(self._queued) >= self.prefetch_queue:
+                    continue
+                self._queued.add(key)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                                        thread_name_prefix='cover')
+            self._executor.submit(self._prefetch_one, url, key)
+
+    def _prefetch_one(self, url, key):
+        try:
+            if self.get(url) is None:
+                self.load(url)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._queued.discard(key)
+
+    def close(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_init_lock = threading.Lock()
+
+
+def get_cover_cache(app):
+    """The application's cover cache, or None when COVER_CACHE_DIR is empty."""
+    directory = app.config.get('COVER_CACHE_DIR')
+    if not directory:
+        return None
+    with _init_lock:
+        cache = app.extensions.get('cover_cache')
+        if cache is None:
+            config = app.config
+            cache = app.extensions['cover_cache'] = CoverCache(
+                directory,
+                max_bytes=config['COVER_CACHE_MB'] * 1024 * 1024,
+                timeout=config['COVER_FETCH_TIMEOUT'],
+                max_image_bytes=config['COVER_MAX_IMAGE_MB'] * 1024 * 1024,
+                retry_seconds=config['COVER_RETRY_SECONDS'],
+                allow_private=config['COVER_ALLOW_PRIVATE_HOSTS'],
+                prefetch_workers=config['COVER_PREFETCH_WORKERS'],
+                prefetch_queue=config['COVER_PREFETCH_QUEUE'],
+            )
+        return cache
+
+
+def prefetch_covers(app, urls):
+    """Queue the covers of newly saved items, when the cache is on."""
+    cache = get_cover_cache(app)
+    if cache is not None:
+        cache.prefetch(urls)
@@ -0,0 +1,153 @@
+"""
+Pipelined deep crawl: fetch threads -> bounded queue -> parse processes -> caller.
+
+Fetching is I/O bound and runs on threads; extraction (lxml parsing, XPath
+discovery) is CPU bound and runs in a process pool so it scales with cores
+instead of contending for the GIL. The queue between the two stages is
+bounded, so fetchers wait when parsing falls behind instead of holding every
+page in memory. Results are yielded to the calling thread, which stays the
+only one touching the database.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.utils.scraper import extract_with_rule, fetch_article
+
+_DONE = object()
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool(workers):
+    """
+    Process pool shared by all crawls in this process, created on first use.
+    Spawned, not forked: crawls start from request and task threads.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            else:
+                atexit.register(_shutdown_pool)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def _shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def crawl(jobs, fetch_workers=8, parse_workers=None, queue_size=32, archive=None):
+    """
+    Fetch and extract pages concurrently.
+
+    Args:
+        jobs (iterable): (key, url, rule config or None) per page.
+        fetch_workers (int): Fetch threads.
+        parse_workers (int): Parse processes; 0 extracts on the calling thread.
+        queue_size (int): Fetched pages waiting to be parsed.
+        archive (PageArchive): Stores every fetched page.
+
+    Yields:
+        tuple: (key, (title, content, new_rule_config), error message or None),
+        in completion order. Failed fetches yield ("", "", None) with the error.
+    """
+    jobs = [job for job in jobs if job[1]]
+    if not jobs:
+        return
+    pending = iter(jobs)
+    pending_lock = threading.Lock()
+    pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(entry):
+        # Give up waiting on a full queue once the consumer has gone away
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def fetcher():
+        while not stop.is_set():
+            with pending_lock:
+                job = next(pending, None)
+            if job is None:
+                break
+            key, url, rule_config = job
+            try:
+                put((key, rule_config, fetch_article(url, rule_config, archive), None))
+            except Exception as e:
+                put((key, rule_config, None, str(e)))
+        put(_DONE)
+
+    fetch_workers = max(1, min(fetch_workers, len(jobs)))
+    threads = [threading.Thread(target=fetcher, daemon=True) for _ in range(fetch_workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        finished = 0
+        if parse_workers == 0:
+            while finished < fetch_workers:
+                entry = pages.get()
+                if entry is _DONE:
+                    finished += 1
+                    continue
+                key, rule_config, page, error = entry
+                if error is not None:
+                    yield key, ("", "", None), error
+                else:
+                    yield key, extract_with_rule(page, rule_config), None
+            return
+
+        workers = parse_workers or os.cpu_count() or 1
+        pool = get_parse_pool(workers)
+        max_in_flight = 2 * workers
+        in_flight = {}
+        while finished < fetch_workers or in_flight:
+            # Hand fetched pages to the pool while there is room, without blocking on the queue
+            while finished < fetch_workers and len(in_flight) < max_in_flight:
+                try:
+                    entry = pages.get(timeout=0 if in_flight else 0.05)
+                except queue.Empty:
+                    break
+                if entry is _DONE:
+                    finished += 1
+                    continue
+                key, rule_config, page, error = entry
+                if error is not None:
+                    yield key, ("", "", None), error
+                    continue
+                in_flight[pool.submit(extract_with_rule, page, rule_config)] = key
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = in_flight.pop(future)
+                try:
+                    yield key, future.result(), None
+                except Exception as e:
+                    yield key, ("", "", None), str(e)
+    finally:
+        stop.set()
+        # Unblock fetchers still waiting to put
+        while True:
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                break
+        for thread in threads:
+            thread.join(timeout=1)
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+
+def parse_date(value, end_of_day=False):
+    """
+    Parse 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' filter values.
+    A bare date used as an upper bound covers the whole day.
+
+    Raises:
+        ValueError: When the value matches neither format.
+    """
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if end_of_day and fmt == '%Y-%m-%d':
+            parsed += timedelta(days=1)
+        return parsed
+    raise ValueError(f'无效的日期: {value}')
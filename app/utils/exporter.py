@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models import OpinionData, OpinionDetail
+from app.utils.dates import parse_date
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Column order shared by every export format
+EXPORT_COLUMNS = [
+    ('id', OpinionData.id),
+    ('keyword', OpinionData.keyword),
+    ('title', OpinionData.title),
+    ('url', OpinionData.url),
+    ('original_url', OpinionData.original_url),
+    ('source', OpinionData.source),
+    ('cover_url', OpinionData.cover_url),
+    ('content', OpinionData.content),
+    ('is_deep_crawled', OpinionData.is_deep_crawled),
+    ('sentiment_score', OpinionData.sentiment_score),
+    ('created_at', OpinionData.created_at),
+    ('updated_at', OpinionData.updated_at),
+    ('detail_title', OpinionDetail.title),
+    ('detail_content', OpinionDetail.content),
+]
+
+
+class ExportError(Exception):
+    pass
+
+
+def build_export_query(keyword=None, source=None, date_from=None, date_to=None):
+    """
+    Build the SELECT for OpinionData LEFT JOIN OpinionDetail.
+    Plain columns are selected instead of ORM entities so rows never enter the identity map.
+    """
+    stmt = select(*[column.label(name) for name, column in EXPORT_COLUMNS]).outerjoin(
+        OpinionDetail, OpinionDetail.opinion_id == OpinionData.id
+    )
+
+    if keyword:
+        stmt = stmt.where(OpinionData.keyword.contains(keyword) |
+                          OpinionData.title.contains(keyword) |
+                          OpinionData.content.contains(keyword))
+    if source:
+        stmt = stmt.where(OpinionData.source.contains(source))
+
+    try:
+        start = parse_date(date_from)
+        end = parse_date(date_to, end_of_day=True)
+    except ValueError as e:
+        raise ExportError(str(e)) from e
+    if start:
+        stmt = stmt.where(OpinionData.created_at >= start)
+    if end:
+        stmt = stmt.where(OpinionData.created_at < end)
+
+    return stmt.order_by(OpinionData.id)
+
+
+def iter_export_rows(stmt, batch_size=1000):
+    """
+    Yield lists of row dicts, fetching `batch_size` rows at a time through a server-side cursor.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield [dict(row._mapping) for row in partition]
+    finally:
+        result.close()
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _csv_chunks(batches):
+    columns = [name for name, _ in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens Chinese text correctly
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for rows in batches:
+        for row in rows:
+            writer.writerow(['' if row[c] is None else _format_value(row[c]) for c in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+
+def _jsonl_chunks(batches):
+    for rows in batches:
+        lines = [json.dumps({k: _format_value(v) for k, v in row.items()}, ensure_ascii=False)
+                 for row in rows]
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_chunks(batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Parquet 导出需要安装 pyarrow')
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('keyword', pa.string()),
+        ('title', pa.string()),
+        ('url', pa.string()),
+        ('original_url', pa.string()),
+        ('source', pa.string()),
+        ('cover_url', pa.string()),
+        ('content', pa.string()),
+        ('is_deep_crawled', pa.bool_()),
+        ('sentiment_score', pa.float64()),
+        ('created_at', pa.timestamp('s')),
+        ('updated_at', pa.timestamp('s')),
+        ('detail_title', pa.string()),
+        ('detail_content', pa.string()),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for rows in batches:
+            # Each batch becomes its own row group, so memory stays bounded by batch_size
+            columns = {name: [row[name] for row in rows] for name in schema.names}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt, batches, compress=None):
+    """
+    Serialize row batches to a stream of bytes in the requested format.
+
+    Args:
+        fmt (str): 'csv', 'jsonl' or 'parquet'.
+        batches (iterable): Lists of row dicts, e.g. from iter_export_rows.
+        compress (str): 'gzip' to compress on the fly. Ignored for parquet,
+            which compresses its column chunks itself.
+
+    Returns:
+        generator: bytes chunks.
+    """
+    if fmt == 'csv':
+        chunks = _csv_chunks(batches)
+    elif fmt == 'jsonl':
+        chunks = _jsonl_chunks(batches)
+    elif fmt == 'parquet':
+        chunks = _parquet_chunks(batches)
+    else:
+        raise ExportError(f'不支持的导出格式: {fmt}')
+
+    if compress == 'gzip' and fmt != 'parquet':
+        chunks = _gzip_chunks(chunks)
+    return chunks
+
+
+def export_filename(fmt, compress=None):
+    name = f"opinion_data_{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    if compress == 'gzip' and fmt != 'parquet':
+        name += '.gz'
+    return name
+
+
+def check_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f'不支持的导出格式: {fmt}')
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError('Parquet 导出需要安装 pyarrow')
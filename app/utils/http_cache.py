@@ -0,0 +1,75 @@
+"""
+Conditional GETs for list endpoints.
+
+A table's version is (row count, max id, max updated_at, explicit version),
+read with one aggregate query. @etag_from_tables(*models) turns the versions of the tables a
+list is built from, plus the full request path, into a weak ETag. A request
+whose If-None-Match matches it gets a 304 before the view runs, so an
+unchanged grid costs one aggregate query per table instead of the page query,
+the count and the serialization. The version is read before the view, so a
+change in between only makes the next request miss.
+
+The version sees inserts and deletes through the count and max id, and
+updates through updated_at (set by onupdate). Bulk writes that keep updated_at
+on purpose, like sentiment scores and topic assignments, call bump_version()
+in the same transaction, which increments the table's row in table_versions.
+"""
+import hashlib
+from functools import wraps
+
+from flask import Response, request
+from flask_login import current_user
+from sqlalchemy import func, select
+
+from app import db
+from app.models import TableVersion
+from app.utils.upsert import insert_or_add
+
+
+def bump_version(*models):
+    """Mark the models' tables as changed by a write that count, max id and updated_at do not show."""
+    db.session.execute(insert_or_add(TableVersion.__table__, ['name'], ['version']),
+                       [{'name': model.__tablename__, 'version': 1} for model in models])
+
+
+def table_version(*models):
+    """
+    [(count, max id[, max updated_at], explicit version)] per model, updated_at only
+    for models that have it.
+    """
+    versions = []
+    for model in models:
+        columns = [func.count(), func.max(model.id)]
+        if hasattr(model, 'updated_at'):
+            columns.append(func.max(model.updated_at))
+        columns.append(select(TableVersion.version).where(TableVersion.name == model.__tablename__)
+                       .scalar_subquery())
+        versions.append(tuple(db.session.execute(select(*columns).select_from(model)).one()))
+    return versions
+
+
+def etag_from_tables(*models):
+    """
+    Answer If-None-Match with 304 while the listed tables are unchanged, and
+    send the ETag with every 200.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            key = f'{table_version(*models)}|{request.full_path}|{current_user.get_id()}'
+            etag = hashlib.md5(key.encode('utf-8')).hexdigest()
+            # Weak: the compression middleware may send the same list gzipped
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                return response
+            response = view(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
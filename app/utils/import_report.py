@@ -0,0 +1,69 @@
+"""
+Where startup time goes.
+
+run_importtime() runs a statement (by default create_app()) in a fresh
+interpreter under `python -X importtime` and parses the per-module timings it
+prints to stderr. `flask import-report` shows the slowest modules; the startup
+benchmark (benchmarks/startup.py) uses the totals.
+
+Heavy scraping and analysis dependencies (requests, bs4, lxml, numpy) and
+alembic are meant to load on first use, not at startup; HEAVY_MODULES lists
+them so the report can say when one of them crept back in.
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+STARTUP_STATEMENT = 'from app import create_app; create_app()'
+HEAVY_MODULES = ('requests', 'bs4', 'lxml', 'numpy', 'alembic', 'flask_migrate')
+
+# self and cumulative in microseconds; depth 0 for modules imported by the statement itself
+ImportTiming = namedtuple('ImportTiming', 'module self_us cumulative_us depth')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$')
+
+
+def parse_importtime(stderr):
+    """[ImportTiming] for each `-X importtime` line of stderr, in the order printed."""
+    timings = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return timings
+
+
+def project_root():
+    """The directory the `app` package lives in."""
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_importtime(statement=STARTUP_STATEMENT, env=None):
+    """
+    Run statement in a new interpreter with -X importtime.
+
+    Returns:
+        list: ImportTiming per imported module.
+    Raises:
+        RuntimeError: When the statement fails.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=project_root(),
+                            env=dict(os.environ if env is None else env), capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if not _LINE.match(line)]
+        raise RuntimeError('\n'.join(lines[-20:]) or f'exit status {result.returncode}')
+    return parse_importtime(result.stderr)
+
+
+def total_us(timings):
+    """Import time of the whole statement: the cumulative times of its top-level imports."""
+    return sum(t.cumulative_us for t in timings if t.depth == 0)
+
+
+def heavy_loaded(timings):
+    """The HEAVY_MODULES packages that were imported."""
+    loaded = {t.module.split('.')[0] for t in timings}
+    return [name for name in HEAVY_MODULES if name in loaded]
@@ -0,0 +1,307 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.models import OpinionData
+from app.utils.keyword_index import index_documents
+from app.utils.rollups import add_rows
+from app.utils.text import item_text
+
+# Query parameters that only track the click and never identify the article
+TRACKING_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                   'spm', 'from', 'share_token')
+
+MAX_REJECTS_REPORTED = 100
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for de-duplication: trim, lowercase scheme/host,
+    drop the fragment and tracking parameters.
+    """
+    if not url:
+        return ''
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/',
+                       urlencode(query), ''))
+
+
+def open_text_stream(stream, filename=''):
+    """
+    Wrap a binary stream as text, transparently un-gzipping `.gz` uploads.
+    """
+    if filename.endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def iter_ndjson(text_stream):
+    """
+    Yield (line_no, record, error) for every non-empty NDJSON line.
+    """
+    for line_no, line in enumerate(text_stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'JSON 解析失败: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, '每行必须是一个 JSON 对象'
+            continue
+        yield line_no, record, None
+
+
+def iter_csv(text_stream):
+    """
+    Yield (line_no, record, error) for every CSV row (header row required).
+    """
+    reader = csv.DictReader(text_stream)
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+def iter_records(stream, fmt, filename=''):
+    text_stream = open_text_stream(stream, filename)
+    if fmt == 'csv':
+        return iter_csv(text_stream)
+    return iter_ndjson(text_stream)
+
+
+def guess_format(filename='', mimetype=''):
+    name = filename[:-3] if filename.endswith('.gz') else filename
+    if name.endswith('.csv') or 'csv' in (mimetype or ''):
+        return 'csv'
+    return 'ndjson'
+
+
+def to_item(record, default_keyword=None):
+    """
+    Map an external record onto the scraper item shape expected by is_valid_item.
+    Accepts both scraper field names (cover, summary) and model/export names (cover_url, content).
+    """
+    def text(*keys):
+        for key in keys:
+            value = record.get(key)
+            if value not in (None, ''):
+                return str(value)
+        return ''
+
+    return {
+        'keyword': text('keyword') or default_keyword,
+        'title': text('title'),
+        'url': text('url'),
+        'original_url': text('original_url', 'url'),
+        'source': text('source'),
+        'cover': text('cover', 'cover_url'),
+        'summary': text('summary', 'content'),
+    }
+
+
+def existing_urls(urls):
+    """
+    Return the subset of `urls` already stored as OpinionData.original_url, in one query.
+    """
+    if not urls:
+        return set()
+    rows = db.session.execute(
+        select(OpinionData.original_url).where(OpinionData.original_url.in_(list(urls)))
+    )
+    return {row[0] for row in rows}
+
+
+def dedup_items(items):
+    """
+    Normalize `original_url` in place and split a chunk into (new_items, duplicate_count),
+    checking both the chunk itself and the database with a single IN query.
+    """
+    seen = set()
+    candidates = []
+    lookup = set()
+    duplicates = 0
+    for item in items:
+        raw_url = (item.get('original_url') or '').strip()
+        url = normalize_url(raw_url)
+        item['original_url'] = url
+        if url and url in seen:
+            duplicates += 1
+            continue
+        seen.add(url)
+        candidates.append((item, raw_url))
+        if url:
+            # Rows saved before normalization existed are stored verbatim
+            lookup.update((url, raw_url))
+
+    stored = existing_urls(lookup)
+    new_items = []
+    for item, raw_url in candidates:
+        if item['original_url'] and (item['original_url'] in stored or raw_url in stored):
+            duplicates += 1
+        else:
+            new_items.append(item)
+    return new_items, duplicates
+
+
+def _insert_rows(rows):
+    """
+    Insert OpinionData rows and return their ids in row order.
+
+    Uses one executemany with RETURNING where the dialect supports it (SQLite,
+    PostgreSQL). MySQL has no RETURNING: rows are inserted in one executemany
+    and their ids read back by original_url; rows without a URL are inserted
+    one by one.
+    """
+    bind = db.session.get_bind()
+    if bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.session.scalars(
+            insert(OpinionData).returning(OpinionData.id, sort_by_parameter_order=True), rows
+        ).all()
+
+    keyed = [row for row in rows if row['original_url']]
+    by_url = {}
+    if keyed:
+        db.session.execute(insert(OpinionData), keyed)
+        # The newest id wins if another writer stored the same URL meanwhile
+        by_url = dict(db.session.execute(
+            select(OpinionData.original_url, func.max(OpinionData.id))
+            .where(OpinionData.original_url.in_({row['original_url'] for row in keyed}))
+            .group_by(OpinionData.original_url)
+        ).all())
+    ids = []
+    for row in rows:
+        if row['original_url']:
+            ids.append(by_url[row['original_url']])
+        else:
+            ids.append(db.session.execute(insert(OpinionData).values(**row)).inserted_primary_key[0])
+    return ids
+
+
+def insert_items(items):
+    """
+    Insert scraper-shaped items with a single executemany statement (see _insert_rows).
+    """
+    if not items:
+        return 0
+    # numpy-backed, loaded on the first insert instead of at startup
+    from app.utils.clustering import assign_new_items
+    from app.utils.sentiment import score_texts
+
+    now = datetime.now()
+    rows = [{
+        'keyword': item.get('keyword'),
+        'title': item.get('title'),
+        'url': item.get('url'),
+        'original_url': item.get('original_url'),
+        'source': item.get('source'),
+        'cover_url': item.get('cover'),
+        'content': item.get('content', item.get('summary')),
+        'is_deep_crawled': bool(item.get('is_deep_crawled', False)),
+        'created_at': now,
+    } for item in items]
+    texts = [item_text(row['title'], row['content']) for row in rows]
+    for row, score in zip(rows, score_texts(texts)):
+        row['sentiment_score'] = score
+    ids = _insert_rows(rows)
+    add_rows(rows)
+    index_documents(zip(ids, texts))
+    assign_new_items(ids)
+    return len(rows)
+
+
+class ImportStats:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def reject(self, line_no, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_REPORTED:
+            self.rejects.append({'line': line_no, 'reason': reason})
+
+    def to_dict(self, with_rejects=False):
+        data = {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+        }
+        if with_rejects:
+            data['rejects'] = self.rejects
+        return data
+
+
+def import_records(records, chunk_size=500, commit_chunks=20, default_keyword=None):
+    """
+    Validate, de-duplicate and insert records chunk by chunk.
+
+    Args:
+        records (iterable): (line_no, record, error) tuples from iter_records.
+        chunk_size (int): Records de-duplicated and inserted per statement.
+        commit_chunks (int): Chunks per transaction.
+        default_keyword (str): Keyword for records that carry none.
+
+    Yields:
+        ImportStats: The running stats after each chunk (the same object every time).
+    """
+    from app.utils.scraper import is_valid_item
+
+    stats = ImportStats()
+    chunk = []
+    pending_chunks = 0
+
+    def flush():
+        new_items, duplicates = dedup_items(chunk)
+        stats.duplicates += duplicates
+        stats.inserted += insert_items(new_items)
+        chunk.clear()
+
+    try:
+        for line_no, record, error in records:
+            stats.processed += 1
+            if error:
+                stats.reject(line_no, error)
+                continue
+
+            item = to_item(record, default_keyword)
+            if not item['title']:
+                stats.reject(line_no, '缺少标题')
+                continue
+            if not is_valid_item(item):
+                stats.reject(line_no, '有效字段不足')
+                continue
+
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                flush()
+                pending_chunks += 1
+                if pending_chunks >= commit_chunks:
+                    db.session.commit()
+                    pending_chunks = 0
+                yield stats
+
+        if chunk:
+            flush()
+        db.session.commit()
+        yield stats
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,304 @@
+"""
+Incrementally maintained TF-IDF index over OpinionData.
+
+index_terms holds document frequencies, index_postings is the inverted index
+(term -> documents with term frequency) and index_documents keeps each
+document's top TF-IDF weights as a precomputed, L2-normalized sparse vector.
+Keywords are read straight from that vector; related articles are found by
+probing the inverted index with the document's strongest terms and taking the
+cosine against the candidates' stored vectors. Vectors use the document
+frequencies at the time a document was indexed; `flask reindex-keywords`
+rebuilds everything against the current statistics.
+"""
+import hashlib
+import heapq
+import json
+import math
+from collections import Counter, defaultdict
+
+from sqlalchemy import bindparam, delete, func, insert, select
+
+from app import db
+from app.models import IndexDocument, IndexPosting, IndexTerm, OpinionData, OpinionDetail
+from app.utils.text import item_text, tokenize
+from app.utils.upsert import insert_ignore
+
+# Terms kept per document vector
+VECTOR_TERMS = 64
+# Strongest terms of a document used to probe the inverted index for related articles
+PROBE_TERMS = 16
+# Upper bound on candidate documents scored per related-articles lookup
+MAX_CANDIDATES = 2000
+# Bound for IN (...) lists, below SQLite's variable limit
+IN_CHUNK = 500
+
+
+def _chunks(values, size=IN_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _idf(n_docs, df):
+    return math.log((1 + n_docs) / (1 + df)) + 1.0
+
+
+def build_vector(tf_counts, dfs, n_docs):
+    """
+    Sublinear TF-IDF weights for one document, trimmed to VECTOR_TERMS and L2-normalized.
+
+    Args:
+        tf_counts (dict): term_id -> term frequency.
+        dfs (dict): term_id -> document frequency.
+        n_docs (int): Number of indexed documents.
+
+    Returns:
+        dict: term_id -> weight.
+    """
+    weights = {t: (1 + math.log(tf)) * _idf(n_docs, dfs.get(t, 1)) for t, tf in tf_counts.items()}
+    top = heapq.nlargest(VECTOR_TERMS, weights.items(), key=lambda kv: kv[1])
+    norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+    return {t: round(w / norm, 6) for t, w in top}
+
+
+def _load_vector(doc):
+    if not doc or not doc.vector:
+        return {}
+    return {int(t): w for t, w in json.loads(doc.vector).items()}
+
+
+def _term_ids(terms):
+    """
+    Return term -> id, creating missing terms with df 0.
+    Another indexer may create the same terms concurrently, so the insert skips
+    existing ones and the ids are read back afterwards.
+    """
+    ids = {}
+    for chunk in _chunks(terms):
+        for term_id, term in db.session.execute(
+                select(IndexTerm.id, IndexTerm.term).where(IndexTerm.term.in_(chunk))):
+            ids[term] = term_id
+    missing = [t for t in terms if t not in ids]
+    if missing:
+        db.session.execute(insert_ignore(IndexTerm.__table__, ['term']), [{'term': t, 'df': 0} for t in missing])
+        for chunk in _chunks(missing):
+            for term_id, term in db.session.execute(
+                    select(IndexTerm.id, IndexTerm.term).where(IndexTerm.term.in_(chunk))):
+                ids[term] = term_id
+    return ids
+
+
+def _adjust_df(deltas):
+    """Apply {term_id: delta} document-frequency changes with one executemany."""
+    deltas = [{'b_id': t, 'b_delta': d} for t, d in deltas.items() if d]
+    if not deltas:
+        return
+    table = IndexTerm.__table__
+    db.session.execute(
+        table.update().where(table.c.id == bindparam('b_id')).values(df=table.c.df + bindparam('b_delta')),
+        deltas
+    )
+
+
+def _drop_postings(opinion_ids):
+    """Remove postings for documents, returning the df decrements they imply."""
+    deltas = Counter()
+    for chunk in _chunks(opinion_ids):
+        for (term_id,) in db.session.execute(
+                select(IndexPosting.term_id).where(IndexPosting.opinion_id.in_(chunk))):
+            deltas[term_id] -= 1
+        db.session.execute(delete(IndexPosting).where(IndexPosting.opinion_id.in_(chunk)))
+    return deltas
+
+
+def index_documents(docs):
+    """
+    Add or refresh documents in the index. Unchanged documents are skipped.
+
+    Args:
+        docs (iterable): (opinion_id, text) pairs.
+
+    Returns:
+        int: Number of documents (re)indexed.
+    """
+    texts = {}
+    for opinion_id, text in docs:
+        texts[opinion_id] = text or ''
+    if not texts:
+        return 0
+
+    hashes = {i: hashlib.sha1(t.encode('utf-8')).hexdigest() for i, t in texts.items()}
+    existing = {}
+    for chunk in _chunks(texts):
+        for doc in IndexDocument.query.filter(IndexDocument.opinion_id.in_(chunk)):
+            existing[doc.opinion_id] = doc
+    changed = [i for i in texts if i not in existing or existing[i].content_hash != hashes[i]]
+    if not changed:
+        return 0
+
+    deltas = _drop_postings([i for i in changed if i in existing])
+
+    counts = {i: Counter(term[:64] for term in tokenize(texts[i])) for i in changed}
+    term_ids = _term_ids(sorted({term for c in counts.values() for term in c}))
+
+    tf_by_doc = {}
+    postings = []
+    for opinion_id, counter in counts.items():
+        tfs = {term_ids[term]: tf for term, tf in counter.items()}
+        tf_by_doc[opinion_id] = tfs
+        for term_id, tf in tfs.items():
+            postings.append({'term_id': term_id, 'opinion_id': opinion_id, 'tf': tf})
+            deltas[term_id] += 1
+    _adjust_df(deltas)
+    if postings:
+        db.session.execute(insert(IndexPosting), postings)
+
+    dfs = {}
+    for chunk in _chunks({t for tfs in tf_by_doc.values() for t in tfs}):
+        dfs.update(db.session.execute(select(IndexTerm.id, IndexTerm.df).where(IndexTerm.id.in_(chunk))).all())
+    n_docs = db.session.scalar(select(func.count()).select_from(IndexDocument)) + \
+        sum(1 for i in changed if i not in existing)
+
+    for opinion_id in changed:
+        vector = json.dumps(build_vector(tf_by_doc[opinion_id], dfs, n_docs))
+        doc = existing.get(opinion_id)
+        if doc is None:
+            doc = IndexDocument(opinion_id=opinion_id)
+            db.session.add(doc)
+        doc.content_hash = hashes[opinion_id]
+        doc.length = sum(tf_by_doc[opinion_id].values())
+        doc.vector = vector
+    return len(changed)
+
+
+def index_items(items):
+    """Index OpinionData objects (uses the deep-crawled body when loaded)."""
+    return index_documents(
+        (item.id, item_text(item.title, item.content, item.detail.content if item.detail else None))
+        for item in items
+    )
+
+
+def remove_documents(opinion_ids):
+    """Drop documents from the index and decrement their terms' document frequencies."""
+    opinion_ids = list(opinion_ids)
+    if not opinion_ids:
+        return
+    _adjust_df(_drop_postings(opinion_ids))
+    for chunk in _chunks(opinion_ids):
+        db.session.execute(delete(IndexDocument).where(IndexDocument.opinion_id.in_(chunk)))
+
+
+def top_keywords(opinion_id, k=10):
+    """
+    Top-k TF-IDF keywords of a document from its precomputed vector.
+
+    Returns:
+        list: [{'term': str, 'weight': float}], strongest first.
+    """
+    vector = _load_vector(db.session.get(IndexDocument, opinion_id))
+    top = heapq.nlargest(k, vector.items(), key=lambda kv: kv[1])
+    if not top:
+        return []
+    terms = dict(db.session.execute(
+        select(IndexTerm.id, IndexTerm.term).where(IndexTerm.id.in_([t for t, _ in top]))).all())
+    return [{'term': terms[t], 'weight': w} for t, w in top if t in terms]
+
+
+def related_articles(opinion_id, k=5):
+    """
+    Most cosine-similar documents, found through the inverted index.
+
+    Returns:
+        list: [{'id', 'title', 'source', 'score'}], most similar first.
+    """
+    query_vector = _load_vector(db.session.get(IndexDocument, opinion_id))
+    if not query_vector:
+        return []
+    probe = [t for t, _ in heapq.nlargest(PROBE_TERMS, query_vector.items(), key=lambda kv: kv[1])]
+
+    # Documents sharing the most probe terms are the likeliest neighbours
+    overlap = func.count(IndexPosting.term_id)
+    candidate_ids = [row[0] for row in db.session.execute(
+        select(IndexPosting.opinion_id)
+        .where(IndexPosting.term_id.in_(probe), IndexPosting.opinion_id != opinion_id)
+        .group_by(IndexPosting.opinion_id)
+        .order_by(overlap.desc())
+        .limit(MAX_CANDIDATES)
+    )]
+    if not candidate_ids:
+        return []
+
+    scores = []
+    for chunk in _chunks(candidate_ids):
+        for doc in IndexDocument.query.filter(IndexDocument.opinion_id.in_(chunk)):
+            vector = _load_vector(doc)
+            score = sum(w * vector.get(t, 0.0) for t, w in query_vector.items())
+            if score > 0:
+                scores.append((score, doc.opinion_id))
+    top = heapq.nlargest(k, scores)
+    if not top:
+        return []
+
+    items = {item.id: item for item in OpinionData.query.filter(OpinionData.id.in_([i for _, i in top]))}
+    return [{'id': i, 'title': items[i].title, 'source': items[i].source, 'score': round(score, 4)}
+            for score, i in top if i in items]
+
+
+def refresh_vectors(batch_size=1000):
+    """
+    Recompute every stored vector from the postings with the current document frequencies.
+    """
+    n_docs = db.session.scalar(select(func.count()).select_from(IndexDocument))
+    last_id = 0
+    while True:
+        docs = IndexDocument.query.filter(IndexDocument.opinion_id > last_id) \
+            .order_by(IndexDocument.opinion_id).limit(batch_size).all()
+        if not docs:
+            return
+        last_id = docs[-1].opinion_id
+        tf_by_doc = defaultdict(dict)
+        dfs = {}
+        rows = db.session.execute(
+            select(IndexPosting.opinion_id, IndexPosting.term_id, IndexPosting.tf, IndexTerm.df)
+            .join(IndexTerm, IndexTerm.id == IndexPosting.term_id)
+            .where(IndexPosting.opinion_id.in_([d.opinion_id for d in docs]))
+        )
+        for opinion_id, term_id, tf, df in rows:
+            tf_by_doc[opinion_id][term_id] = tf
+            dfs[term_id] = df
+        for doc in docs:
+            doc.vector = json.dumps(build_vector(tf_by_doc[doc.opinion_id], dfs, n_docs))
+        db.session.commit()
+
+
+def rebuild_index(batch_size=1000, progress=None):
+    """
+    Drop and rebuild the whole index, then refresh vectors against the final statistics.
+
+    Returns:
+        int: Number of documents indexed.
+    """
+    db.session.execute(delete(IndexPosting))
+    db.session.execute(delete(IndexDocument))
+    db.session.execute(delete(IndexTerm))
+    db.session.commit()
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(OpinionData.id, OpinionData.title, OpinionData.content, OpinionDetail.content)
+            .outerjoin(OpinionDetail, OpinionDetail.opinion_id == OpinionData.id)
+            .where(OpinionData.id > last_id).order_by(OpinionData.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        total += index_documents((row[0], item_text(row[1], row[2], row[3])) for row in rows)
+        db.session.commit()
+        if progress:
+            progress(total)
+
+    refresh_vectors(batch_size=batch_size)
+    return total
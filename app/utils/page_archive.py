@@ -0,0 +1,226 @@
+"""
+Append-only archive of fetched pages.
+
+Pages are stored as WARC `resource` records, one gzip member per record, in
+numbered segment files (segment-000001.warc.gz, ...) that roll over at a size
+limit; concatenated members keep every segment a valid .warc.gz. A fixed-width
+index (index.bin: URL digest, segment, offset, length, fetch time) points at
+the latest record per URL, so a page is read back by mmapping its segment and
+inflating one member, without scanning anything.
+
+Appends take a file lock, so several worker processes can share one archive.
+Readers pick up new index entries whenever the index file has grown.
+"""
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+# url md5, segment number, offset, member length, fetched_at (epoch seconds)
+INDEX_ENTRY = struct.Struct('<16sIQId')
+INDEX_FILE = 'index.bin'
+LOCK_FILE = 'archive.lock'
+_SEGMENT_NAME = re.compile(r'^segment-(\d{6})\.warc\.gz$')
+
+Location = namedtuple('Location', 'segment offset length fetched_at')
+ArchivedPage = namedtuple('ArchivedPage', 'url final_url status fetched_at html')
+
+
+def url_digest(url):
+    return hashlib.md5(url.encode('utf-8')).digest()
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, f'segment-{segment:06d}.warc.gz')
+
+
+def _record(url, html, status, final_url, fetched_at):
+    body = html.encode('utf-8')
+    headers = [
+        'WARC/1.1',
+        'WARC-Type: resource',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+        f'WARC-Date: {datetime.fromtimestamp(fetched_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}',
+        f'WARC-Target-URI: {url}',
+        f'X-Final-URI: {final_url or url}',
+        f'X-Status: {status}',
+        'Content-Type: text/html; charset=utf-8',
+        f'Content-Length: {len(body)}',
+    ]
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8') + body + b'\r\n\r\n'
+
+
+def parse_record(member):
+    """Decode one gzip member holding a record written by PageArchive.append()."""
+    data = zlib.decompressobj(wbits=31).decompress(member)
+    head, _, rest = data.partition(b'\r\n\r\n')
+    headers = {}
+    for line in head.decode('utf-8').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = rest[:int(headers['content-length'])]
+    return ArchivedPage(
+        url=headers.get('warc-target-uri'),
+        final_url=headers.get('x-final-uri'),
+        status=int(headers.get('x-status') or 0),
+        # WARC dates are UTC; the rest of the app uses naive local times
+        fetched_at=datetime.strptime(headers['warc-date'], '%Y-%m-%dT%H:%M:%SZ')
+        .replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None),
+        html=body.decode('utf-8'),
+    )
+
+
+class SegmentReader:
+    """mmapped segment files, remapped when a wanted record lies past the mapped end."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.maps = {}
+
+    def read(self, segment, offset, length):
+        mapped = self.maps.get(segment)
+        if mapped is None or len(mapped[1]) < offset + length:
+            if mapped is not None:
+                mapped[1].close()
+                mapped[0].close()
+            f = open(segment_path(self.directory, segment), 'rb')
+            mapped = self.maps[segment] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return parse_record(mapped[1][offset:offset + length])
+
+    def close(self):
+        for f, mm in self.maps.values():
+            mm.close()
+            f.close()
+        self.maps.clear()
+
+
+class PageArchive:
+    """
+    Args:
+        directory (str): Where segments and the index live; created on first write.
+        segment_bytes (int): Size after which appends start a new segment.
+    """
+
+    def __init__(self, directory, segment_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_read = 0
+        self._reader = SegmentReader(directory)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        found = (_SEGMENT_NAME.match(name) for name in os.listdir(self.directory))
+        return sorted(int(m.group(1)) for m in found if m)
+
+    def append(self, url, html, status=200, final_url=None, fetched_at=None):
+        """
+        Store one fetched page.
+
+        Returns:
+            Location
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        member = gzip.compress(_record(url, html or '', status, final_url, fetched_at), compresslevel=6)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = self._segments()
+            segment = segments[-1] if segments else 1
+            path = segment_path(self.directory, segment)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                segment += 1
+                path = segment_path(self.directory, segment)
+            with open(path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(member)
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_ENTRY.pack(url_digest(url), segment, offset, len(member), fetched_at))
+        return Location(segment, offset, len(member), fetched_at)
+
+    def _refresh(self):
+        """Read index entries appended since the last call, by this or another process."""
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            return
+        # Ignore a torn trailing entry; it is complete on the next call
+        size -= size % INDEX_ENTRY.size
+        if size <= self._index_read:
+            return
+        with open(self.index_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for digest, segment, offset, length, fetched_at in INDEX_ENTRY.iter_unpack(mm[self._index_read:size]):
+                self._index[digest] = Location(segment, offset, length, fetched_at)
+        self._index_read = size
+
+    def locate(self, url):
+        """Location of the latest record for url, or None."""
+        if not url:
+            return None
+        with self._lock:
+            self._refresh()
+            return self._index.get(url_digest(url))
+
+    def get(self, url):
+        """Latest archived page for url, or None."""
+        location = self.locate(url)
+        if location is None:
+            return None
+        return self.read(location)
+
+    def read(self, location):
+        with self._lock:
+            return self._reader.read(location.segment, location.offset, location.length)
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            urls = len(self._index)
+            records = self._index_read // INDEX_ENTRY.size
+        segments = self._segments()
+        return {
+            'segments': len(segments),
+            'bytes': sum(os.path.getsize(segment_path(self.directory, s)) for s in segments),
+            'records': records,
+            'urls': urls,
+        }
+
+    def close(self):
+        with self._lock:
+            self._reader.close()
+
+
+_init_lock = threading.Lock()
+
+
+def get_archive(app):
+    """The application's archive, or None when PAGE_ARCHIVE_DIR is empty."""
+    directory = app.config.get('PAGE_ARCHIVE_DIR')
+    if not directory:
+        return None
+    with _init_lock:
+        archive = app.extensions.get('page_archive')
+        if archive is None:
+            archive = app.extensions['page_archive'] = PageArchive(
+                directory, segment_bytes=app.config['PAGE_ARCHIVE_SEGMENT_MB'] * 1024 * 1024)
+        return archive
@@ -0,0 +1,282 @@
+"""
+On-demand request profiling.
+
+A request is profiled when an admin asks for it (X-Profile header or _profile
+query parameter: 1/sample or cprofile) or when it is drawn at
+PROFILER_SAMPLE_RATE. Two modes:
+
+    sample    a thread snapshots the request thread's stack every
+              PROFILER_INTERVAL_MS; written as collapsed stacks (<id>.folded,
+              input for flamegraph.pl or speedscope). Cheap enough for sampling.
+    cprofile  deterministic cProfile; written as <id>.prof (pstats, for
+              snakeviz or flameprof). Slows the request down noticeably.
+
+Either way every SQL statement the request runs is timed, and a summary
+(<id>.json) with the statement table and the hottest functions is stored next
+to the raw output in PROFILER_DIR, newest PROFILER_KEEP kept. Streamed
+responses are profiled until the stream is closed. Browse them under
+/admin/profiles.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+from app.utils.query_accounting import normalize_sql, start_log, stop_log
+
+MODES = ('sample', 'cprofile')
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+# Statements and functions listed in a summary
+TOP_N = 50
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        root = os.getcwd() + os.sep
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename.replace(root, "")}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class RequestProfile:
+    """Profiler and SQL timings of one request."""
+
+    def __init__(self, mode, trigger, interval):
+        self.id = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:8]
+        self.mode = mode
+        self.trigger = trigger
+        self.log = start_log()
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Python 3.12+ runs one cProfile per process; sample this request instead
+                self.mode = 'sample'
+        if self.mode == 'sample':
+            self._profiler = _Sampler(threading.get_ident(), interval)
+            self._profiler.start()
+
+    def stop(self):
+        stop_log(self.log)
+        self.duration = time.perf_counter() - self._started
+        self.cpu = time.thread_time() - self._cpu_started
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+
+    def _sql_summary(self):
+        grouped = defaultdict(lambda: [0, 0.0, 0.0])
+        for statement, seconds in self.log.queries:
+            row = grouped[normalize_sql(statement)]
+            row[0] += 1
+            row[1] += seconds
+            row[2] = max(row[2], seconds)
+        statements = [{'sql': sql, 'count': n, 'total_ms': round(total * 1000, 2), 'max_ms': round(slowest * 1000, 2)}
+                      for sql, (n, total, slowest) in grouped.items()]
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {
+            'count': self.log.count,
+            'total_ms': round(self.log.seconds * 1000, 2),
+            'distinct': len(statements),
+            'statements': statements[:TOP_N],
+        }
+
+    def _top_functions(self):
+        if self.mode == 'cprofile':
+            stats = pstats.Stats(self._profiler).stats
+            rows = [{'function': f'{func} ({os.path.relpath(filename) if filename.startswith("/") else filename}:{line})',
+                     'calls': nc, 'self_ms': round(tt * 1000, 2), 'total_ms': round(ct * 1000, 2)}
+                    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.items()]
+            rows.sort(key=lambda r: r['total_ms'], reverse=True)
+            return rows[:TOP_N]
+        own = Counter()
+        inclusive = Counter()
+        for stack, n in self._profiler.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += n
+            for frame in set(frames):
+                inclusive[frame] += n
+        return [{'function': frame, 'self_samples': own[frame], 'samples': n}
+                for frame, n in inclusive.most_common(TOP_N)]
+
+    def save(self, directory, keep, details):
+        """
+        Write <id>.json and the raw profile, then drop the oldest beyond `keep`.
+
+        Args:
+            details (dict): method, path, endpoint and status of the request.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(os.path.join(directory, f'{self.id}.prof'))
+            samples = None
+        else:
+            with open(os.path.join(directory, f'{self.id}.folded'), 'w', encoding='utf-8') as f:
+                for stack, n in sorted(self._profiler.stacks.items()):
+                    f.write(f'{stack} {n}\n')
+            samples = sum(self._profiler.stacks.values())
+        summary = {
+            'id': self.id,
+            'mode': self.mode,
+            'trigger': self.trigger,
+            **details,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'duration_ms': round(self.duration * 1000, 2),
+            'cpu_ms': round(self.cpu * 1000, 2),
+            'samples': samples,
+            'sql': self._sql_summary(),
+            'functions': self._top_functions(),
+        }
+        with open(os.path.join(directory, f'{self.id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        _prune(directory, keep)
+        return summary
+
+
+def _prune(directory, keep):
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - keep, 0)]:
+        for suffix in ('.json', '.folded', '.prof'):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory):
+    """Stored summaries, newest first, without their statement and function tables."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary['sql'] = {k: v for k, v in summary['sql'].items() if k != 'statements'}
+        summary.pop('functions', None)
+        profiles.append(summary)
+    return profiles
+
+
+def load_profile(directory, profile_id):
+    """Summary of one profile, or None."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(directory, f'{profile_id}.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_file(directory, profile_id):
+    """Path of the raw profile (.folded or .prof), or None."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    for suffix in ('.folded', '.prof'):
+        path = os.path.join(directory, profile_id + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _requested_mode():
+    value = request.headers.get('X-Profile') or request.args.get('_profile')
+    if not value:
+        return None
+    value = value.lower()
+    if value in MODES:
+        return value
+    return 'sample' if value in ('1', 'true', 'yes') else None
+
+
+def _start():
+    config = current_app.config
+    mode = _requested_mode()
+    trigger = 'admin'
+    if mode is not None and not (current_user.is_authenticated and current_user.role.name == 'Admin'):
+        mode = None
+    if mode is None:
+        rate = config['PROFILER_SAMPLE_RATE']
+        if not rate or random.random() >= rate:
+            return
+        mode, trigger = 'sample', 'sampled'
+    g._profile = RequestProfile(mode, trigger, config['PROFILER_INTERVAL_MS'] / 1000)
+
+
+def _finish(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    response.headers['X-Profile-Id'] = profile.id
+    directory, keep = current_app.config['PROFILER_DIR'], current_app.config['PROFILER_KEEP']
+    # done() may run from the close callback, after the app context is gone
+    logger = current_app.logger
+    details = {
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+    }
+
+    def done():
+        profile.stop()
+        try:
+            profile.save(directory, keep, details)
+        except Exception:
+            logger.exception('Error saving profile %s', profile.id)
+
+    if response.is_streamed:
+        response.call_on_close(done)
+    else:
+        done()
+    return response
+
+
+def _abandon(exc):
+    # The request failed before a response was made; stop without saving
+    profile = g.pop('_profile', None)
+    if profile is not None:
+        profile.stop()
+
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_abandon)
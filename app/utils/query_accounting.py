@@ -0,0 +1,176 @@
+"""
+SQL statement accounting on SQLAlchemy cursor events.
+
+A QueryLog records every statement run on the current thread while it is
+active (logs nest: the request log, a profiler, a test's max_queries block).
+Statements are grouped by shape (whitespace collapsed, IN lists folded), so
+the same query issued once per row shows up as one shape with a high count.
+
+init_app() keeps a log per request. A SELECT shape reaching
+QUERY_REPEAT_THRESHOLD runs is logged as a likely N+1 with the traceback of
+the run that crossed the threshold, and a request over QUERY_BUDGET statements
+is logged with its top shapes; 0 turns either check off. Repeated INSERTs and
+UPDATEs are left out of the N+1 check: the ORM flushes new objects one
+statement each on SQLite, and they only count towards the budget. Statement counts also go to the
+http_request_queries histogram on /metrics.
+"""
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.metrics import Histogram
+
+_local = threading.local()
+_PLACEHOLDERS = re.compile(r'\(\?(?:, \?)+\)')
+
+REQUEST_QUERIES = Histogram('http_request_queries', 'SQL statements run per request', ('endpoint',),
+                            buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+
+
+def normalize_sql(statement):
+    """Collapse whitespace and expanded IN lists, so repeats of one query group together."""
+    return _PLACEHOLDERS.sub('(?, ...)', ' '.join(statement.split()))
+
+
+def _is_read(shape):
+    return shape.lstrip('(').split(' ', 1)[0].upper() in ('SELECT', 'WITH')
+
+
+def _app_stack():
+    """The current traceback without SQLAlchemy, Flask and other library frames."""
+    frames = [f for f in traceback.extract_stack()[:-3]
+              if '/lib/python' not in f.filename and not f.filename.startswith('<')]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryLog:
+    """
+    Args:
+        repeat_threshold (int): Capture a traceback when a shape reaches this many runs (0: never).
+    """
+
+    def __init__(self, repeat_threshold=0):
+        self.repeat_threshold = repeat_threshold
+        self.queries = []
+        self.shapes = Counter()
+        self.offenders = {}
+
+    def add(self, statement, seconds):
+        self.queries.append((statement, seconds))
+        shape = normalize_sql(statement)
+        self.shapes[shape] += 1
+        if self.repeat_threshold and self.shapes[shape] == self.repeat_threshold and _is_read(shape):
+            self.offenders[shape] = _app_stack()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(s for _, s in self.queries)
+
+    def repeated(self, threshold):
+        """[(shape, runs)] for SELECT shapes run at least `threshold` times, most frequent first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold and _is_read(shape)]
+
+    def report(self, limit=10):
+        """Shapes by run count, one per line, for assertion and log messages."""
+        return '\n'.join(f'{n:>5}  {shape}' for shape, n in self.shapes.most_common(limit))
+
+
+def start_log(repeat_threshold=0):
+    """Start recording this thread's statements into a new QueryLog."""
+    log = QueryLog(repeat_threshold)
+    logs = getattr(_local, 'logs', None)
+    if logs is None:
+        logs = _local.logs = []
+    logs.append(log)
+    return log
+
+
+def stop_log(log):
+    logs = getattr(_local, 'logs', [])
+    if log in logs:
+        logs.remove(log)
+    return log
+
+
+@contextmanager
+def track(repeat_threshold=0):
+    """Record the statements run inside the block."""
+    log = start_log(repeat_threshold)
+    try:
+        yield log
+    finally:
+        stop_log(log)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'logs', None):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    logs = getattr(_local, 'logs', None)
+    started = conn.info.get('query_started')
+    if logs and started:
+        seconds = time.perf_counter() - started.pop()
+        for log in logs:
+            log.add(statement, seconds)
+
+
+def register_listeners():
+    """Time cursor executions on every engine (idempotent)."""
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+
+def _start():
+    g._query_log = start_log(current_app.config['QUERY_REPEAT_THRESHOLD'])
+
+
+def _finish(response):
+    log = g.pop('_query_log', None)
+    if log is None:
+        return response
+    logger = current_app.logger
+    budget = current_app.config['QUERY_BUDGET']
+    where = f'{request.method} {request.path} ({request.endpoint})'
+    endpoint = request.endpoint or 'unmatched'
+
+    def done():
+        stop_log(log)
+        REQUEST_QUERIES.observe(log.count, endpoint=endpoint)
+        for shape, stack in log.offenders.items():
+            logger.warning('Possible N+1 in %s: ran %d times: %s\n%s', where, log.shapes[shape], shape, stack)
+        if budget and log.count > budget:
+            logger.warning('%s ran %d SQL statements (budget %d):\n%s', where, log.count, budget, log.report())
+
+    if response.is_streamed:
+        response.call_on_close(done)
+    else:
+        done()
+    return response
+
+
+def _abandon(exc):
+    log = g.pop('_query_log', None)
+    if log is not None:
+        stop_log(log)
+
+
+def init_app(app):
+    register_listeners()
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_abandon)
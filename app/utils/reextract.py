@@ -0,0 +1,173 @@
+"""
+Re-run scraping rules over archived pages, without network access.
+
+Items are read by keyset pagination and matched to their rule the same way the
+warehouse deep crawl does (site name = first word of the source, else the whole
+source). Each batch of archive locations goes to a process pool; workers mmap
+the segments themselves, so only locations and results cross the process
+boundary. Results are written from this process only, one commit per batch.
+"""
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import OpinionData, OpinionDetail, ScrapingRule
+from app.utils.keyword_index import index_documents
+from app.utils.page_archive import SegmentReader
+from app.utils.scraper import extract_with_rule
+from app.utils.sentiment import score_texts
+from app.utils.text import item_text
+
+
+def extract_archived(directory, jobs):
+    """
+    Worker: extract title and content from archived pages.
+
+    Args:
+        jobs (list): [(item id, segment, offset, length, rule config or None)]
+
+    Returns:
+        list: [(item id, title, content, rule still stale)]
+    """
+    reader = SegmentReader(directory)
+    out = []
+    try:
+        for item_id, segment, offset, length, rule_config in jobs:
+            page = reader.read(segment, offset, length)
+            title, content, new_rule = extract_with_rule(page.html, rule_config)
+            out.append((item_id, title, content, new_rule is not None))
+    finally:
+        reader.close()
+    return out
+
+
+def _rule_for(rules, source):
+    if not source:
+        return None
+    return rules.get(source.split(' ')[0]) or rules.get(source)
+
+
+def reextract(archive, rule_id=None, batch_size=200, workers=None, dry_run=False, progress=None):
+    """
+    Re-extract archived items and store the changed ones.
+
+    Args:
+        archive (PageArchive): Archive the pages were stored in.
+        rule_id (int): Only items of this rule's site; all archived items by default.
+        batch_size (int): Items per worker batch and per commit.
+        workers (int): Process count; 0 extracts inline in this process.
+        dry_run (bool): Count what would change without writing.
+        progress (callable): Called with the stats dict after each batch.
+
+    Returns:
+        dict: {'scanned', 'archived', 'updated', 'unchanged', 'empty', 'stale'}
+    """
+    rules = {r.site_name: r.to_dict() for r in ScrapingRule.query.all()}
+    condition = None
+    if rule_id is not None:
+        rule = db.session.get(ScrapingRule, rule_id)
+        if rule is None:
+            raise ValueError('规则不存在')
+        rules = {rule.site_name: rule.to_dict()}
+        condition = or_(OpinionData.source == rule.site_name, OpinionData.source.like(f'{rule.site_name} %'))
+
+    stats = {'scanned': 0, 'archived': 0, 'updated': 0, 'unchanged': 0, 'empty': 0, 'stale': 0}
+
+    def batches():
+        last_id = 0
+        while True:
+            stmt = select(OpinionData.id, OpinionData.url, OpinionData.original_url, OpinionData.source) \
+                .where(OpinionData.id > last_id).order_by(OpinionData.id).limit(batch_size)
+            if condition is not None:
+                stmt = stmt.where(condition)
+            rows = db.session.execute(stmt).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            stats['scanned'] += len(rows)
+            jobs = []
+            for row in rows:
+                # The deep crawl archives under item.url first, the analysis page under original_url
+                location = archive.locate(row.url) or archive.locate(row.original_url)
+                if location is None:
+                    continue
+                jobs.append((row.id, location.segment, location.offset, location.length,
+                             _rule_for(rules, row.source)))
+            if jobs:
+                stats['archived'] += len(jobs)
+                yield jobs
+
+    def store(results):
+        stats['stale'] += sum(1 for r in results if r[3])
+        found = {item_id: (title, content) for item_id, title, content, _ in results if title or content}
+        stats['empty'] += len(results) - len(found)
+        if found:
+            items = OpinionData.query.options(joinedload(OpinionData.detail)) \
+                .filter(OpinionData.id.in_(list(found))).all()
+            rescored = []
+            for item in items:
+                title, content = found[item.id]
+                detail = item.detail
+                if detail is not None:
+                    # An empty extraction keeps what is stored, as the live deep crawl does
+                    title, content = title or detail.title, content or detail.content
+                    if (detail.title, detail.content) == (title, content):
+                        stats['unchanged'] += 1
+                        continue
+                stats['updated'] += 1
+                if dry_run:
+                    continue
+                if detail is None:
+                    detail = OpinionDetail(opinion=item)
+                    db.session.add(detail)
+                detail.title = title
+                detail.content = content
+                item.is_deep_crawled = True
+                rescored.append((item, item_text(item.title, item.content, detail.content)))
+            for (item, _), score in zip(rescored, score_texts([text for _, text in rescored])):
+                item.sentiment_score = score
+            if not dry_run:
+                db.session.flush()
+                index_documents((item.id, text) for item, text in rescored)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        if progress:
+            progress(dict(stats))
+
+    if workers == 0:
+        for jobs in batches():
+            store(extract_archived(archive.directory, jobs))
+        return stats
+
+    workers = workers or os.cpu_count() or 1
+    # Spawned, not forked: the web endpoint runs this from a worker thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        max_in_flight = 2 * workers
+        in_flight = set()
+        for jobs in batches():
+            in_flight.add(pool.submit(extract_archived, archive.directory, jobs))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(future.result())
+        for future in in_flight:
+            store(future.result())
+    return stats
+
+
+def reextract_job(ctx, rule_id=None, dry_run=False):
+    """Background task wrapper (app.utils.tasks) using the application's archive."""
+    from flask import current_app
+    from app.utils.page_archive import get_archive
+
+    archive = get_archive(current_app)
+    if archive is None:
+        raise ValueError('未启用网页归档')
+    return reextract(archive, rule_id=rule_id, dry_run=dry_run,
+                     progress=lambda stats: ctx.progress(stats['scanned'], msg=f"已处理 {stats['archived']} 条归档"))
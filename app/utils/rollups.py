@@ -0,0 +1,273 @@
+"""
+Incrementally maintained dashboard rollups over OpinionData.
+
+opinion_rollups holds one row per (granularity, bucket, keyword, source) with
+item counts, deep-crawl counts and sentiment sums, so dashboard trends are read
+from a table whose size depends on the time range and the number of keywords
+and sources, never on the number of collected items.
+
+ORM writes are tracked by session flush events. Core bulk statements bypass the
+ORM, so those paths (import, bulk delete, sentiment backfill) call
+add_rows()/remove_ids()/rescore() themselves. Deep-crawl coverage follows
+OpinionData.is_deep_crawled, which is set together with the OpinionDetail row.
+`flask rebuild-rollups` recomputes everything from scratch.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from app import db
+from app.models import OpinionData, OpinionRollup
+from app.utils.upsert import insert_or_add
+
+GRANULARITIES = ('hour', 'day')
+# OpinionData attributes a rollup row depends on
+TRACKED_FIELDS = ('keyword', 'source', 'created_at', 'is_deep_crawled', 'sentiment_score')
+# Bound for IN (...) lists, below SQLite's variable limit
+IN_CHUNK = 500
+# Unique key and summed columns of opinion_rollups
+ROLLUP_KEY = ('granularity', 'bucket', 'keyword', 'source')
+ROLLUP_COUNTERS = ('item_count', 'deep_count', 'sentiment_sum', 'sentiment_count')
+# Most buckets one trend may zero-fill: 100 days by hour, about 6.5 years by day
+MAX_BUCKETS = 2400
+
+
+def bucket_start(value, granularity):
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_step(granularity):
+    return timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+
+
+def _dim(value):
+    # Dimensions are NOT NULL so the unique key also covers missing values
+    return (value or '').strip()[:128]
+
+
+class RollupDelta:
+    """
+    Pending changes keyed by (granularity, bucket, keyword, source), each a
+    [item_count, deep_count, sentiment_sum, sentiment_count] list.
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0, 0.0, 0])
+
+    def __bool__(self):
+        return any(any(v) for v in self.changes.values())
+
+    def add(self, keyword, source, created_at, is_deep_crawled, sentiment_score, sign=1):
+        if created_at is None:
+            return
+        keyword, source = _dim(keyword), _dim(source)
+        scored = sentiment_score is not None
+        for granularity in GRANULARITIES:
+            change = self.changes[(granularity, bucket_start(created_at, granularity), keyword, source)]
+            change[0] += sign
+            change[1] += sign if is_deep_crawled else 0
+            change[2] += sign * sentiment_score if scored else 0.0
+            change[3] += sign if scored else 0
+
+    def add_row(self, row, sign=1):
+        """row: mapping with the TRACKED_FIELDS keys."""
+        self.add(*(row.get(f) for f in TRACKED_FIELDS), sign=sign)
+
+    def apply(self, connection, fresh=False):
+        """
+        Write the changes. Each row is inserted or, when its key exists, added to the
+        stored counters in the same statement, so concurrent writers cannot both
+        insert one key. `fresh` uses a plain insert for an empty table (rebuilds).
+        """
+        table = OpinionRollup.__table__
+        rows = [{'granularity': granularity, 'bucket': bucket, 'keyword': keyword, 'source': source,
+                 'item_count': count, 'deep_count': deep, 'sentiment_sum': s_sum, 'sentiment_count': s_n}
+                for (granularity, bucket, keyword, source), (count, deep, s_sum, s_n) in self.changes.items()
+                if count or deep or s_sum or s_n]
+        if rows:
+            stmt = insert(table) if fresh else insert_or_add(table, ROLLUP_KEY, ROLLUP_COUNTERS, bind=connection)
+            connection.execute(stmt, rows)
+        self.changes.clear()
+
+
+def _tracked_rows(opinion_ids):
+    columns = [OpinionData.id] + [getattr(OpinionData, f) for f in TRACKED_FIELDS]
+    rows = []
+    opinion_ids = list(opinion_ids)
+    for i in range(0, len(opinion_ids), IN_CHUNK):
+        rows.extend(r._mapping for r in db.session.execute(
+            select(*columns).where(OpinionData.id.in_(opinion_ids[i:i + IN_CHUNK]))))
+    return rows
+
+
+def add_rows(rows):
+    """Count rows inserted with Core statements (mappings with TRACKED_FIELDS)."""
+    delta = RollupDelta()
+    for row in rows:
+        delta.add_row(row)
+    delta.apply(db.session.connection())
+
+
+def remove_ids(opinion_ids):
+    """Uncount items that are about to be bulk deleted."""
+    delta = RollupDelta()
+    for row in _tracked_rows(opinion_ids):
+        delta.add_row(row, sign=-1)
+    delta.apply(db.session.connection())
+
+
+def rescore(scores):
+    """Move sentiment sums for [(id, new_score)] before a bulk score update."""
+    new_scores = dict(scores)
+    delta = RollupDelta()
+    for row in _tracked_rows(new_scores):
+        if row['sentiment_score'] == new_scores[row['id']]:
+            continue
+        delta.add_row(row, sign=-1)
+        delta.add_row(dict(row, sentiment_score=new_scores[row['id']]))
+    delta.apply(db.session.connection())
+
+
+def _before_flush(session, flush_context, instances):
+    delta = session.info.setdefault('rollup_delta', RollupDelta())
+    for obj in session.new:
+        if isinstance(obj, OpinionData):
+            if obj.created_at is None:
+                # Same value the column default would assign, but known before the INSERT
+                obj.created_at = datetime.now()
+            delta.add(*(getattr(obj, f) for f in TRACKED_FIELDS))
+
+    # Attribute history lacks the old value when an unloaded attribute is assigned,
+    # so the stored row (not yet written by this flush) is what gets subtracted
+    changed = {obj.id: obj for obj in session.dirty
+               if isinstance(obj, OpinionData) and obj not in session.deleted
+               and any(inspect(obj).attrs[f].history.has_changes() for f in TRACKED_FIELDS)}
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, OpinionData)]
+    for row in _tracked_rows(list(changed) + deleted):
+        delta.add_row(row, sign=-1)
+        obj = changed.get(row['id'])
+        if obj is not None:
+            delta.add(*(getattr(obj, f) for f in TRACKED_FIELDS))
+
+
+def _after_flush(session, flush_context):
+    delta = session.info.get('rollup_delta')
+    if delta:
+        delta.apply(session.connection())
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop('rollup_delta', None)
+
+
+def register_listeners():
+    """Attach the flush listeners to db.session (idempotent)."""
+    for name, listener in (('before_flush', _before_flush), ('after_flush', _after_flush),
+                           ('after_soft_rollback', _after_soft_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+def rebuild_rollups(batch_size=5000, progress=None):
+    """
+    Recompute all rollups with one keyset-paginated pass over OpinionData.
+
+    Returns:
+        int: Number of items counted.
+    """
+    db.session.execute(delete(OpinionRollup))
+    delta = RollupDelta()
+    columns = [OpinionData.id] + [getattr(OpinionData, f) for f in TRACKED_FIELDS]
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(OpinionData.id > last_id).order_by(OpinionData.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for row in rows:
+            delta.add_row(row._mapping)
+        total += len(rows)
+        if progress:
+            progress(total)
+    delta.apply(db.session.connection(), fresh=True)
+    db.session.commit()
+    return total
+
+
+def _range(granularity, start, end):
+    end = bucket_start(end or datetime.now(), granularity)
+    start = bucket_start(start, granularity) if start else end - 29 * bucket_step(granularity)
+    return start, end
+
+
+def _filters(stmt, granularity, start, end, keyword, source):
+    stmt = stmt.where(OpinionRollup.granularity == granularity,
+                      OpinionRollup.bucket >= start, OpinionRollup.bucket <= end)
+    if keyword:
+        stmt = stmt.where(OpinionRollup.keyword == keyword)
+    if source:
+        stmt = stmt.where(OpinionRollup.source == source)
+    return stmt
+
+
+def _sums():
+    return (func.sum(OpinionRollup.item_count), func.sum(OpinionRollup.deep_count),
+            func.sum(OpinionRollup.sentiment_sum), func.sum(OpinionRollup.sentiment_count))
+
+
+def _stats(count, deep, s_sum, s_n):
+    count, deep, s_n = int(count or 0), int(deep or 0), int(s_n or 0)
+    return {
+        'count': count,
+        'deep_count': deep,
+        'deep_ratio': round(deep / count, 4) if count else 0.0,
+        'sentiment_avg': round(s_sum / s_n, 4) if s_n else None,
+    }
+
+
+def trend(granularity='day', start=None, end=None, keyword=None, source=None):
+    """
+    Per-bucket totals between start and end (inclusive), empty buckets filled with zeros.
+    Defaults to the last 30 buckets.
+
+    Returns:
+        list: [{'bucket', 'count', 'deep_count', 'deep_ratio', 'sentiment_avg'}], oldest first.
+
+    Raises:
+        ValueError: When the range spans more than MAX_BUCKETS buckets.
+    """
+    start, end = _range(granularity, start, end)
+    if (end - start) // bucket_step(granularity) + 1 > MAX_BUCKETS:
+        unit = '小时' if granularity == 'hour' else '天'
+        raise ValueError(f'时间范围过大，最多 {MAX_BUCKETS} {unit}')
+    stmt = _filters(select(OpinionRollup.bucket, *_sums()), granularity, start, end, keyword, source) \
+        .group_by(OpinionRollup.bucket)
+    found = {row[0]: row[1:] for row in db.session.execute(stmt)}
+    fmt = '%Y-%m-%d %H:00' if granularity == 'hour' else '%Y-%m-%d'
+    series = []
+    step = bucket_step(granularity)
+    bucket = start
+    while bucket <= end:
+        series.append(dict(bucket=bucket.strftime(fmt), **_stats(*found.get(bucket, (0, 0, 0.0, 0)))))
+        bucket += step
+    return series
+
+
+def breakdown(by='keyword', granularity='day', start=None, end=None, keyword=None, source=None, limit=20):
+    """
+    Totals per keyword or per source over a range, largest first.
+
+    Returns:
+        list: [{'name', 'count', 'deep_count', 'deep_ratio', 'sentiment_avg'}]
+    """
+    column = OpinionRollup.keyword if by == 'keyword' else OpinionRollup.source
+    start, end = _range(granularity, start, end)
+    stmt = _filters(select(column, *_sums()), granularity, start, end, keyword, source) \
+        .group_by(column).order_by(func.sum(OpinionRollup.item_count).desc()).limit(limit)
+    return [dict(name=row[0], **_stats(*row[1:])) for row in db.session.execute(stmt)]
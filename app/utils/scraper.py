@@ -2,11 +2,101 @@ import requests
 from bs4 import BeautifulSoup
 import time
 import random
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import json
 import re
 from lxml import html as lxml_html
 
+from app.utils.metrics import Counter, Histogram
+
+# Search endpoints and the pause between result pages (seconds, min/max); callers
+# may pass others, e.g. benchmarks/fake_server.py for load tests
+BAIDU_SEARCH_URL = "https://www.baidu.com/s"
+SOHU_SEARCH_URL = "https://www.sohu.com/web"
+PAGE_DELAY = (1, 2)
+# Redirect links of one result page resolved at the same time
+RESOLVE_WORKERS = 8
+
+# kind: search (result pages), resolve (redirect links) or article (deep crawl)
+FETCH_SECONDS = Histogram('scraper_fetch_seconds', 'HTTP fetch latency by host', ('host', 'kind'))
+FETCH_BYTES = Counter('scraper_fetch_bytes_total', 'Response bytes fetched by host', ('host', 'kind'))
+FETCH_ERRORS = Counter('scraper_fetch_errors_total', 'Failed or non-2xx fetches by host', ('host', 'kind'))
+# source: baidu, sohu or deep_crawl
+STAGE_SECONDS = Histogram('scraper_stage_seconds', 'Scraper time per stage and result page or article',
+                          ('source', 'stage'))
+ITEMS = Counter('scraper_items_total', 'Parsed result items kept or dropped by is_valid_item', ('source', 'outcome'))
+
+
+class ScrapeStats:
+    """
+    Stage timings and counters of one keyword run, sent with its progress events.
+    Every observation also goes to the process-wide metrics above.
+    """
+    STAGES = ('fetch', 'resolve', 'parse', 'sleep')
+
+    def __init__(self, source):
+        self.source = source
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.pages = 0
+        self.bytes = 0
+        self.links = 0
+        self.kept = 0
+        self.dropped = 0
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+        STAGE_SECONDS.observe(seconds, source=self.source, stage=stage)
+
+    def fetched(self, seconds, size):
+        self.add('fetch', seconds)
+        self.pages += 1
+        self.bytes += size
+
+    def keep(self, n):
+        self.kept += n
+        ITEMS.inc(n, source=self.source, outcome='kept')
+
+    def drop(self):
+        self.dropped += 1
+        ITEMS.inc(source=self.source, outcome='dropped')
+
+    def to_dict(self):
+        return {
+            'seconds': {stage: round(value, 3) for stage, value in self.seconds.items()},
+            'pages': self.pages,
+            'bytes': self.bytes,
+            'links': self.links,
+            'kept': self.kept,
+            'dropped': self.dropped,
+        }
+
+
+def _host(url):
+    return urlparse(url).netloc or 'unknown'
+
+
+def _get(url, kind, stats=None, **kwargs):
+    """requests.get, recorded in the fetch metrics (and in `stats` when given)."""
+    host = _host(url)
+    started = time.perf_counter()
+    try:
+        response = requests.get(url, **kwargs)
+    except Exception:
+        FETCH_ERRORS.inc(host=host, kind=kind)
+        raise
+    seconds = time.perf_counter() - started
+    size = len(response.content)
+    FETCH_SECONDS.observe(seconds, host=host, kind=kind)
+    FETCH_BYTES.inc(size, host=host, kind=kind)
+    if response.status_code >= 400:
+        FETCH_ERRORS.inc(host=host, kind=kind)
+    if stats is not None:
+        stats.fetched(seconds, size)
+    return response
+
+
 def is_valid_item(item):
     """
     Check if the item is valid based on user criteria.
@@ -45,7 +135,219 @@ def is_valid_item(item):
     return True
 
 
-def scrape_baidu_generator(keyword, pages=1, limit=None):
+def parse_baidu_results(page_html, resolve=None, stats=None):
+    """
+    Parse one Baidu news result page into items. No network access unless
+    a redirect link has to be resolved.
+
+    Args:
+        page_html (str): The result page.
+        resolve (callable): Maps a Baidu redirect link to the original URL;
+            resolve_baidu_link by default.
+        stats (ScrapeStats): Counts the items is_valid_item drops.
+
+    Returns:
+        list: Valid items in page order.
+    """
+    resolve = resolve or resolve_baidu_link
+    try:
+        soup = BeautifulSoup(page_html, 'lxml')
+    except:
+        soup = BeautifulSoup(page_html, 'html.parser')
+        
+    # Baidu results are typically in div containers with class 'result c-container' or similar
+    containers = soup.find_all('div', class_=lambda x: x and 'result' in x and 'c-container' in x)
+    
+    if not containers:
+         containers = soup.find_all('div', class_='result')
+         
+    page_results = []
+    for container in containers:
+        try:
+            item = {}
+            
+            # 1. Title
+            title_tag = container.find('h3')
+            if title_tag:
+                item['title'] = title_tag.get_text(strip=True)
+                link_tag = title_tag.find('a')
+                if link_tag:
+                    item['url'] = link_tag.get('href')
+                else:
+                    item['url'] = ''
+            else:
+                continue # Skip if no title
+            
+            # 2. Summary (Abstract) - REMOVED for optimization
+            item['summary'] = ''
+
+            # 3. Cover (Image)
+            img_tag = container.find('img')
+            if img_tag and img_tag.get('src'):
+                 item['cover'] = img_tag.get('src')
+            else:
+                 item['cover'] = ''
+
+            # 4. Source
+            source_tag = container.find(class_=lambda x: x and ('c-showurl' in x or 'c-source' in x))
+            if source_tag:
+                item['source'] = source_tag.get_text(strip=True)
+            else:
+                user_source = container.find(class_='c-gap-right')
+                if user_source:
+                     item['source'] = user_source.get_text(strip=True)
+                else:
+                     item['source'] = 'Baidu Search'
+
+            # 5. Original URL
+            if item['url'].startswith('/'):
+                 item['url'] = "https://www.baidu.com" + item['url']
+                 item['original_url'] = item['url']
+            else:
+                 item['original_url'] = resolve(item['url'])
+            
+            if is_valid_item(item):
+                page_results.append(item)
+            elif stats is not None:
+                stats.drop()
+            
+        except Exception as e:
+            print(f"Error parsing item: {e}")
+            continue
+
+    return page_results
+
+
+def parse_sohu_results(page_html, resolve=None, stats=None):
+    """
+    Parse one Sohu/Sogou result page into items.
+
+    Args:
+        page_html (str): The result page.
+        resolve (callable): Maps a Sogou redirect link to the original URL;
+            resolve_baidu_link by default.
+        stats (ScrapeStats): Counts the items is_valid_item drops.
+
+    Returns:
+        list: Valid items in page order.
+    """
+    resolve = resolve or resolve_baidu_link
+    try:
+        soup = BeautifulSoup(page_html, 'lxml')
+    except:
+        soup = BeautifulSoup(page_html, 'html.parser')
+        
+    # Results usually in .vrwrap or .rb
+    containers = soup.find_all(class_='vrwrap')
+    if not containers:
+        containers = soup.find_all(class_='rb')
+        
+    page_results = []
+    for container in containers:
+        try:
+            item = {}
+            
+            # Title
+            h3 = container.find('h3')
+            if not h3:
+                continue
+            item['title'] = h3.get_text(strip=True)
+            
+            # Link
+            a = h3.find('a')
+            if a:
+                item['url'] = a.get('href')
+                if item['url'].startswith('/'):
+                     item['url'] = "https://www.sogou.com" + item['url']
+            else:
+                continue
+                
+            # Summary
+            st_div = container.find(class_='st')
+            if not st_div:
+                st_div = container.find(class_='text-layout')
+                
+            if st_div:
+                item['summary'] = st_div.get_text(strip=True)
+            else:
+                 item['summary'] = ''
+
+            # Cover
+            img = container.find('img')
+            if img and img.get('src'):
+                 item['cover'] = img.get('src')
+                 if item['cover'].startswith('//'):
+                     item['cover'] = 'https:' + item['cover']
+            else:
+                 item['cover'] = ''
+                 
+            # Source / Date
+            fb = container.find(class_='fb')
+            if fb:
+                item['source'] = fb.get_text(strip=True)
+            else:
+                item['source'] = '搜狐新闻'
+                
+            # Resolve original URL
+            # Reuse resolve_baidu_link as it is generic enough for redirects
+            if 'sogou.com/link' in item['url']:
+                 item['original_url'] = resolve(item['url'])
+            else:
+                 item['original_url'] = item['url']
+                 
+            if is_valid_item(item):
+                page_results.append(item)
+            elif stats is not None:
+                stats.drop()
+            
+        except Exception as e:
+            continue
+
+    return page_results
+
+
+def _iter_page(parse, page_html, resolve, workers, stats):
+    """
+    Parse a result page and yield its items in page order, each as soon as its
+    redirect link is resolved. Links are resolved on `workers` threads instead
+    of one after another inside the parser; closing the generator early (limit
+    reached) cancels the ones not started yet.
+    """
+    def timed_resolve(url):
+        started = time.perf_counter()
+        try:
+            return resolve(url)
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - started, host=_host(url), kind='resolve')
+
+    links = []
+    started = time.perf_counter()
+    items = parse(page_html, resolve=lambda url: links.append(url) or url, stats=stats)
+    stats.add('parse', time.perf_counter() - started)
+    stats.keep(len(items))
+    if not links:
+        yield from items
+        return
+
+    stats.links += len(links)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(links))))
+    pending = {url: executor.submit(timed_resolve, url) for url in dict.fromkeys(links)}
+    waited = 0.0
+    try:
+        for item in items:
+            future = pending.get(item['original_url'])
+            if future is not None:
+                started = time.perf_counter()
+                item['original_url'] = future.result()
+                waited += time.perf_counter() - started
+            yield item
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        stats.add('resolve', waited)
+
+
+def scrape_baidu_generator(keyword, pages=1, limit=None, search_url=BAIDU_SEARCH_URL, page_delay=PAGE_DELAY,
+                           resolve_workers=RESOLVE_WORKERS, stream_items=False):
     """
     Scrape Baidu search results for a given keyword with pagination and progress updates.
     Yields progress status or results.
@@ -54,22 +356,30 @@ def scrape_baidu_generator(keyword, pages=1, limit=None):
         keyword (str): The search keyword.
         pages (int): Number of pages to scrape.
         limit (int): Maximum number of results to collect (optional).
+        search_url (str): Baidu news search endpoint.
+        page_delay (tuple): Min and max pause between pages (seconds).
+        resolve_workers (int): Redirect links resolved concurrently per page.
+        stream_items (bool): Yield every item as {'type': 'item', 'data': item} once it is
+            parsed and resolved, and finish with {'type': 'done', 'count': n} instead of
+            collecting everything into one result event.
         
     Yields:
-        dict: Progress update or final result.
+        dict: Progress update, item, or final result/done, with the run's ScrapeStats so far under 'stats'.
     """
     results = []
     total_collected = 0
+    stats = ScrapeStats('baidu')
     
     for page in range(pages):
         if limit and total_collected >= limit:
             break
             
         # Yield progress
-        yield {'type': 'progress', 'current': page + 1, 'total': pages, 'msg': f'正在采集第 {page+1}/{pages} 页...'}
+        yield {'type': 'progress', 'current': page + 1, 'total': pages, 'msg': f'正在采集第 {page+1}/{pages} 页...',
+               'stats': stats.to_dict()}
         
         pn = page * 10
-        url = f"https://www.baidu.com/s?rtt=1&bsst=1&cl=2&tn=news&rsv_dl=ns_pc&word={keyword}&pn={pn}"
+        url = f"{search_url}?rtt=1&bsst=1&cl=2&tn=news&rsv_dl=ns_pc&word={keyword}&pn={pn}"
         
         # Headers provided by user (modified to ensure compatibility)
         headers = {
@@ -78,7 +388,6 @@ def scrape_baidu_generator(keyword, pages=1, limit=None):
             "accept-language": "zh-CN,zh;q=0.9",
             "connection": "keep-alive",
             "cookie": "BIDUPSID=9F5E32DCF4C42649287BD46CE38C9F30; PSTM=1752326629; BAIDUID=9F5E32DCF4C426498C7580C1849BE156:FG=1; BAIDUID_BFESS=9F5E32DCF4C426498C7580C1849BE156:FG=1; H_PS_PSSID=60277_63148_66101_66120_66231_66201_66162_66384_66279_66268_66393_66516_66529_66547_66585_66579_66592_66601_66615_66655_66663_66682_66673_66691_66688_66743_66622_66772_66783_66790_66796_66803_66599; BD_HOME=1; BD_UPN=12314753; BA_HECTOR=a58g250ha1ag040lah84a5000g018i1kj00s925; ZFY=z4FQHye5NlJGyid32ACOK4rPhVR18AEWw50KB5k55kk:C; BD_CK_SAM=1; PSINO=7; delPer=0; COOKIE_SESSION=0_0_1_1_0_1_1_0_1_1_2_0_0_0_0_0_0_0_1764754343%7C1%230_0_1764754343%7C1; BDORZ=B490B5EBF6F3CD402E515D22BCDA1598; H_PS_645EC=346a6l%2FxQT95ApPuz3YJfMm0V8u6jvmxmuuVM9nx0Wik2f1rB8jMyn74dAE; H_WISE_SIDS=60277_63148_66101_66120_66231_66201_66162_66384_66279_66268_66393_66516_66529_66547_66585_66579_66592_66601_66615_66655_66663_66682_66673_66691_66688_66743_66622_66772_66783_66790_66796_66803_66599; channel=google; baikeVisitId=552613c1-1b43-4940-ab9f-d735ccb9b502",
-            "host": "www.baidu.com",
             "sec-ch-ua": '"Google Chrome";v="143", "Chromium";v="143", "Not A(Brand";v="24"',
             "sec-ch-ua-mobile": "?0",
             "sec-ch-ua-platform": '"Windows"',
@@ -91,109 +400,62 @@ def scrape_baidu_generator(keyword, pages=1, limit=None):
         }
 
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = _get(url, 'search', stats, headers=headers, timeout=10)
             response.raise_for_status()
             
-            try:
-                soup = BeautifulSoup(response.text, 'lxml')
-            except:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-            # Baidu results are typically in div containers with class 'result c-container' or similar
-            containers = soup.find_all('div', class_=lambda x: x and 'result' in x and 'c-container' in x)
-            
-            if not containers:
-                 containers = soup.find_all('div', class_='result')
-                 
-            page_results = []
-            for container in containers:
-                try:
-                    item = {}
-                    
-                    # 1. Title
-                    title_tag = container.find('h3')
-                    if title_tag:
-                        item['title'] = title_tag.get_text(strip=True)
-                        link_tag = title_tag.find('a')
-                        if link_tag:
-                            item['url'] = link_tag.get('href')
-                        else:
-                            item['url'] = ''
+            page_count = 0
+            with closing(_iter_page(parse_baidu_results, response.text, resolve_baidu_link, resolve_workers,
+                                    stats)) as page_items:
+                for item in page_items:
+                    page_count += 1
+                    total_collected += 1
+                    if stream_items:
+                        yield {'type': 'item', 'data': item}
                     else:
-                        continue # Skip if no title
-                    
-                    # 2. Summary (Abstract) - REMOVED for optimization
-                    item['summary'] = ''
-
-                    # 3. Cover (Image)
-                    img_tag = container.find('img')
-                    if img_tag and img_tag.get('src'):
-                         item['cover'] = img_tag.get('src')
-                    else:
-                         item['cover'] = ''
+                        results.append(item)
+                    if limit and total_collected >= limit:
+                        break
 
-                    # 4. Source
-                    source_tag = container.find(class_=lambda x: x and ('c-showurl' in x or 'c-source' in x))
-                    if source_tag:
-                        item['source'] = source_tag.get_text(strip=True)
-                    else:
-                        user_source = container.find(class_='c-gap-right')
-                        if user_source:
-                             item['source'] = user_source.get_text(strip=True)
-                        else:
-                             item['source'] = 'Baidu Search'
-
-                    # 5. Original URL
-                    if item['url'].startswith('/'):
-                         item['url'] = "https://www.baidu.com" + item['url']
-                         item['original_url'] = item['url']
-                    else:
-                         item['original_url'] = resolve_baidu_link(item['url'])
-                    
-                    if is_valid_item(item):
-                        page_results.append(item)
-                    
-                except Exception as e:
-                    print(f"Error parsing item: {e}")
-                    continue
-            
-            if not page_results:
+            if not page_count:
                 # No more results or blocked
                 break
-                
-            results.extend(page_results)
-            total_collected += len(page_results)
             
             # Sleep to avoid block
-            if page < pages - 1:
-                time.sleep(random.uniform(1, 2))
+            if page < pages - 1 and not (limit and total_collected >= limit):
+                delay = random.uniform(*page_delay)
+                time.sleep(delay)
+                stats.add('sleep', delay)
                 
         except Exception as e:
             print(f"Error scraping Baidu page {page}: {e}")
-            yield {'type': 'error', 'msg': str(e)}
+            yield {'type': 'error', 'msg': str(e), 'stats': stats.to_dict()}
             break
             
-    if limit:
-        results = results[:limit]
-        
-    yield {'type': 'result', 'data': results}
+    if stream_items:
+        yield {'type': 'done', 'count': total_collected, 'stats': stats.to_dict()}
+    else:
+        yield {'type': 'result', 'data': results, 'stats': stats.to_dict()}
 
-def scrape_sohu_generator(keyword, pages=1, limit=None):
+def scrape_sohu_generator(keyword, pages=1, limit=None, search_url=SOHU_SEARCH_URL, page_delay=PAGE_DELAY,
+                          resolve_workers=RESOLVE_WORKERS, stream_items=False):
     """
     Scrape Sohu content via Sogou Search (proxy) for a given keyword.
     Yields progress status or results.
+    Takes the same arguments as scrape_baidu_generator, search_url being the Sohu search endpoint.
     """
     results = []
     total_collected = 0
+    stats = ScrapeStats('sohu')
     
     for page in range(pages):
         if limit and total_collected >= limit:
             break
             
-        yield {'type': 'progress', 'current': page + 1, 'total': pages, 'msg': f'正在采集搜狐数据(第 {page+1}/{pages} 页)...'}
+        yield {'type': 'progress', 'current': page + 1, 'total': pages, 'msg': f'正在采集搜狐数据(第 {page+1}/{pages} 页)...',
+               'stats': stats.to_dict()}
         
         # Sogou pagination uses 'page' parameter
-        url = f"https://www.sohu.com/web?query=site:sohu.com+{keyword}&page={page+1}"
+        url = f"{search_url}?query=site:sohu.com+{keyword}&page={page+1}"
         
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -201,99 +463,42 @@ def scrape_sohu_generator(keyword, pages=1, limit=None):
         }
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = _get(url, 'search', stats, headers=headers, timeout=10)
             response.encoding = 'utf-8'
             
             if response.status_code != 200:
-                 yield {'type': 'error', 'msg': f'Sogou returned status {response.status_code}'}
+                 yield {'type': 'error', 'msg': f'Sogou returned status {response.status_code}', 'stats': stats.to_dict()}
                  break
 
-            try:
-                soup = BeautifulSoup(response.text, 'lxml')
-            except:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-            # Results usually in .vrwrap or .rb
-            containers = soup.find_all(class_='vrwrap')
-            if not containers:
-                containers = soup.find_all(class_='rb')
-                
-            page_results = []
-            for container in containers:
-                try:
-                    item = {}
-                    
-                    # Title
-                    h3 = container.find('h3')
-                    if not h3:
-                        continue
-                    item['title'] = h3.get_text(strip=True)
-                    
-                    # Link
-                    a = h3.find('a')
-                    if a:
-                        item['url'] = a.get('href')
-                        if item['url'].startswith('/'):
-                             item['url'] = "https://www.sogou.com" + item['url']
-                    else:
-                        continue
-                        
-                    # Summary
-                    st_div = container.find(class_='st')
-                    if not st_div:
-                        st_div = container.find(class_='text-layout')
-                        
-                    if st_div:
-                        item['summary'] = st_div.get_text(strip=True)
-                    else:
-                         item['summary'] = ''
-
-                    # Cover
-                    img = container.find('img')
-                    if img and img.get('src'):
-                         item['cover'] = img.get('src')
-                         if item['cover'].startswith('//'):
-                             item['cover'] = 'https:' + item['cover']
-                    else:
-                         item['cover'] = ''
-                         
-                    # Source / Date
-                    fb = container.find(class_='fb')
-                    if fb:
-                        item['source'] = fb.get_text(strip=True)
+            page_count = 0
+            with closing(_iter_page(parse_sohu_results, response.text, resolve_baidu_link, resolve_workers,
+                                    stats)) as page_items:
+                for item in page_items:
+                    page_count += 1
+                    total_collected += 1
+                    if stream_items:
+                        yield {'type': 'item', 'data': item}
                     else:
-                        item['source'] = '搜狐新闻'
-                        
-                    # Resolve original URL
-                    # Reuse resolve_baidu_link as it is generic enough for redirects
-                    if 'sogou.com/link' in item['url']:
-                         item['original_url'] = resolve_baidu_link(item['url'])
-                    else:
-                         item['original_url'] = item['url']
-                         
-                    if is_valid_item(item):
-                        page_results.append(item)
-                    
-                except Exception as e:
-                    continue
-            
-            if not page_results:
+                        results.append(item)
+                    if limit and total_collected >= limit:
+                        break
+
+            if not page_count:
                 break
-                
-            results.extend(page_results)
-            total_collected += len(page_results)
             
-            if page < pages - 1:
-                time.sleep(random.uniform(1, 2))
+            if page < pages - 1 and not (limit and total_collected >= limit):
+                delay = random.uniform(*page_delay)
+                time.sleep(delay)
+                stats.add('sleep', delay)
                 
         except Exception as e:
-            yield {'type': 'error', 'msg': str(e)}
+            yield {'type': 'error', 'msg': str(e), 'stats': stats.to_dict()}
             break
             
-    if limit:
-        results = results[:limit]
-        
-    yield {'type': 'result', 'data': results}
+    if stream_items:
+        yield {'type': 'done', 'count': total_collected, 'stats': stats.to_dict()}
+    else:
+        yield {'type': 'result', 'data': results, 'stats': stats.to_dict()}
 
 # Keep the original function for backward compatibility if needed, or redirect it
 def scrape_baidu(keyword):
@@ -324,9 +529,97 @@ def resolve_baidu_link(baidu_url):
     except:
         return baidu_url
 
-def scrape_content(url):
+def extract_content(page_html):
+    """
+    Main text of an article page with the same noise filtering as scrape_content,
+    without fetching anything.
+    """
+    try:
+        soup = BeautifulSoup(page_html, 'lxml')
+    except:
+        soup = BeautifulSoup(page_html, 'html.parser')
+        
+    # 1. Remove standard junk tags
+    for element in soup(["script", "style", "iframe", "noscript", "header", "footer", "aside", "nav", "form", "svg", "button", "input", "select", "textarea"]):
+        element.extract()
+
+    # 2. Remove junk by class/id heuristics
+    # Keywords often used in non-content areas
+    junk_keywords = ['comment', 'sidebar', 'related', 'recommend', 'ad-', 'ads', 'menu', 'copyright', 'disclaimer', 'share', 'login', 'register', 'search', 'footer', 'header', 'nav']
+    
+    def is_junk(attr_value):
+        if not attr_value:
+            return False
+        if isinstance(attr_value, list):
+            attr_value = " ".join(attr_value)
+        return any(keyword in attr_value.lower() for keyword in junk_keywords)
+
+    # Remove elements with junk classes
+    for element in soup.find_all(attrs={"class": True}):
+         if is_junk(element.get("class")):
+             element.extract()
+             
+    # Remove elements with junk ids
+    for element in soup.find_all(attrs={"id": True}):
+         if is_junk(element.get("id")):
+             element.extract()
+
+    # 3. Try to find the main content area
+    # Heuristic: The container with the most text length
+    # We prioritize 'article' tag or divs with 'content'/'main' in class
+    
+    main_content = None
+    
+    # Priority 1: <article> tag
+    article = soup.find('article')
+    if article:
+        main_content = article
+    
+    # Priority 2: div with specific class names
+    if not main_content:
+        candidates = soup.find_all('div', class_=re.compile(r'(content|article|main|post|detail|news_txt)', re.I))
+        if candidates:
+            # Filter out small candidates
+            valid_candidates = [c for c in candidates if len(c.get_text(strip=True)) > 100]
+            if valid_candidates:
+                main_content = max(valid_candidates, key=lambda x: len(x.get_text(strip=True)))
+    
+    # Fallback: Use body
+    if not main_content:
+        main_content = soup.body or soup
+
+    # 4. Extract text with better spacing
+    # Use separator='\n\n' to preserve paragraph structure
+    text = main_content.get_text(separator='\n\n')
+    
+    # 5. Clean up whitespace
+    # Split by lines, strip each line
+    lines = [line.strip() for line in text.splitlines()]
+    
+    # Remove empty lines but keep paragraph structure
+    # We allow max 1 consecutive empty line, or just join non-empty lines with \n\n
+    clean_lines = [line for line in lines if line]
+    
+    # Join with double newline to clearly separate paragraphs in plain text
+    text = '\n\n'.join(clean_lines)
+    
+    return text
+
+
+def _archive_page(archive, url, response):
+    """Keep the raw page for offline re-extraction; never fails the crawl."""
+    if archive is None:
+        return
+    try:
+        archive.append(url, response.text, status=response.status_code, final_url=response.url)
+    except Exception as e:
+        print(f"Error archiving {url}: {e}")
+
+
+def scrape_content(url, archive=None):
     """
     Deep crawl the content of a given URL with improved noise filtering and formatting.
+    The fetched page is stored in `archive` (a PageArchive) when one is given.
     """
     if not url:
         return ""
@@ -336,82 +629,17 @@ def scrape_content(url):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _get(url, 'article', headers=headers, timeout=10)
         response.raise_for_status()
         
         # Detect encoding
         response.encoding = response.apparent_encoding
+        _archive_page(archive, url, response)
         
-        try:
-            soup = BeautifulSoup(response.text, 'lxml')
-        except:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-        # 1. Remove standard junk tags
-        for element in soup(["script", "style", "iframe", "noscript", "header", "footer", "aside", "nav", "form", "svg", "button", "input", "select", "textarea"]):
-            element.extract()
-
-        # 2. Remove junk by class/id heuristics
-        # Keywords often used in non-content areas
-        junk_keywords = ['comment', 'sidebar', 'related', 'recommend', 'ad-', 'ads', 'menu', 'copyright', 'disclaimer', 'share', 'login', 'register', 'search', 'footer', 'header', 'nav']
-        
-        def is_junk(attr_value):
-            if not attr_value:
-                return False
-            if isinstance(attr_value, list):
-                attr_value = " ".join(attr_value)
-            return any(keyword in attr_value.lower() for keyword in junk_keywords)
-
-        # Remove elements with junk classes
-        for element in soup.find_all(attrs={"class": True}):
-             if is_junk(element.get("class")):
-                 element.extract()
-                 
-        # Remove elements with junk ids
-        for element in soup.find_all(attrs={"id": True}):
-             if is_junk(element.get("id")):
-                 element.extract()
-
-        # 3. Try to find the main content area
-        # Heuristic: The container with the most text length
-        # We prioritize 'article' tag or divs with 'content'/'main' in class
-        
-        main_content = None
-        
-        # Priority 1: <article> tag
-        article = soup.find('article')
-        if article:
-            main_content = article
-        
-        # Priority 2: div with specific class names
-        if not main_content:
-            candidates = soup.find_all('div', class_=re.compile(r'(content|article|main|post|detail|news_txt)', re.I))
-            if candidates:
-                # Filter out small candidates
-                valid_candidates = [c for c in candidates if len(c.get_text(strip=True)) > 100]
-                if valid_candidates:
-                    main_content = max(valid_candidates, key=lambda x: len(x.get_text(strip=True)))
-        
-        # Fallback: Use body
-        if not main_content:
-            main_content = soup.body or soup
-
-        # 4. Extract text with better spacing
-        # Use separator='\n\n' to preserve paragraph structure
-        text = main_content.get_text(separator='\n\n')
-        
-        # 5. Clean up whitespace
-        # Split by lines, strip each line
-        lines = [line.strip() for line in text.splitlines()]
-        
-        # Remove empty lines but keep paragraph structure
-        # We allow max 1 consecutive empty line, or just join non-empty lines with \n\n
-        clean_lines = [line for line in lines if line]
-        
-        # Join with double newline to clearly separate paragraphs in plain text
-        text = '\n\n'.join(clean_lines)
-        
-        return text
+        started = time.perf_counter()
+        content = extract_content(response.text)
+        STAGE_SECONDS.observe(time.perf_counter() - started, source='deep_crawl', stage='extract')
+        return content
     except Exception as e:
         print(f"Error deep scraping {url}: {e}")
         return ""
@@ -471,24 +699,106 @@ def resolve_sogou_link(url):
     except:
         return url
 
-def deep_crawl_content(url, rule_config=None):
+def extract_with_rule(page_html, rule_config=None):
     """
-    Deep crawl content using specific rules (XPath).
-    If rule_config is provided, it uses it.
-    If parsing fails with provided rule, it tries to auto-discover and returns updated rule.
-    
-    Args:
-        url (str): URL to crawl.
-        rule_config (dict): {'title_xpath': str, 'content_xpath': str, 'headers': str/dict}
-        
+    Title and content of an article page using a rule's XPaths, falling back to
+    heuristics (and proposing an updated rule) when they match nothing.
+
     Returns:
-        tuple: (title, content, new_rule_config)
-        new_rule_config is None if no update needed.
+        tuple: (title, content, new_rule_config), see deep_crawl_content.
     """
-    if not url:
+    try:
+        tree = lxml_html.fromstring(page_html)
+    except:
+        # Fallback if lxml fails to parse broken HTML
         return "", "", None
+    
+    title = ""
+    content = ""
+    new_rule_config = None
+    rule_updated = False
+    
+    # 1. Try using provided rule
+    if rule_config:
+        title_xpath = rule_config.get('title_xpath')
+        content_xpath = rule_config.get('content_xpath')
+        
+        if title_xpath:
+            try:
+                titles = tree.xpath(title_xpath)
+                if titles:
+                    title = titles[0].text_content().strip() if hasattr(titles[0], 'text_content') else str(titles[0]).strip()
+            except:
+                pass
+        
+        if content_xpath:
+            try:
+                contents = tree.xpath(content_xpath)
+                if contents:
+                    # Join multiple content parts if xpath returns multiple elements
+                    content = "\n".join([c.text_content().strip() for c in contents if hasattr(c, 'text_content')])
+            except:
+                pass
+    
+    # 2. If failed (empty title or content), try fallback and update rule
+    # We only try to update rule if we had a rule to begin with, or if we want to discover new rules?
+    # The prompt says "If you discover rule changes... update". Implies existing rule failed.
+    
+    if not title or not content:
+        # Fallback Title
+        if not title:
+            possible_titles = tree.xpath('//meta[@property="og:title"]/@content | //title/text() | //h1/text()')
+            if possible_titles:
+                title = possible_titles[0].strip()
+                # We don't update title xpath easily as generic ones are fine usually.
+
+        # Fallback Content
+        if not content:
+            # Simple heuristic: Find the block element (div, article) with the most text
+            candidates = tree.xpath('//article | //div[count(p)>3] | //div[string-length(.)>500]')
+            best_candidate = None
+            max_length = 0
+            
+            for candidate in candidates:
+                # Remove scripts and styles
+                for bad in candidate.xpath('.//script | .//style'):
+                    bad.drop_tree()
+                
+                text = candidate.text_content().strip()
+                if len(text) > max_length:
+                    max_length = len(text)
+                    best_candidate = candidate
+            
+            if best_candidate is not None:
+                content = best_candidate.text_content().strip()
+                
+                # AUTOMATIC UPDATE LOGIC
+                if rule_config:
+                    # Generate XPath for the best candidate
+                    try:
+                        new_xpath = get_smart_xpath(best_candidate)
+                        if new_xpath:
+                            if not new_rule_config:
+                                new_rule_config = rule_config.copy()
+                            new_rule_config['content_xpath'] = new_xpath
+                            rule_updated = True
+                    except:
+                        pass
 
-    # Pre-resolve Sogou links
+    return title, content, new_rule_config if rule_updated else None
+
+
+def fetch_article(url, rule_config=None, archive=None):
+    """
+    Fetch an article page for deep crawling: Sogou links are resolved, the rule's
+    headers are sent and the page is stored in `archive` (keyed by `url` as passed in).
+    Raises on network and HTTP errors.
+
+    Returns:
+        str: The page.
+    """
+    # Pre-resolve Sogou links; the archive keeps the link the item was saved with
+    archive_url = url
     if 'sogou.com/link' in url:
         url = resolve_sogou_link(url)
 
@@ -508,97 +818,40 @@ def deep_crawl_content(url, rule_config=None):
         except:
             pass
 
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Handle encoding
-        if response.encoding == 'ISO-8859-1':
-             response.encoding = response.apparent_encoding
-             
-        html_content = response.text
-        try:
-            tree = lxml_html.fromstring(html_content)
-        except:
-            # Fallback if lxml fails to parse broken HTML
-            return "", "", None
-        
-        title = ""
-        content = ""
-        new_rule_config = None
-        rule_updated = False
-        
-        # 1. Try using provided rule
-        if rule_config:
-            title_xpath = rule_config.get('title_xpath')
-            content_xpath = rule_config.get('content_xpath')
-            
-            if title_xpath:
-                try:
-                    titles = tree.xpath(title_xpath)
-                    if titles:
-                        title = titles[0].text_content().strip() if hasattr(titles[0], 'text_content') else str(titles[0]).strip()
-                except:
-                    pass
-            
-            if content_xpath:
-                try:
-                    contents = tree.xpath(content_xpath)
-                    if contents:
-                        # Join multiple content parts if xpath returns multiple elements
-                        content = "\n".join([c.text_content().strip() for c in contents if hasattr(c, 'text_content')])
-                except:
-                    pass
-        
-        # 2. If failed (empty title or content), try fallback and update rule
-        # We only try to update rule if we had a rule to begin with, or if we want to discover new rules?
-        # The prompt says "If you discover rule changes... update". Implies existing rule failed.
+    response = _get(url, 'article', headers=headers, timeout=10)
+    response.raise_for_status()
+    
+    # Handle encoding
+    if response.encoding == 'ISO-8859-1':
+         response.encoding = response.apparent_encoding
+    _archive_page(archive, archive_url, response)
+    return response.text
+
+
+def deep_crawl_content(url, rule_config=None, archive=None):
+    """
+    Deep crawl content using specific rules (XPath).
+    If rule_config is provided, it uses it.
+    If parsing fails with provided rule, it tries to auto-discover and returns updated rule.
+    
+    Args:
+        url (str): URL to crawl.
+        rule_config (dict): {'title_xpath': str, 'content_xpath': str, 'headers': str/dict}
+        archive (PageArchive): Stores the fetched page, keyed by `url` as passed in.
         
-        if not title or not content:
-            # Fallback Title
-            if not title:
-                possible_titles = tree.xpath('//meta[@property="og:title"]/@content | //title/text() | //h1/text()')
-                if possible_titles:
-                    title = possible_titles[0].strip()
-                    # We don't update title xpath easily as generic ones are fine usually.
-
-            # Fallback Content
-            if not content:
-                # Simple heuristic: Find the block element (div, article) with the most text
-                candidates = tree.xpath('//article | //div[count(p)>3] | //div[string-length(.)>500]')
-                best_candidate = None
-                max_length = 0
-                
-                for candidate in candidates:
-                    # Remove scripts and styles
-                    for bad in candidate.xpath('.//script | .//style'):
-                        bad.drop_tree()
-                    
-                    text = candidate.text_content().strip()
-                    if len(text) > max_length:
-                        max_length = len(text)
-                        best_candidate = candidate
-                
-                if best_candidate is not None:
-                    content = best_candidate.text_content().strip()
-                    
-                    # AUTOMATIC UPDATE LOGIC
-                    if rule_config:
-                        # Generate XPath for the best candidate
-                        try:
-                            new_xpath = get_smart_xpath(best_candidate)
-                            if new_xpath:
-                                if not new_rule_config:
-                                    new_rule_config = rule_config.copy()
-                                new_rule_config['content_xpath'] = new_xpath
-                                rule_updated = True
-                        except:
-                            pass
-
-        return title, content, new_rule_config if rule_updated else None
+    Returns:
+        tuple: (title, content, new_rule_config)
+        new_rule_config is None if no update needed.
+    """
+    if not url:
+        return "", "", None
 
+    try:
+        page = fetch_article(url, rule_config, archive)
+        started = time.perf_counter()
+        extracted = extract_with_rule(page, rule_config)
+        STAGE_SECONDS.observe(time.perf_counter() - started, source='deep_crawl', stage='extract')
+        return extracted
     except Exception as e:
         print(f"Error in deep_crawl_content: {e}")
         return "", "", None
-
-
@@ -0,0 +1,303 @@
+"""
+Offline lexicon-based sentiment scoring for Chinese news text.
+
+Text is segmented by forward maximum matching against the lexicon, so no
+tokenizer dependency is needed. Every sentiment word hit becomes one entry of
+a sparse (documents x lexicon) matrix whose value carries the negation and
+degree-adverb modifiers seen before it in the same clause; a batch score is
+then a single sparse matrix-vector product with the polarity vector.
+"""
+import math
+import os
+
+import numpy as np
+
+from app.utils.text import item_text
+
+POSITIVE_WORDS = [
+    '好', '优秀', '成功', '满意', '支持', '赞', '点赞', '称赞', '赞扬', '表扬', '肯定', '认可', '欢迎',
+    '增长', '提升', '提高', '改善', '进步', '发展', '突破', '创新', '领先', '稳定', '稳健', '繁荣',
+    '安全', '放心', '便民', '惠民', '利好', '受益', '有效', '高效', '积极', '良好', '健康', '顺利',
+    '和谐', '幸福', '美好', '精彩', '优质', '完善', '圆满', '丰收', '盈利', '回暖', '复苏', '振兴',
+    '保障', '帮助', '温暖', '感动', '感谢', '喜欢', '开心', '高兴', '信任', '透明', '公正', '公平',
+    '清廉', '担当', '贡献', '荣获', '获奖', '夺冠', '胜利', '亮点', '优化', '升级', '可靠', '出色',
+]
+
+NEGATIVE_WORDS = [
+    '差', '坏', '失败', '不满', '反对', '批评', '谴责', '抗议', '投诉', '举报', '质疑', '争议', '怒',
+    '愤怒', '下降', '下滑', '下跌', '暴跌', '亏损', '倒闭', '裁员', '失业', '欠薪', '拖欠', '违法',
+    '违规', '腐败', '贪污', '受贿', '造假', '欺诈', '诈骗', '虚假', '事故', '爆炸', '火灾', '坍塌',
+    '伤亡', '死亡', '遇难', '受伤', '污染', '超标', '危险', '隐患', '风险', '危机', '混乱', '冲突',
+    '纠纷', '维权', '曝光', '问责', '处分', '查处', '立案', '逮捕', '判刑', '罚款', '处罚', '停产',
+    '召回', '缺陷', '故障', '延误', '拥堵', '涨价', '焦虑', '担忧', '恐慌', '悲剧', '痛心', '失望',
+    '糟糕', '恶劣', '严重', '困难', '问题', '漏洞', '乱象', '黑幕', '丑闻', '谣言', '霸凌', '歧视',
+]
+
+NEGATION_WORDS = ['不', '没', '没有', '无', '非', '未', '别', '莫', '勿', '不是', '并非', '毫无', '绝非', '未曾', '不再']
+
+DEGREE_WORDS = {
+    '极其': 2.0, '极为': 2.0, '最': 2.0, '非常': 1.8, '特别': 1.8, '十分': 1.8, '太': 1.8, '严重': 1.6,
+    '相当': 1.5, '很': 1.5, '越来越': 1.5, '更加': 1.4, '更': 1.3, '较为': 1.2, '比较': 1.2, '还算': 0.9,
+    '有点': 0.8, '有些': 0.8, '稍微': 0.7, '略微': 0.7, '略': 0.7, '一点': 0.6,
+}
+
+# Characters that close a clause: modifiers never carry across them
+CLAUSE_BREAKS = set('，。！？；：,.!?;:\n\r')
+
+# Neutral band for the 'positive' / 'neutral' / 'negative' labels used by the warehouse filters
+NEUTRAL_THRESHOLD = 0.1
+
+
+class SentimentScorer:
+    """
+    Args:
+        positive (list): Words with polarity +1.
+        negative (list): Words with polarity -1.
+        extra (dict): Additional word -> polarity weights (e.g. from a lexicon file).
+    """
+
+    def __init__(self, positive=POSITIVE_WORDS, negative=NEGATIVE_WORDS, extra=None,
+                 negations=NEGATION_WORDS, degrees=DEGREE_WORDS):
+        weights = {}
+        for word in positive:
+            weights[word] = 1.0
+        for word in negative:
+            weights[word] = -1.0
+        weights.update(extra or {})
+
+        self.terms = list(weights)
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+        self.polarity = np.array([weights[t] for t in self.terms], dtype=np.float64)
+        self.negations = set(negations)
+        self.degrees = dict(degrees)
+
+        # Sentiment words win over modifiers on equal length (e.g. '严重' is both)
+        self.kinds = {}
+        for word in self.negations:
+            self.kinds[word] = 'neg'
+        for word in self.degrees:
+            self.kinds[word] = 'deg'
+        for word in self.terms:
+            self.kinds[word] = 'term'
+        self.max_word_len = max(len(w) for w in self.kinds)
+
+    def _hits(self, text):
+        """
+        Yield (term_index, modifier) for every sentiment word in `text`.
+        """
+        text = text or ''
+        i = 0
+        n = len(text)
+        sign = 1.0
+        degree = 1.0
+        while i < n:
+            if text[i] in CLAUSE_BREAKS:
+                sign, degree = 1.0, 1.0
+                i += 1
+                continue
+            matched = None
+            for length in range(min(self.max_word_len, n - i), 0, -1):
+                word = text[i:i + length]
+                if word in self.kinds:
+                    matched = word
+                    break
+            if matched is None:
+                i += 1
+                continue
+
+            kind = self.kinds[matched]
+            if kind == 'neg':
+                sign = -sign
+            elif kind == 'deg':
+                degree *= self.degrees[matched]
+            else:
+                yield self.term_index[matched], sign * degree
+                sign, degree = 1.0, 1.0
+            i += len(matched)
+
+    def term_matrix(self, texts):
+        """
+        Build the sparse (len(texts) x len(terms)) hit matrix in CSR form.
+
+        Returns:
+            tuple: (data, indices, indptr) numpy arrays.
+        """
+        data = []
+        indices = []
+        indptr = [0]
+        for text in texts:
+            for term, modifier in self._hits(text):
+                indices.append(term)
+                data.append(modifier)
+            indptr.append(len(indices))
+        return (np.asarray(data, dtype=np.float64),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(indptr, dtype=np.int64))
+
+    def score_batch(self, texts):
+        """
+        Score many texts at once.
+
+        Returns:
+            numpy.ndarray: One score per text in [-1, 1]; 0 when no sentiment word occurs.
+        """
+        data, indices, indptr = self.term_matrix(texts)
+        rows = len(indptr) - 1
+        if rows == 0:
+            return np.zeros(0)
+        counts = np.diff(indptr)
+        row_ids = np.repeat(np.arange(rows), counts)
+        # CSR matrix-vector product: sum of modifier * polarity per document
+        raw = np.bincount(row_ids, weights=data * self.polarity[indices], minlength=rows)
+        # Damp long texts so a report with many hits does not saturate immediately
+        return np.tanh(raw / np.sqrt(counts + 1.0))
+
+    def score(self, text):
+        return float(self.score_batch([text])[0])
+
+
+def load_lexicon_file(path):
+    """
+    Read extra 'word<TAB>weight' lines (weight > 0 positive, < 0 negative).
+    """
+    extra = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) == 2 and parts[0]:
+                try:
+                    extra[parts[0]] = float(parts[1])
+                except ValueError:
+                    continue
+    return extra
+
+
+_scorer = None
+
+
+def get_scorer():
+    """
+    Process-wide scorer; SENTIMENT_LEXICON_PATH adds or overrides lexicon entries.
+    """
+    global _scorer
+    if _scorer is None:
+        path = os.environ.get('SENTIMENT_LEXICON_PATH')
+        extra = load_lexicon_file(path) if path and os.path.exists(path) else None
+        _scorer = SentimentScorer(extra=extra)
+    return _scorer
+
+
+def score_texts(texts):
+    """
+    Score a list of texts and return plain Python floats rounded for storage.
+    """
+    if not texts:
+        return []
+    return [round(float(s), 4) for s in get_scorer().score_batch(texts)]
+
+
+def score_pairs(pairs):
+    """
+    Process-pool entry point: [(id, text), ...] -> [(id, score), ...].
+    """
+    ids = [pair[0] for pair in pairs]
+    return list(zip(ids, score_texts([pair[1] for pair in pairs])))
+
+
+def sentiment_label(score):
+    if score is None or math.isnan(score):
+        return None
+    if score > NEUTRAL_THRESHOLD:
+        return 'positive'
+    if score < -NEUTRAL_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def _write_scores(scores):
+    """
+    Store [(id, score), ...] with one executemany UPDATE.
+    updated_at is assigned to itself so a derived score does not look like an edit;
+    the table version is bumped instead, so cached warehouse lists still change.
+    Dashboard rollups are adjusted first since Core updates skip the flush listeners.
+    """
+    from sqlalchemy import bindparam
+    from app import db
+    from app.models import OpinionData
+    from app.utils.http_cache import bump_version
+    from app.utils.rollups import rescore
+
+    if not scores:
+        return
+    rescore(scores)
+    table = OpinionData.__table__
+    stmt = table.update().where(table.c.id == bindparam('b_id')).values(
+        sentiment_score=bindparam('b_score'), updated_at=table.c.updated_at)
+    db.session.execute(stmt, [{'b_id': i, 'b_score': s} for i, s in scores])
+    bump_version(OpinionData)
+
+
+def backfill_sentiment(only_missing=True, batch_size=2000, workers=None, progress=None):
+    """
+    Score stored OpinionData rows in a process pool.
+
+    Rows are read by keyset pagination (id > last id), so each batch is a fresh
+    query and commits never invalidate an open cursor. At most 2 * workers batches
+    are in flight, which bounds memory regardless of table size.
+
+    Args:
+        only_missing (bool): Skip rows that already have a score.
+        batch_size (int): Rows per batch sent to a worker.
+        workers (int): Process count; 0 scores inline in this process.
+        progress (callable): Called with the running total after each batch.
+
+    Returns:
+        int: Number of rows scored.
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    from sqlalchemy import select
+    from app import db
+    from app.models import OpinionData, OpinionDetail
+
+    def batches():
+        last_id = 0
+        while True:
+            stmt = select(OpinionData.id, OpinionData.title, OpinionData.content, OpinionDetail.content) \
+                .outerjoin(OpinionDetail, OpinionDetail.opinion_id == OpinionData.id) \
+                .where(OpinionData.id > last_id).order_by(OpinionData.id).limit(batch_size)
+            if only_missing:
+                stmt = stmt.where(OpinionData.sentiment_score.is_(None))
+            rows = db.session.execute(stmt).all()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(row[0], item_text(row[1], row[2], row[3])) for row in rows]
+
+    total = 0
+
+    def store(scores):
+        nonlocal total
+        _write_scores(scores)
+        db.session.commit()
+        total += len(scores)
+        if progress:
+            progress(total)
+
+    if workers == 0:
+        for pairs in batches():
+            store(score_pairs(pairs))
+        return total
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        max_in_flight = 2 * workers
+        in_flight = set()
+        for pairs in batches():
+            in_flight.add(pool.submit(score_pairs, pairs))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(future.result())
+        for future in in_flight:
+            store(future.result())
+    return total
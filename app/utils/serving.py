@@ -0,0 +1,165 @@
+"""
+Production serving: in-flight requests, draining and the fallback server.
+
+Worker model. Scrape streams spend nearly all their time waiting on the
+search sites, so they are served by threads: gunicorn's gthread workers
+(gunicorn.conf.py, one process per core with WEB_THREADS threads each) or,
+without gunicorn, serve() below (one process, one thread per connection).
+A slow stream or a synchronous deep crawl holds one thread, not a worker.
+gevent is not used, because the scraper's thread pools and the crawl
+pipeline's parser processes do not mix with monkey-patching.
+
+Draining. init_app() counts requests in flight until their response body
+is closed, so a stream counts until its last line. On shutdown (SIGTERM)
+or worker recycling, the server stops accepting connections and
+begin_drain() starts the clock. Streams keep running for
+SHUTDOWN_DRAIN_SECONDS. Streams still open after that are cut short at their
+next event by until_drained(): the scrape is closed, so auto-save stores
+what it found, and a final event tells the page to retry. The process exits
+once nothing is in flight.
+"""
+import signal
+import threading
+import time
+
+from werkzeug.wsgi import ClosingIterator
+
+from app.utils.metrics import Gauge
+
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests whose response has not been closed yet')
+
+# Time streams get to send their final event once they are cut short (seconds)
+WRAP_UP_SECONDS = 10
+
+DRAINED_EVENT = {'type': 'error', 'draining': True, 'msg': '服务正在重启，本次任务已提前结束，请稍后重试'}
+
+
+class Serving:
+    def __init__(self, drain_seconds):
+        self.drain_seconds = drain_seconds
+        # Set once the drain period is over: streams stop at their next event
+        self.stop = threading.Event()
+        self._draining_since = None
+        self._timer = None
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def draining(self):
+        return self._draining_since is not None
+
+    def enter(self):
+        with self._cond:
+            self._active += 1
+        REQUESTS_IN_FLIGHT.inc()
+
+    def exit(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+        REQUESTS_IN_FLIGHT.dec()
+
+    def begin_drain(self, seconds=None):
+        """Start the drain period; streams are cut short when it ends. Repeated calls are ignored."""
+        with self._cond:
+            if self._draining_since is not None:
+                return
+            self._draining_since = time.monotonic()
+            seconds = self.drain_seconds if seconds is None else seconds
+            if seconds <= 0:
+                self.stop.set()
+            else:
+                self._timer = threading.Timer(seconds, self.stop.set)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def wait_idle(self, timeout=None):
+        """Wait until nothing is in flight. Returns False if requests were still open at the timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+class _InFlight:
+    def __init__(self, wsgi_app, serving):
+        self.wsgi_app = wsgi_app
+        self.serving = serving
+
+    def __call__(self, environ, start_response):
+        self.serving.enter()
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.serving.exit()
+            raise
+        # Servers close the body after the last chunk or when the client went away
+        return ClosingIterator(body, self.serving.exit)
+
+
+def get_serving(app):
+    return app.extensions.get('serving')
+
+
+def until_drained(events, app):
+    """
+    Pass events through until the app's drain period is over, then close
+    them and end with DRAINED_EVENT.
+    """
+    serving = get_serving(app)
+    try:
+        for event in events:
+            yield event
+            if serving is not None and serving.stop.is_set():
+                events.close()
+                yield dict(DRAINED_EVENT)
+                return
+    finally:
+        events.close()
+
+
+def serve(app, host='127.0.0.1', port=8000, drain_seconds=None):
+    """
+    Serve app on Werkzeug's threaded server until SIGTERM or SIGINT, then
+    drain: stop accepting, give open requests the drain period plus
+    WRAP_UP_SECONDS, and return.
+    """
+    from werkzeug.serving import make_server
+
+    serving = get_serving(app)
+    if drain_seconds is None:
+        drain_seconds = serving.drain_seconds
+    server = make_server(host, port, app, threaded=True)
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            app.logger.info('Shutting down, draining %d requests for up to %ss', serving.active, drain_seconds)
+            serving.begin_drain(drain_seconds)
+            # shutdown() waits for serve_forever(), which runs in this (the main) thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    previous = {sig: signal.signal(sig, handle_signal) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        app.logger.info('Serving on http://%s:%s', host, server.server_port)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    if not serving.wait_idle(drain_seconds + WRAP_UP_SECONDS):
+        app.logger.warning('Exiting with %d requests still open', serving.active)
+
+
+def init_app(app):
+    serving = app.extensions['serving'] = Serving(app.config['SHUTDOWN_DRAIN_SECONDS'])
+    app.wsgi_app = _InFlight(app.wsgi_app, serving)
@@ -0,0 +1,206 @@
+"""
+Fingerprinted, precompressed static files.
+
+build() copies every file under the static folder to STATIC_BUILD_DIR with a
+content hash in its name (layui/layui.js -> layui/layui.3f2a9c01b7de.js),
+rewriting url() references in stylesheets to the hashed names first, and
+writes .gz (and .br, when the brotli package is installed) next to each
+compressible file where that saves space. manifest.json maps original to
+hashed names.
+
+init_app() builds on startup when the static files changed since the last
+build (or uses `flask build-static` output), then:
+
+- url_for('static', filename=...) emits the hashed URL, so templates need no
+  changes;
+- hashed URLs are served from the build with the best encoding the client
+  accepts and a year-long immutable Cache-Control, so repeat page loads fetch
+  nothing;
+- anything else under /static falls through to Flask's own static handler.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import uuid
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+MANIFEST = 'manifest.json'
+# Formats that are not compressed already (woff/woff2 and images are)
+COMPRESSIBLE = ('.js', '.css', '.svg', '.ttf', '.eot', '.json', '.html', '.txt', '.map', '.xml')
+# Smaller files are not worth a second request header
+MIN_COMPRESS_BYTES = 1024
+HASH_LENGTH = 12
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def hashed_name(name, data):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def source_files(static_folder):
+    """Relative (posix) paths of the static files, skipping hidden ones."""
+    names = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for file in sorted(files):
+            if not file.startswith('.'):
+                names.append(os.path.relpath(os.path.join(root, file), static_folder).replace(os.sep, '/'))
+    return names
+
+
+def source_signature(static_folder):
+    """Digest of the static files' names, sizes and mtimes; a build is stale when it changes."""
+    digest = hashlib.sha256()
+    for name in source_files(static_folder):
+        stat = os.stat(os.path.join(static_folder, name))
+        digest.update(f'{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def rewrite_css(name, text, files):
+    """Point relative url() references of stylesheet `name` at their hashed names."""
+    base = posixpath.dirname(name)
+
+    def replace(match):
+        quote, ref = match.groups()
+        if ref.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', ref).groups()
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in files:
+            return match.group(0)
+        hashed = posixpath.relpath(files[target], base or '.')
+        return f'url({quote}{hashed}{suffix}{quote})'
+
+    return _CSS_URL.sub(replace, text)
+
+
+def compress(data):
+    """{encoding: body} for the encodings that make `data` smaller."""
+    variants = {}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        variants['gzip'] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            variants['br'] = br
+    return variants
+
+
+def build(static_folder, build_dir):
+    """
+    Fingerprint and precompress the static folder into build_dir.
+
+    Returns:
+        dict: The manifest: {'signature', 'files': {name: hashed}, 'encodings': {hashed: [...]}}
+    """
+    signature = source_signature(static_folder)
+    names = source_files(static_folder)
+    files = {}
+    encodings = {}
+    # Stylesheets last, so the files they reference already have their hashed names
+    for name in sorted(names, key=lambda n: n.endswith('.css')):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = rewrite_css(name, data.decode('utf-8'), files).encode('utf-8')
+        hashed = files[name] = hashed_name(name, data)
+        target = os.path.join(build_dir, hashed)
+        if not os.path.exists(target):
+            _write(target, data)
+        if name.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS_BYTES:
+            variants = compress(data)
+            for encoding, body in variants.items():
+                suffix = '.br' if encoding == 'br' else '.gz'
+                if not os.path.exists(target + suffix):
+                    _write(target + suffix, body)
+            if variants:
+                encodings[hashed] = sorted(variants)
+    manifest = {'signature': signature, 'files': files, 'encodings': encodings}
+    _write(os.path.join(build_dir, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(build_dir):
+    try:
+        with open(os.path.join(build_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_or_build(static_folder, build_dir):
+    """The build's manifest, rebuilt first when the static files changed."""
+    manifest = load_manifest(build_dir)
+    if manifest is None or manifest.get('signature') != source_signature(static_folder):
+        manifest = build(static_folder, build_dir)
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self, build_dir, manifest, max_age):
+        self.build_dir = build_dir
+        self.files = manifest['files']
+        self.encodings = manifest['encodings']
+        self.hashed = set(self.files.values())
+        self.max_age = max_age
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.files.get(values['filename'], values['filename'])
+
+    def serve(self, filename):
+        if filename not in self.hashed:
+            return current_app.send_static_file(filename)
+        path = filename
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in self.encodings.get(filename, ()) and accepted[candidate]:
+                path, encoding = filename + suffix, candidate
+                break
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(self.build_dir, path, mimetype=mimetype, max_age=self.max_age)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if filename in self.encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def init_app(app):
+    build_dir = app.config.get('STATIC_BUILD_DIR')
+    if not build_dir or not app.static_folder:
+        return
+    try:
+        manifest = load_or_build(app.static_folder, build_dir)
+    except OSError as e:
+        # E.g. a read-only deployment without a prebuilt directory: plain static serving
+        app.logger.warning('Static build in %s failed, serving unhashed files: %s', build_dir, e)
+        return
+    assets = app.extensions['static_assets'] = StaticAssets(build_dir, manifest, app.config['STATIC_MAX_AGE'])
+    app.url_defaults(assets.url_defaults)
+    app.view_functions['static'] = assets.serve
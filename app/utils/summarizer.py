@@ -0,0 +1,238 @@
+"""
+Map-reduce summarization of long article bodies.
+
+Bodies are split on paragraph boundaries into chunks that fit a token budget
+(sentences, then characters, only when a single paragraph is too long). Every
+chunk is summarized on its own (map), concurrently through the engine router,
+and the chunk summaries are merged (reduce), in several rounds when they do not
+fit one budget. Both stages are cached in summary_chunks by model, prompt
+version and content hash, so editing an article only re-bills the chunks that
+changed plus the reduce steps above them.
+"""
+import hashlib
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import db
+from app.models import SummaryChunk
+from app.utils.ai_router import get_router
+
+# Bump whenever the prompts change; old cache entries then stop matching
+SUMMARY_PROMPT_VERSION = 'v1'
+
+MAP_PROMPT = '你是一名舆情分析师。请用不超过150字概括下面这段文章片段的要点，只输出摘要正文，不要添加评论。'
+REDUCE_PROMPT = '下面是同一篇文章按顺序排列的各部分摘要。请整合为一段不超过200字的完整摘要，只输出摘要正文。'
+
+# Bound for IN (...) lists, below SQLite's variable limit
+IN_CHUNK = 500
+
+_CJK = re.compile(r'[\u4e00-\u9fff]')
+_PARAGRAPHS = re.compile(r'\n\s*\n|\n')
+_SENTENCES = re.compile(r'(?<=[。！？!?；;.])')
+
+
+def estimate_tokens(text):
+    """
+    Rough token count without a tokenizer: one per CJK character, one per four other characters.
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _pieces(paragraph, budget):
+    """Break an oversized paragraph into sentences, and oversized sentences into slices."""
+    for sentence in _SENTENCES.split(paragraph):
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= budget:
+            yield sentence
+            continue
+        # Assume the worst case of one token per character
+        for i in range(0, len(sentence), budget):
+            yield sentence[i:i + budget]
+
+
+def split_chunks(text, budget):
+    """
+    Pack paragraphs greedily into chunks of at most `budget` estimated tokens.
+
+    Returns:
+        list: Chunk strings in document order.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in _PARAGRAPHS.split(text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if estimate_tokens(paragraph) <= budget else list(_pieces(paragraph, budget))
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > budget:
+                chunks.append('\n'.join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _cached(stage, model_names, hashes):
+    """content_hash -> SummaryChunk for any of the engines' models."""
+    found = {}
+    hashes = list(hashes)
+    for i in range(0, len(hashes), IN_CHUNK):
+        rows = SummaryChunk.query.filter(
+            SummaryChunk.model_name.in_(list(model_names)),
+            SummaryChunk.prompt_version == SUMMARY_PROMPT_VERSION,
+            SummaryChunk.stage == stage,
+            SummaryChunk.content_hash.in_(hashes[i:i + IN_CHUNK])
+        )
+        for row in rows:
+            found.setdefault(row.content_hash, row)
+    return found
+
+
+def _summarize_one(router, engine_ids, prompt, text, timeout):
+    """Runs in a worker thread: HTTP only, no database access."""
+    return router.chat([
+        {'role': 'system', 'content': prompt},
+        {'role': 'user', 'content': text},
+    ], engine_ids=engine_ids, timeout=timeout, temperature=0)
+
+
+class _Stage:
+    """Run one map or reduce round: cache lookup, concurrent calls for the misses, cache writes."""
+
+    def __init__(self, router, engine_ids, model_names, timeout):
+        self.router = router
+        self.engine_ids = engine_ids
+        self.model_names = model_names
+        self.timeout = timeout
+        self.calls = 0
+        self.cached = 0
+
+    def run(self, stage, texts):
+        """
+        Args:
+            texts (list): Inputs; duplicates are summarized once.
+
+        Returns:
+            dict: content_hash -> summary, or an AIClientError/Exception for failed inputs.
+        """
+        by_hash = {_hash(t): t for t in texts}
+        hits = _cached(stage, self.model_names, by_hash)
+        out = {h: row.summary for h, row in hits.items()}
+        self.cached += len(hits)
+        missing = [h for h in by_hash if h not in hits]
+        if not missing:
+            return out
+
+        prompt = MAP_PROMPT if stage == 'map' else REDUCE_PROMPT
+        workers = min(len(missing), max(self.router.capacity(self.engine_ids), 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(h, executor.submit(_summarize_one, self.router, self.engine_ids, prompt,
+                                           by_hash[h], self.timeout)) for h in missing]
+            # Cache rows are written from this thread only
+            for h, future in futures:
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    out[h] = e
+                    continue
+                summary = reply['content'].strip()
+                db.session.add(SummaryChunk(
+                    model_name=reply['model_name'], prompt_version=SUMMARY_PROMPT_VERSION, stage=stage,
+                    content_hash=h, summary=summary,
+                    prompt_tokens=reply['usage'].get('prompt_tokens'),
+                    completion_tokens=reply['usage'].get('completion_tokens'),
+                ))
+                out[h] = summary
+                self.calls += 1
+        db.session.flush()
+        return out
+
+
+def summarize_texts(texts, engines, budget=None):
+    """
+    Summarize many long texts, sharing one pool of concurrent requests.
+
+    Args:
+        texts (dict): key -> text.
+        engines (list): Active AIEngine rows to route over.
+        budget (int): Tokens per chunk; SUMMARY_CHUNK_TOKENS by default.
+
+    Returns:
+        dict: {'summaries': {key: {'summary', 'chunks'}}, 'errors': {key: msg},
+               'calls': int, 'cached': int}
+    """
+    budget = budget or current_app.config['SUMMARY_CHUNK_TOKENS']
+    timeout = current_app.config['AI_REQUEST_TIMEOUT']
+    router = get_router(engines, max_concurrency=current_app.config['AI_MAX_CONCURRENCY'], timeout=timeout)
+    stage = _Stage(router, [e.id for e in engines], {e.model_name for e in engines}, timeout)
+
+    chunks = {key: split_chunks(text, budget) for key, text in texts.items()}
+    chunks = {key: parts for key, parts in chunks.items() if parts}
+    mapped = stage.run('map', [c for parts in chunks.values() for c in parts])
+
+    errors = {}
+    levels = {}
+    for key, parts in chunks.items():
+        results = [mapped[_hash(c)] for c in parts]
+        failed = next((r for r in results if isinstance(r, Exception)), None)
+        if failed is not None:
+            errors[key] = str(failed)
+        else:
+            levels[key] = results
+
+    # Reduce rounds: group summaries into budget-sized batches until one summary is left
+    while any(len(summaries) > 1 for summaries in levels.values()):
+        groups = {key: ['\n'.join(g) for g in _group(summaries, budget)]
+                  for key, summaries in levels.items() if len(summaries) > 1}
+        reduced = stage.run('reduce', [g for gs in groups.values() for g in gs])
+        for key, gs in groups.items():
+            results = [reduced[_hash(g)] for g in gs]
+            failed = next((r for r in results if isinstance(r, Exception)), None)
+            if failed is not None:
+                errors[key] = str(failed)
+                del levels[key]
+            else:
+                levels[key] = results
+
+    return {
+        'summaries': {key: {'summary': levels[key][0], 'chunks': len(chunks[key])} for key in levels},
+        'errors': errors,
+        'calls': stage.calls,
+        'cached': stage.cached,
+    }
+
+
+def _group(summaries, budget):
+    """Numbered summaries packed into budget-sized groups of at least two, so every round shrinks."""
+    groups = []
+    current = []
+    size = 0
+    for i, summary in enumerate(summaries, 1):
+        line = f'{i}. {summary}'
+        tokens = estimate_tokens(line)
+        if len(current) >= 2 and size + tokens > budget:
+            groups.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += tokens
+    groups.append(current)
+    if len(groups) > 1 and len(groups[-1]) == 1:
+        # A lone trailing summary would cost a call without reducing anything
+        groups[-2].extend(groups.pop())
+    return groups
@@ -0,0 +1,125 @@
+"""
+Background tasks.
+
+Jobs run on a small thread pool inside an application context. Their status
+is kept in the background_tasks table, so any web worker can answer a poll
+and finished tasks survive restarts and worker recycling. Status writes go
+through their own short transactions on the engine, never through the job's
+session, so they neither commit nor wait for the job's pending work; jobs
+should therefore report progress between their own commits.
+"""
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from app.models import BackgroundTask
+
+_executor = None
+_lock = threading.Lock()
+
+# Finished tasks kept for polling before the oldest are deleted
+MAX_FINISHED_TASKS = 200
+# Progress is written at most this often (seconds); the last step always is
+PROGRESS_INTERVAL = 1.0
+
+
+def _write(task_id, **values):
+    table = BackgroundTask.__table__
+    with db.engine.begin() as connection:
+        connection.execute(update(table).where(table.c.id == task_id)
+                           .values(updated_at=datetime.now(), **values))
+
+
+class TaskContext:
+    """Handed to the job so it can report progress."""
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self._written = 0.0
+
+    def progress(self, done, total=None, msg=None):
+        now = time.monotonic()
+        if now - self._written < PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        self._written = now
+        values = {'progress': done}
+        if total is not None:
+            values['total'] = total
+        if msg is not None:
+            values['msg'] = msg
+        _write(self.task_id, **values)
+
+
+def _get_executor(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('TASK_WORKERS', 2),
+                                           thread_name_prefix='task')
+        return _executor
+
+
+def _prune(connection):
+    table = BackgroundTask.__table__
+    cutoff = connection.scalar(select(table.c.finished_at).where(table.c.finished_at.isnot(None))
+                               .order_by(table.c.finished_at.desc()).offset(MAX_FINISHED_TASKS).limit(1))
+    if cutoff is not None:
+        connection.execute(delete(table).where(table.c.finished_at <= cutoff))
+
+
+def submit(app, name, func, *args, **kwargs):
+    """
+    Run func(ctx, *args, **kwargs) in the background inside an app context.
+
+    Returns:
+        str: Task id for get_task().
+    """
+    task_id = uuid.uuid4().hex
+    now = datetime.now()
+    with db.engine.begin() as connection:
+        _prune(connection)
+        connection.execute(insert(BackgroundTask.__table__).values(
+            id=task_id, name=name, status='pending', progress=0, msg='', created_at=now, updated_at=now))
+
+    def run():
+        with app.app_context():
+            _write(task_id, status='running')
+            try:
+                result = func(TaskContext(task_id), *args, **kwargs)
+                values = {'status': 'success', 'result': json.dumps(result, ensure_ascii=False, default=str)}
+            except Exception as e:
+                db.session.rollback()
+                traceback.print_exc()
+                values = {'status': 'failed', 'error': str(e)}
+            finally:
+                db.session.remove()
+            _write(task_id, finished_at=datetime.now(), **values)
+
+    _get_executor(app).submit(run)
+    return task_id
+
+
+def get_task(task_id):
+    task = db.session.get(BackgroundTask, task_id, populate_existing=True)
+    if not task:
+        return None
+    return {
+        'id': task.id,
+        'name': task.name,
+        'status': task.status,
+        'progress': task.progress,
+        'total': task.total,
+        'msg': task.msg,
+        'result': json.loads(task.result) if task.result else None,
+        'error': task.error,
+        'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'finished_at': task.finished_at.strftime('%Y-%m-%d %H:%M:%S') if task.finished_at else None,
+    }
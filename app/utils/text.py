@@ -0,0 +1,59 @@
+import re
+
+try:
+    import jieba
+    jieba.setLogLevel(60)
+except ImportError:  # pragma: no cover - optional dependency
+    jieba = None
+
+# Function words and boilerplate that carry no topic signal in news text
+STOPWORDS = {
+    '的', '了', '和', '是', '在', '也', '有', '与', '及', '等', '对', '为', '将', '被', '把', '从', '到', '由',
+    '并', '而', '或', '但', '就', '都', '还', '又', '这', '那', '其', '之', '以', '于', '上', '下', '中',
+    '我们', '他们', '你们', '一个', '没有', '可以', '进行', '表示', '已经', '目前', '记者', '今天', '昨天',
+    '日电', '新华社', '报道', '消息', '来源', '责任编辑', '编辑', '原标题', '图片', '视频', '点击', '查看',
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'was', 'www', 'com', 'http', 'https',
+}
+
+_CJK_RUN = re.compile(r'[\u4e00-\u9fff]+')
+_WORD = re.compile(r'[a-zA-Z][a-zA-Z0-9]+|[\u4e00-\u9fff]+')
+
+
+def item_text(title, content, detail_content=None):
+    """Prefer the deep-crawled body, fall back to the list summary."""
+    return '\n'.join(part for part in (title, detail_content or content) if part)
+
+
+_SINGLE_STOPWORDS = ''.join(w for w in STOPWORDS if len(w) == 1 and _CJK_RUN.fullmatch(w))
+_STOP_SPLIT = re.compile('[' + _SINGLE_STOPWORDS + ']')
+
+
+def _bigrams(run):
+    # Break at function characters first so '经济的发展' never yields '济的' / '的发'
+    grams = []
+    for part in _STOP_SPLIT.split(run):
+        grams.extend(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+
+def tokenize(text):
+    """
+    Split Chinese/English text into index terms.
+
+    Uses jieba when installed; otherwise overlapping CJK bigrams, which need no
+    dictionary and still match multi-character words reliably for TF-IDF.
+    English words are lower-cased; single characters and stopwords are dropped.
+    """
+    if not text:
+        return []
+    tokens = []
+    for match in _WORD.finditer(text):
+        chunk = match.group(0)
+        if _CJK_RUN.fullmatch(chunk):
+            words = jieba.lcut(chunk) if jieba else _bigrams(chunk)
+            tokens.extend(w for w in words if len(w) > 1 and w not in STOPWORDS)
+        else:
+            word = chunk.lower()
+            if word not in STOPWORDS:
+                tokens.append(word)
+    return tokens
@@ -0,0 +1,43 @@
+"""
+Inserts into tables with a unique key that tolerate concurrent writers.
+
+Selecting the existing keys and inserting the missing ones races with
+another transaction doing the same: both see the key missing and one of them
+fails on the unique constraint, losing its whole batch. These statements let
+the database decide instead: INSERT ... ON CONFLICT on SQLite and PostgreSQL,
+INSERT ... ON DUPLICATE KEY UPDATE on MySQL/MariaDB. Execute them with a list
+of rows (executemany). `bind` (a connection or engine) picks the dialect and
+defaults to the session's.
+"""
+from app import db
+
+
+def _dialect_insert(table, bind=None):
+    name = (bind if bind is not None else db.session.get_bind()).dialect.name
+    if name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        raise NotImplementedError(f'No upsert for the {name} dialect')
+    return name, insert(table)
+
+
+def insert_ignore(table, keys, bind=None):
+    """INSERT that skips rows whose unique `keys` already exist."""
+    name, stmt = _dialect_insert(table, bind)
+    if name in ('mysql', 'mariadb'):
+        # A no-op update; INSERT IGNORE would also swallow unrelated errors
+        return stmt.on_duplicate_key_update({keys[0]: table.c[keys[0]]})
+    return stmt.on_conflict_do_nothing(index_elements=keys)
+
+
+def insert_or_add(table, keys, counters, bind=None):
+    """INSERT that, for rows whose unique `keys` exist, adds the given `counters` columns to the stored ones."""
+    name, stmt = _dialect_insert(table, bind)
+    if name in ('mysql', 'mariadb'):
+        return stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counters})
+    return stmt.on_conflict_do_update(index_elements=keys,
+                                      set_={c: table.c[c] + stmt.excluded[c] for c in counters})
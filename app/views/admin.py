@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, send_file
 from flask_login import login_required
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.user import User, Role, SystemSetting
 from app.utils.decorators import admin_required
+from app.utils.profiler import list_profiles, load_profile, profile_file
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -10,7 +12,8 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 @login_required
 @admin_required
 def user_list():
-    users = User.query.all()
+    # The template shows each user's role
+    users = User.query.options(joinedload(User.role)).all()
     return render_template('admin/user_list.html', users=users)
 
 @admin_bp.route('/users/create', methods=['GET', 'POST'])
@@ -94,3 +97,32 @@ def settings():
     settings_list = SystemSetting.query.all()
     settings_dict = {s.key: s.value for s in settings_list}
     return render_template('admin/settings.html', settings=settings_dict)
+
+@admin_bp.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    items = list_profiles(current_app.config['PROFILER_DIR'])
+    endpoint = request.args.get('endpoint', '')
+    if endpoint:
+        items = [p for p in items if p.get('endpoint') == endpoint]
+    return render_template('admin/profiles.html', profiles=items, endpoint=endpoint,
+                           sample_rate=current_app.config['PROFILER_SAMPLE_RATE'])
+
+@admin_bp.route('/profiles/<profile_id>')
+@login_required
+@admin_required
+def profile_detail(profile_id):
+    profile = load_profile(current_app.config['PROFILER_DIR'], profile_id)
+    if profile is None:
+        abort(404)
+    return render_template('admin/profile_detail.html', profile=profile)
+
+@admin_bp.route('/profiles/<profile_id>/download')
+@login_required
+@admin_required
+def profile_download(profile_id):
+    path = profile_file(current_app.config['PROFILER_DIR'], profile_id)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True)
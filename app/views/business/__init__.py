@@ -2,4 +2,4 @@ from flask import Blueprint
 
 business_bp = Blueprint('business', __name__, url_prefix='/business')
 
-from . import customer, order, analysis, warehouse, rule, ai_engine
+from . import customer, order, analysis, warehouse, rule, ai_engine, task, burst, cover
@@ -2,8 +2,18 @@ from flask import render_template, request, jsonify
 from flask_login import login_required
 from app import db
 from app.models.ai_engine import AIEngine
+from app.models.analysis import AnalysisResult
+from app.utils.http_cache import etag_from_tables
 from . import business_bp
 
+def _positive_int(value):
+    """Form values arrive as strings; empty or invalid means unset."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
 @business_bp.route('/ai_engines')
 @login_required
 def ai_engines():
@@ -14,6 +24,7 @@ def ai_engines():
 
 @business_bp.route('/ai_engines/list', methods=['GET'])
 @login_required
+@etag_from_tables(AIEngine)
 def list_ai_engines():
     """
     Get list of AI engines for the frontend grid/table.
@@ -25,6 +36,16 @@ def list_ai_engines():
     except Exception as e:
         return jsonify({'code': 500, 'msg': str(e)})
 
+@business_bp.route('/ai_engines/stats', methods=['GET'])
+@login_required
+def ai_engine_stats():
+    """
+    Live routing state per engine: load, latency, error rate, circuit and rate limits.
+    """
+    from app.utils.ai_router import router_stats
+
+    return jsonify({'code': 0, 'msg': '', 'data': router_stats()})
+
 @business_bp.route('/ai_engines/add', methods=['POST'])
 @login_required
 def add_ai_engine():
@@ -38,7 +59,9 @@ def add_ai_engine():
             api_url=data.get('api_url'),
             api_key=data.get('api_key'),
             model_name=data.get('model_name'),
-            is_active=data.get('is_active', True)
+            is_active=data.get('is_active', True),
+            max_concurrency=_positive_int(data.get('max_concurrency')),
+            weight=_positive_int(data.get('weight')) or 1
         )
         db.session.add(new_engine)
         db.session.commit()
@@ -65,6 +88,8 @@ def update_ai_engine():
         engine.api_key = data.get('api_key')
         engine.model_name = data.get('model_name')
         engine.is_active = data.get('is_active', True)
+        engine.max_concurrency = _positive_int(data.get('max_concurrency'))
+        engine.weight = _positive_int(data.get('weight')) or 1
         
         db.session.commit()
         return jsonify({'code': 0, 'msg': '更新成功'})
@@ -84,7 +109,10 @@ def delete_ai_engine():
         engine = AIEngine.query.get(engine_id)
         if not engine:
             return jsonify({'code': 404, 'msg': 'Engine not found'})
-            
+
+        # Cached results outlive the engine; databases migrated before the FK had ON DELETE SET NULL
+        # would refuse the delete otherwise
+        AnalysisResult.query.filter_by(engine_id=engine.id).update({'engine_id': None}, synchronize_session=False)
         db.session.delete(engine)
         db.session.commit()
         return jsonify({'code': 0, 'msg': '删除成功'})
@@ -1,10 +1,17 @@
-from flask import render_template, request, jsonify, Response, stream_with_context
+from flask import render_template, request, jsonify, Response, current_app, stream_with_context
 from . import business_bp
-from app.utils.scraper import scrape_baidu_generator, scrape_content, scrape_sohu_generator
 from flask_login import login_required
 from app import db
 from app.models import OpinionData
+from app.utils.bursts import get_detector
+from app.utils.cover_cache import prefetch_covers
+from app.utils.importer import dedup_items, existing_urls, insert_items
+from app.utils.keyword_index import index_documents
+from app.utils.page_archive import get_archive
+from app.utils.serving import until_drained
+from app.utils.text import item_text
 import json
+from contextlib import closing
 
 @business_bp.route('/analysis', methods=['GET', 'POST'])
 @login_required
@@ -29,17 +36,42 @@ def analysis():
             
         if not keyword:
             return jsonify({'code': 400, 'msg': '请输入关键字'})
+
+        # requests/bs4/lxml are loaded by the first scrape, not at startup
+        from app.utils.scraper import scrape_baidu_generator, scrape_sohu_generator
         
+        # stream=items: one event per result as it is found (the analysis page), else one result event
+        stream_items = request.form.get('stream') == 'items'
+        # autosave=1: store results as they are found instead of posting them back to save_data
+        autosave = request.form.get('autosave') in ('1', 'true', 'on')
+        config = current_app.config
+        page_delay = (config['SCRAPER_PAGE_DELAY_MIN'], config['SCRAPER_PAGE_DELAY_MAX'])
+
         def generate():
+            # The login check's connection goes back to the pool for the length of the scrape;
+            # auto-save batches take one when they flush
+            db.session.close()
             try:
                 generator = None
                 if source == 'sohu':
-                    generator = scrape_sohu_generator(keyword, pages=pages, limit=limit)
+                    generator = scrape_sohu_generator(keyword, pages=pages, limit=limit,
+                                                      search_url=config['SCRAPER_SOHU_URL'], page_delay=page_delay,
+                                                      resolve_workers=config['SCRAPER_RESOLVE_WORKERS'],
+                                                      stream_items=stream_items or autosave)
                 else:
-                    generator = scrape_baidu_generator(keyword, pages=pages, limit=limit)
-                    
-                for item in generator:
-                    yield json.dumps(item) + '\n'
+                    generator = scrape_baidu_generator(keyword, pages=pages, limit=limit,
+                                                       search_url=config['SCRAPER_BAIDU_URL'], page_delay=page_delay,
+                                                       resolve_workers=config['SCRAPER_RESOLVE_WORKERS'],
+                                                       stream_items=stream_items or autosave)
+                if autosave:
+                    generator = autosave_events(generator, keyword, config['AUTOSAVE_BATCH_SIZE'], stream_items)
+                # On shutdown, ends the scrape (saving what auto-save holds) once the drain period is over
+                generator = until_drained(generator, current_app)
+
+                # Closed with the response, so a client going away stops the scrape (and saves what it found)
+                with closing(generator):
+                    for item in generator:
+                        yield json.dumps(item) + '\n'
             except Exception as e:
                 yield json.dumps({'type': 'error', 'msg': str(e)}) + '\n'
 
@@ -47,6 +79,72 @@ def analysis():
             
     return render_template('business/analysis.html')
 
+def autosave_events(events, keyword, batch_size, stream_items=True):
+    """
+    Store the items of an item stream as they arrive, in de-duplicating batches.
+
+    Items are stored as the save buttons on the analysis page store them (keyword of
+    the run, no content until deep-crawled). A batch is inserted and committed when it
+    is full and when a result page ends, so a closed tab or a failed page keeps what was
+    found before it. Every commit is followed by a 'saved' event with the running
+    totals, which progress, error and done events also carry under 'saved'.
+
+    Args:
+        events (iterator): Scraper events with stream_items=True.
+        stream_items (bool): Pass item events on; when False they are collected into
+            one result event at the end instead.
+
+    Yields:
+        dict: The scraper events, with the 'saved' events in between.
+    """
+    totals = {'saved': 0, 'duplicates': 0}
+    batch = []
+    collected = []
+
+    def flush():
+        if not batch:
+            return False
+        new_items, duplicates = dedup_items(batch)
+        totals['saved'] += insert_items(new_items)
+        totals['duplicates'] += duplicates
+        db.session.commit()
+        get_detector(current_app).observe_items(
+            [{'keyword': i['keyword'], 'source': i.get('source')} for i in new_items])
+        prefetch_covers(current_app, [i.get('cover') for i in new_items])
+        batch.clear()
+        return True
+
+    try:
+        for event in events:
+            if event['type'] == 'item':
+                batch.append(dict(event['data'], keyword=keyword, content='', is_deep_crawled=False))
+                if stream_items:
+                    yield event
+                else:
+                    collected.append(event['data'])
+                if len(batch) >= batch_size and flush():
+                    yield {'type': 'saved', **totals}
+                continue
+            # A new page, an error or the end of the run closes the batch
+            if flush():
+                yield {'type': 'saved', **totals}
+            event['saved'] = dict(totals)
+            if event['type'] == 'done' and not stream_items:
+                event = {'type': 'result', 'data': collected, 'stats': event['stats'], 'saved': event['saved']}
+            yield event
+    except GeneratorExit:
+        # The client went away: keep what was found so far
+        try:
+            flush()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Autosave of %r failed after the client disconnected', keyword)
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+
 @business_bp.route('/deep_crawl', methods=['POST'])
 @login_required
 def deep_crawl():
@@ -54,8 +152,9 @@ def deep_crawl():
     if not url:
         return jsonify({'code': 400, 'msg': 'Missing URL'})
     
+    from app.utils.scraper import scrape_content
     try:
-        content = scrape_content(url)
+        content = scrape_content(url, archive=get_archive(current_app))
         return jsonify({'code': 0, 'msg': 'success', 'content': content})
     except Exception as e:
         return jsonify({'code': 500, 'msg': str(e)})
@@ -63,16 +162,20 @@ def deep_crawl():
 @business_bp.route('/save_data', methods=['POST'])
 @login_required
 def save_data():
+    from app.utils.clustering import assign_new_items
+    from app.utils.sentiment import score_texts
     try:
         items = request.json.get('items', [])
         if not items:
              return jsonify({'code': 400, 'msg': 'No data to save'})
         
         count = 0
+        new_opinions = []
+        # Check duplicates by original_url to prevent double insertion, in one query for the batch
+        seen = existing_urls({item.get('original_url') for item in items} - {None})
         for item in items:
-            # Check duplicate by original_url to prevent double insertion
-            exists = OpinionData.query.filter_by(original_url=item.get('original_url')).first()
-            if not exists:
+            if item.get('original_url') not in seen:
+                seen.add(item.get('original_url'))
                 new_opinion = OpinionData(
                     keyword=item.get('keyword'),
                     title=item.get('title'),
@@ -84,9 +187,21 @@ def save_data():
                     is_deep_crawled=item.get('is_deep_crawled', False)
                 )
                 db.session.add(new_opinion)
+                new_opinions.append(new_opinion)
                 count += 1
+
+        texts = [item_text(o.title, o.content) for o in new_opinions]
+        for opinion, score in zip(new_opinions, score_texts(texts)):
+            opinion.sentiment_score = score
+        db.session.flush()
+        index_documents((o.id, text) for o, text in zip(new_opinions, texts))
+        assign_new_items(o.id for o in new_opinions)
+        arrivals = [{'keyword': o.keyword, 'source': o.source} for o in new_opinions]
+        covers = [o.cover_url for o in new_opinions]
         
         db.session.commit()
+        get_detector(current_app).observe_items(arrivals)
+        prefetch_covers(current_app, covers)
         return jsonify({'code': 0, 'msg': f'成功保存 {count} 条数据'})
         
     except Exception as e:
@@ -0,0 +1,28 @@
+from flask import current_app, jsonify, request
+from flask_login import login_required
+from . import business_bp
+from app.utils.bursts import DIMENSIONS, get_detector
+
+@business_bp.route('/bursts')
+@login_required
+def burst_events():
+    """
+    Burst events raised on the ingest path; poll with ?since=<last seq>.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 50, type=int)
+    events = get_detector(current_app).recent_events(since=since, limit=max(1, min(limit, 200)))
+    return jsonify({'code': 0, 'msg': '', 'data': events})
+
+@business_bp.route('/bursts/series')
+@login_required
+def burst_series():
+    """
+    Current arrival rates per keyword/source from the sliding windows.
+    """
+    dimension = request.args.get('dimension') or None
+    if dimension and dimension not in DIMENSIONS:
+        return jsonify({'code': 400, 'msg': 'dimension 仅支持 keyword / source'})
+    limit = request.args.get('limit', 20, type=int)
+    rows = get_detector(current_app).snapshot(dimension=dimension, limit=max(1, min(limit, 200)))
+    return jsonify({'code': 0, 'msg': '', 'data': rows})
@@ -0,0 +1,34 @@
+from flask import Response, current_app, jsonify, redirect, request, url_for
+from flask_login import login_required
+from . import business_bp
+from app.utils.cover_cache import SIZES, DEFAULT_SIZE, CoverError, get_cover_cache
+
+@business_bp.route('/cover')
+@login_required
+def cover():
+    """
+    Cover image through the local thumbnail cache: ?url=<cover url>&size=small|medium.
+    Covers that cannot be fetched redirect to the default image.
+    """
+    url = (request.args.get('url') or '').strip()
+    if url.startswith('//'):
+        url = 'https:' + url
+    size = request.args.get('size', DEFAULT_SIZE)
+    if not url.startswith(('http://', 'https://')) or size not in SIZES:
+        return jsonify({'code': 400, 'msg': '参数错误'})
+
+    cache = get_cover_cache(current_app)
+    if cache is None:
+        return redirect(url)
+    try:
+        image = cache.load(url, size)
+    except CoverError:
+        return redirect(url_for('static', filename='img/defalt_img.png'))
+
+    response = Response(image.data, mimetype=image.content_type)
+    response.set_etag(image.etag)
+    # A URL's cover never changes once cached; private because the route needs a login
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['COVER_MAX_AGE']
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
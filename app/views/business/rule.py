@@ -1,7 +1,10 @@
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, current_app
 from . import business_bp
 from app import db
 from app.models.rule import ScrapingRule
+from app.utils import tasks
+from app.utils.http_cache import etag_from_tables
+from app.utils.page_archive import get_archive
 from flask_login import login_required
 import json
 
@@ -44,6 +47,7 @@ def rules():
 
 @business_bp.route('/rules/data')
 @login_required
+@etag_from_tables(ScrapingRule)
 def rules_data():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
@@ -138,3 +142,24 @@ def delete_rule():
     except Exception as e:
         db.session.rollback()
         return jsonify({'code': 500, 'msg': str(e)})
+
+@business_bp.route('/rules/reextract', methods=['POST'])
+@login_required
+def reextract_rule():
+    """
+    Re-run a rule over the archived pages of its site in the background; no page is refetched.
+    """
+    from app.utils.reextract import reextract_job
+
+    data = request.json or {}
+    rule_id = data.get('id')
+    if not rule_id:
+        return jsonify({'code': 400, 'msg': 'ID不能为空'})
+    if not db.session.get(ScrapingRule, rule_id):
+        return jsonify({'code': 404, 'msg': '规则不存在'})
+    if get_archive(current_app) is None:
+        return jsonify({'code': 400, 'msg': '未启用网页归档'})
+
+    task_id = tasks.submit(current_app._get_current_object(), 'reextract', reextract_job,
+                           rule_id=rule_id, dry_run=bool(data.get('dry_run')))
+    return jsonify({'code': 0, 'msg': '重新抽取任务已提交', 'data': {'task_id': task_id}})
@@ -0,0 +1,15 @@
+from flask import jsonify
+from flask_login import login_required
+from . import business_bp
+from app.utils.tasks import get_task
+
+@business_bp.route('/tasks/<task_id>')
+@login_required
+def task_status(task_id):
+    """
+    Poll a background task started by another endpoint.
+    """
+    task = get_task(task_id)
+    if not task:
+        return jsonify({'code': 404, 'msg': '任务不存在'})
+    return jsonify({'code': 0, 'msg': '', 'data': task})
@@ -1,10 +1,21 @@
-from flask import render_template, request, jsonify, current_app
+from flask import render_template, request, jsonify, current_app, Response, stream_with_context
 from . import business_bp
 from app import db
-from app.models import OpinionData, ScrapingRule, OpinionDetail
+from app.models import OpinionData, ScrapingRule, OpinionDetail, AnalysisResult, TopicCluster
 from flask_login import login_required
 from datetime import datetime
-from app.utils.scraper import deep_crawl_content
+from sqlalchemy.orm import joinedload
+from app.utils.exporter import (ExportError, build_export_query, check_format, export_filename,
+                                export_stream, iter_export_rows)
+from app.utils.importer import guess_format, import_records, iter_records
+from app.utils.text import item_text
+from app.utils.keyword_index import index_documents, related_articles, remove_documents, top_keywords
+from app.utils.rollups import remove_ids
+from app.utils.page_archive import get_archive
+from app.utils.http_cache import etag_from_tables
+from app.utils.serving import until_drained
+from app.utils import tasks
+import json
 
 @business_bp.route('/warehouse')
 @login_required
@@ -13,6 +24,7 @@ def warehouse():
 
 @business_bp.route('/warehouse/data')
 @login_required
+@etag_from_tables(OpinionData, TopicCluster)
 def warehouse_data():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
@@ -22,8 +34,32 @@ def warehouse_data():
     
     if keyword:
         query = query.filter(OpinionData.title.contains(keyword) | OpinionData.content.contains(keyword))
+
+    topic_id = request.args.get('topic_id', type=int)
+    if topic_id:
+        query = query.filter(OpinionData.topic_id == topic_id)
+
+    sentiment = request.args.get('sentiment', '')
+    if sentiment:
+        # app.utils.sentiment loads numpy, so it is imported on first use (see app.utils.import_report)
+        from app.utils.sentiment import NEUTRAL_THRESHOLD
+        if sentiment == 'positive':
+            query = query.filter(OpinionData.sentiment_score > NEUTRAL_THRESHOLD)
+        elif sentiment == 'negative':
+            query = query.filter(OpinionData.sentiment_score < -NEUTRAL_THRESHOLD)
+        elif sentiment == 'neutral':
+            query = query.filter(OpinionData.sentiment_score.between(-NEUTRAL_THRESHOLD, NEUTRAL_THRESHOLD))
+
+    # layui table server-side sort sends field/order
+    sort_columns = {
+        'id': OpinionData.id,
+        'created_at': OpinionData.created_at,
+        'sentiment_score': OpinionData.sentiment_score,
+    }
+    sort_column = sort_columns.get(request.args.get('field'), OpinionData.created_at)
+    order = sort_column.asc() if request.args.get('order') == 'asc' else sort_column.desc()
         
-    pagination = query.order_by(OpinionData.created_at.desc()).paginate(
+    pagination = query.order_by(order).paginate(
         page=page, per_page=limit, error_out=False
     )
     
@@ -38,14 +74,125 @@ def warehouse_data():
         'data': data
     })
 
+@business_bp.route('/warehouse/export')
+@login_required
+def export_data():
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('compress') or None
+
+    try:
+        check_format(fmt)
+        stmt = build_export_query(
+            keyword=request.args.get('keyword', ''),
+            source=request.args.get('source', ''),
+            date_from=request.args.get('date_from', ''),
+            date_to=request.args.get('date_to', '')
+        )
+    except ExportError as e:
+        return jsonify({'code': 400, 'msg': str(e)})
+
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    chunks = export_stream(fmt, iter_export_rows(stmt, batch_size=batch_size), compress=compress)
+
+    mimetypes = {
+        'csv': 'text/csv',
+        'jsonl': 'application/x-ndjson',
+        'parquet': 'application/vnd.apache.parquet',
+    }
+    mimetype = 'application/gzip' if compress == 'gzip' and fmt != 'parquet' else mimetypes[fmt]
+    headers = {'Content-Disposition': f'attachment; filename={export_filename(fmt, compress)}'}
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@business_bp.route('/warehouse/import', methods=['POST'])
+@login_required
+def import_data():
+    """
+    Bulk import NDJSON/CSV (optionally gzipped).
+
+    A multipart upload is spooled to disk by Werkzeug and closed with the request,
+    so it is imported before responding and the stats come back as JSON.
+    A raw request body is read incrementally and progress is streamed as NDJSON.
+    """
+    keyword = request.values.get('keyword') or None
+    chunk_size = current_app.config['IMPORT_CHUNK_SIZE']
+    commit_chunks = current_app.config['IMPORT_COMMIT_CHUNKS']
+
+    upload = request.files.get('file')
+    if upload:
+        filename = upload.filename or ''
+        fmt = request.values.get('format') or guess_format(filename, upload.mimetype)
+        try:
+            stats = None
+            for stats in import_records(iter_records(upload.stream, fmt, filename), chunk_size=chunk_size,
+                                        commit_chunks=commit_chunks, default_keyword=keyword):
+                pass
+            return jsonify({'code': 0, 'msg': f'成功导入 {stats.inserted} 条数据',
+                            'data': stats.to_dict(with_rejects=True)})
+        except Exception as e:
+            return jsonify({'code': 500, 'msg': str(e)})
+
+    stream = request.stream
+    filename = request.args.get('filename', '')
+    fmt = request.values.get('format') or guess_format(filename, request.mimetype)
+
+    def generate():
+        try:
+            stats = None
+            for stats in import_records(iter_records(stream, fmt, filename), chunk_size=chunk_size,
+                                        commit_chunks=commit_chunks, default_keyword=keyword):
+                yield json.dumps({'type': 'progress', **stats.to_dict()}) + '\n'
+            yield json.dumps({'type': 'result', **stats.to_dict(with_rejects=True)}) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'msg': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@business_bp.route('/warehouse/topics')
+@login_required
+def topics_data():
+    from app.utils.clustering import list_topics
+    keyword = request.args.get('keyword') or None
+    model, clusters = list_topics(keyword)
+    if not model:
+        return jsonify({'code': 0, 'msg': '尚未进行主题聚类', 'count': 0, 'data': []})
+    return jsonify({
+        'code': 0,
+        'msg': '',
+        'count': len(clusters),
+        'model': {'id': model.id, 'keyword': model.keyword, 'k': model.k,
+                  'updated_at': model.updated_at.strftime('%Y-%m-%d %H:%M:%S')},
+        'data': [c.to_dict() for c in clusters]
+    })
+
+@business_bp.route('/warehouse/topics/cluster', methods=['POST'])
+@login_required
+def cluster_topics():
+    from app.utils.clustering import fit_topics
+    data = request.json or {}
+    try:
+        k = int(data.get('k') or 8)
+    except (TypeError, ValueError):
+        return jsonify({'code': 400, 'msg': '无效的主题数'})
+    if k < 1 or k > 100:
+        return jsonify({'code': 400, 'msg': '主题数需在 1-100 之间'})
+
+    task_id = tasks.submit(current_app._get_current_object(), 'topic-clustering', fit_topics,
+                           keyword=data.get('keyword') or None, k=k)
+    return jsonify({'code': 0, 'msg': '主题聚类任务已提交', 'data': {'task_id': task_id}})
+
 @business_bp.route('/warehouse/delete', methods=['POST'])
 @login_required
 def delete_data():
+    from app.utils.clustering import release_items
     try:
         ids = request.json.get('ids', [])
         if not ids:
             return jsonify({'code': 400, 'msg': 'No data selected'})
             
+        AnalysisResult.query.filter(AnalysisResult.opinion_id.in_(ids)).delete(synchronize_session=False)
+        remove_documents(ids)
+        release_items(ids)
+        remove_ids(ids)
         OpinionData.query.filter(OpinionData.id.in_(ids)).delete(synchronize_session=False)
         db.session.commit()
         return jsonify({'code': 0, 'msg': 'Deleted successfully'})
@@ -56,6 +203,7 @@ def delete_data():
 @business_bp.route('/warehouse/update', methods=['POST'])
 @login_required
 def update_data():
+    from app.utils.sentiment import score_texts
     try:
         data = request.json
         id = data.get('id')
@@ -72,6 +220,12 @@ def update_data():
             item.content = data['content']
         if 'source' in data:
             item.source = data['source']
+
+        if 'title' in data or 'content' in data:
+            detail_content = item.detail.content if item.detail else None
+            text = item_text(item.title, item.content, detail_content)
+            item.sentiment_score = score_texts([text])[0]
+            index_documents([(item.id, text)])
             
         db.session.commit()
         return jsonify({'code': 0, 'msg': 'Updated successfully'})
@@ -82,52 +236,152 @@ def update_data():
 @business_bp.route('/warehouse/analyze', methods=['POST'])
 @login_required
 def analyze_data():
-    # Placeholder for AI analysis
+    from app.utils.ai_client import AIClientError
+    from app.utils.analyzer import analyze_items
     try:
-        id = request.json.get('id')
-        if not id:
+        data = request.json or {}
+        ids = data.get('ids') or ([data['id']] if data.get('id') else [])
+        if not ids:
             return jsonify({'code': 400, 'msg': 'Missing ID'})
-            
-        # TODO: Implement AI analysis logic here
-        # For now, just return a success message
-        
-        return jsonify({'code': 0, 'msg': 'AI analysis request submitted (Placeholder)'})
+
+        outcome = analyze_items(ids, engine_id=data.get('engine_id'))
+        msg = f"AI解析完成：新解析 {outcome['analyzed']} 条，命中缓存 {outcome['cached']} 条"
+        if outcome['errors']:
+            msg += f"，失败 {len(outcome['errors'])} 条"
+        return jsonify({'code': 0, 'msg': msg, 'data': outcome})
+    except AIClientError as e:
+        db.session.rollback()
+        return jsonify({'code': 400, 'msg': str(e)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'msg': str(e)})
+
+@business_bp.route('/warehouse/analyze/stream', methods=['POST'])
+@login_required
+def analyze_stream():
+    """
+    Stream one item's analysis as NDJSON (default) or server-sent events (?format=sse
+    or Accept: text/event-stream): model tokens as they arrive, then the stored result.
+    """
+    data = request.json or {}
+    if not data.get('id'):
+        return jsonify({'code': 400, 'msg': 'Missing ID'})
+    sse = request.args.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+    from app.utils.analyzer import stream_analysis
+
+    def encode(event):
+        line = json.dumps(event, ensure_ascii=False)
+        return f'data: {line}\n\n' if sse else line + '\n'
+
+    def generate():
+        events = until_drained(stream_analysis(data['id'], engine_id=data.get('engine_id')), current_app)
+        try:
+            for event in events:
+                yield encode(event)
+        except Exception as e:
+            db.session.rollback()
+            yield encode({'type': 'error', 'msg': str(e)})
+        finally:
+            # Runs on client disconnect too: closes the upstream completion
+            events.close()
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+@business_bp.route('/warehouse/analysis/<int:id>')
+@login_required
+def analysis_result(id):
+    from app.utils.analyzer import latest_result
+    result = latest_result(id)
+    if not result:
+        return jsonify({'code': 404, 'msg': '尚未进行AI解析'})
+    return jsonify({'code': 0, 'msg': '', 'data': result.to_dict()})
+
+@business_bp.route('/warehouse/summarize', methods=['POST'])
+@login_required
+def summarize_data():
+    """
+    Map-reduce summaries of the selected items' bodies (deep-crawled content when present).
+    """
+    from app.utils.ai_client import AIClientError
+    from app.utils.analyzer import active_engines, item_body
+    from app.utils.summarizer import summarize_texts
+    try:
+        data = request.json or {}
+        ids = data.get('ids') or ([data['id']] if data.get('id') else [])
+        if not ids:
+            return jsonify({'code': 400, 'msg': 'Missing ID'})
+
+        engines = active_engines(data.get('engine_id'))
+        if not engines:
+            return jsonify({'code': 400, 'msg': '没有可用的AI引擎，请先在AI引擎管理中添加并启用'})
+        items = OpinionData.query.options(joinedload(OpinionData.detail)).filter(OpinionData.id.in_(ids)).all()
+        outcome = summarize_texts({item.id: item_body(item) for item in items}, engines)
+        db.session.commit()
+
+        results = [dict(id=item_id, **summary) for item_id, summary in outcome['summaries'].items()]
+        errors = [{'id': item_id, 'msg': msg} for item_id, msg in outcome['errors'].items()]
+        msg = f"摘要完成：调用模型 {outcome['calls']} 次，命中缓存 {outcome['cached']} 段"
+        return jsonify({'code': 0, 'msg': msg, 'data': {'results': results, 'errors': errors,
+                                                        'calls': outcome['calls'], 'cached': outcome['cached']}})
+    except AIClientError as e:
+        db.session.rollback()
+        return jsonify({'code': 400, 'msg': str(e)})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'code': 500, 'msg': str(e)})
 
 @business_bp.route('/warehouse/deep-crawl', methods=['POST'])
 @login_required
 def deep_crawl_data():
+    from app.utils.crawl_pipeline import crawl
+    from app.utils.sentiment import score_texts
     try:
         ids = request.json.get('ids', [])
         if not ids:
             return jsonify({'code': 400, 'msg': 'No data selected'})
         
-        items = OpinionData.query.filter(OpinionData.id.in_(ids)).all()
+        items = OpinionData.query.options(joinedload(OpinionData.detail)).filter(OpinionData.id.in_(ids)).all()
         success_count = 0
+        rescored = []
+        archive = get_archive(current_app)
+        config = current_app.config
+        
+        # Candidate rules for all items in one query
+        sources = {item.source for item in items if item.source}
+        names = sources | {source.split(' ')[0] for source in sources}
+        rules = {r.site_name: r for r in ScrapingRule.query.filter(ScrapingRule.site_name.in_(names))} if names else {}
         
+        by_id = {}
+        jobs = []
         for item in items:
             # Find matching rule
             # source format might be "Source Name Date" or just "Source Name"
             source_name = item.source.split(' ')[0] if item.source else ''
             
-            rule = ScrapingRule.query.filter(ScrapingRule.site_name == source_name).first()
+            rule = rules.get(source_name)
             
             if not rule and item.source:
                  # Try exact match
-                 rule = ScrapingRule.query.filter(ScrapingRule.site_name == item.source).first()
+                 rule = rules.get(item.source)
             
-            rule_config = rule.to_dict() if rule else None
-            
-            # Crawl
-            target_url = item.url or item.original_url
-            title, content, new_rule_config = deep_crawl_content(target_url, rule_config)
+            by_id[item.id] = (item, rule)
+            jobs.append((item.id, item.url or item.original_url, rule.to_dict() if rule else None))
+        
+        # Pages are fetched and parsed concurrently; results are written here, one at a time
+        results = crawl(jobs, fetch_workers=config['CRAWL_FETCH_WORKERS'], parse_workers=config['CRAWL_PARSE_WORKERS'],
+                        queue_size=config['CRAWL_QUEUE_SIZE'], archive=archive)
+        for item_id, (title, content, new_rule_config), error in results:
+            item, rule = by_id[item_id]
+            if error:
+                print(f"Error deep crawling {item.url or item.original_url}: {error}")
             
             if title or content:
                 # Save to OpinionDetail
-                detail = OpinionDetail.query.filter_by(opinion_id=item.id).first()
+                detail = item.detail
                 if not detail:
-                    detail = OpinionDetail(opinion_id=item.id)
+                    detail = OpinionDetail(opinion=item)
                     db.session.add(detail)
                 
                 if title:
@@ -142,6 +396,7 @@ def deep_crawl_data():
                 # Update is_deep_crawled status in OpinionData
                 item.is_deep_crawled = True
                 success_count += 1
+                rescored.append((item, item_text(item.title, item.content, detail.content)))
                 
                 # Update rule if changed and we have a rule object
                 if rule and new_rule_config:
@@ -149,6 +404,12 @@ def deep_crawl_data():
                         rule.content_xpath = new_rule_config['content_xpath']
                         rule.updated_at = datetime.now()
 
+        # Score all crawled bodies in one vectorized batch
+        scores = score_texts([text for _, text in rescored])
+        for (item, _), score in zip(rescored, scores):
+            item.sentiment_score = score
+        index_documents((item.id, text) for item, text in rescored)
+
         db.session.commit()
         return jsonify({'code': 0, 'msg': f'详细内容采集完成，成功 {success_count} 条'})
         
@@ -161,10 +422,25 @@ def deep_crawl_data():
 def preview_data(id):
     item = OpinionData.query.get_or_404(id)
     detail = OpinionDetail.query.filter_by(opinion_id=id).first()
+    keywords = top_keywords(id)
+    related = related_articles(id)
     
     if not detail:
-        return render_template('business/preview.html', item=item, detail=None, msg="尚未进行深度采集或采集失败")
+        return render_template('business/preview.html', item=item, detail=None, msg="尚未进行深度采集或采集失败",
+                               keywords=keywords, related=related)
     
-    return render_template('business/preview.html', item=item, detail=detail)
+    return render_template('business/preview.html', item=item, detail=detail, keywords=keywords, related=related)
+
+@business_bp.route('/warehouse/keywords/<int:id>')
+@login_required
+def keywords_data(id):
+    k = request.args.get('k', 10, type=int)
+    return jsonify({'code': 0, 'msg': '', 'data': top_keywords(id, k=k)})
+
+@business_bp.route('/warehouse/related/<int:id>')
+@login_required
+def related_data(id):
+    k = request.args.get('k', 5, type=int)
+    return jsonify({'code': 0, 'msg': '', 'data': related_articles(id, k=k)})
 
 
@@ -1,9 +1,60 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required
+from app.utils.dates import parse_date
+from app.utils.rollups import GRANULARITIES, breakdown, trend
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+class DashboardError(ValueError):
+    pass
+
 @dashboard_bp.route('/')
 @login_required
 def index():
     return render_template('base.html')
+
+def _rollup_args():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise DashboardError('granularity 仅支持 hour / day')
+    date_to = request.args.get('date_to', '').strip()
+    end = parse_date(date_to)
+    if end and len(date_to) == 10:
+        # A bare end date includes that day's last hour bucket
+        end = end.replace(hour=23)
+    return {
+        'granularity': granularity,
+        'start': parse_date(request.args.get('date_from', '')),
+        'end': end,
+        'keyword': request.args.get('keyword', '').strip() or None,
+        'source': request.args.get('source', '').strip() or None,
+    }
+
+@dashboard_bp.route('/dashboard/api/trend')
+@login_required
+def trend_data():
+    """
+    Per-hour/day counts, deep-crawl coverage and average sentiment from the rollup table.
+    """
+    try:
+        data = trend(**_rollup_args())
+    except ValueError as e:
+        # Bad granularity or date, or a range with too many buckets
+        return jsonify({'code': 400, 'msg': str(e)})
+    return jsonify({'code': 0, 'msg': '', 'data': data})
+
+@dashboard_bp.route('/dashboard/api/breakdown')
+@login_required
+def breakdown_data():
+    """
+    Totals per keyword or source over the same range as the trend.
+    """
+    by = request.args.get('by', 'keyword')
+    if by not in ('keyword', 'source'):
+        return jsonify({'code': 400, 'msg': 'by 仅支持 keyword / source'})
+    limit = request.args.get('limit', 20, type=int)
+    try:
+        args = _rollup_args()
+    except ValueError as e:
+        return jsonify({'code': 400, 'msg': str(e)})
+    return jsonify({'code': 0, 'msg': '', 'data': breakdown(by=by, limit=max(1, min(limit, 100)), **args)})
@@ -0,0 +1,289 @@
+"""
+Local stand-in for Baidu news search, Sogou/Sohu search, their redirect links and article pages.
+
+    python -m benchmarks.fake_server [--port 8900] [--latency 0.05] [--jitter 0.02]
+                                     [--error-rate 0.01] [--max-rps 50] [--pages 5]
+
+Point the app at it with
+
+    SCRAPER_BAIDU_URL=http://127.0.0.1:8900/s SCRAPER_SOHU_URL=http://127.0.0.1:8900/web
+    SCRAPER_PAGE_DELAY_MIN=0 SCRAPER_PAGE_DELAY_MAX=0
+
+Routes:
+    /s?word=&pn=              Baidu news result page, 10 results; empty after `pages` pages
+    /web?query=&page=         Sogou result page, alternating direct and redirect links
+    /link?url=ID              302 to the article, as Baidu's result links
+    /sogou.com/link?url=ID    page that redirects with JavaScript, as Sogou's links
+    /article/ID               article page, one of two layouts
+    /img/ID.jpg               cover image
+    /__stats                  request counts by route and status (JSON)
+
+Markup follows the saved pages in benchmarks/corpus, so the real parsers run on
+it. Pages are generated from the path, so repeated requests get identical
+bytes. Latency, error rate and throttling (429 with Retry-After above max_rps)
+can be changed on a running server.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+RESULTS_PER_PAGE = 10
+
+SENTENCES = [
+    '今日，相关部门就近期网民关注的热点问题作出回应，表示将进一步加强监管力度。',
+    '据了解，该事件在社交媒体上引发广泛讨论，相关话题阅读量已超过两亿次。',
+    '专家指出，舆论的快速发酵与信息传播渠道的多样化密切相关。',
+    '记者从多家企业了解到，新规实施后，行业整体运营成本有所上升。',
+    '多位受访市民表示，希望有关方面能够及时公开调查进展，回应社会关切。',
+    '业内人士分析认为，这一政策调整将对市场格局产生深远影响。',
+    '截至发稿时，涉事单位尚未对外作出进一步说明。',
+    '数据显示，今年前三季度相关投诉量同比增长百分之十八。',
+]
+SOURCES = ['新华网', '人民网', '澎湃新闻', '央视新闻', '中国新闻网', '环球网', '界面新闻', '新京报']
+SOHU_CHANNELS = ['搜狐新闻', '搜狐财经', '搜狐科技', '搜狐教育', '搜狐汽车']
+TITLE_SUFFIXES = ['最新进展', '引发热议', '官方回应', '调查报告', '深度观察']
+# Smallest valid GIF, served for every cover
+PIXEL = bytes.fromhex('47494638396101000100800000ffffff00000021f90401000000002c00000000010001000002024401003b')
+
+
+def _rng(*parts):
+    return random.Random('|'.join(str(p) for p in parts))
+
+
+def _digest(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:10]
+
+
+def _para(rng, n):
+    return ''.join(rng.choice(SENTENCES) for _ in range(n))
+
+
+def _head(title, extra=''):
+    return (f'<!DOCTYPE html><html lang="zh-CN"><head><meta charset="utf-8"><title>{title}</title>{extra}'
+            '<link rel="stylesheet" href="/static/main.css"></head>')
+
+
+def baidu_page(base, keyword, pn, pages):
+    """Baidu news results for offset pn; no results past the last page."""
+    rng = _rng('baidu', keyword, pn)
+    count = RESULTS_PER_PAGE if pn // RESULTS_PER_PAGE < pages else 0
+    out = [_head(f'百度资讯搜索_{keyword}'), '<body><div id="wrapper_wrapper"><div id="content_left">']
+    for i in range(count):
+        item_id = f'b{pn + i}-{_digest(keyword)}'
+        source = rng.choice(SOURCES)
+        title = f'{keyword}{rng.choice(TITLE_SUFFIXES)}：{_para(rng, 1)[:18]}'
+        img = '' if i % 3 == 2 else \
+            f'<div class="c-img c-img-radius-large"><img class="c-img" src="{base}/img/{item_id}.jpg"></div>'
+        out.append(
+            f'<div class="result-op c-container xpath-log new-pmd" tpl="news-normal"><div class="c-row">{img}'
+            f'<div class="c-span-last"><h3 class="news-title_1YtI1"><a href="{base}/link?url={item_id}" '
+            f'target="_blank">{title}</a></h3>'
+            f'<div class="c-font-normal c-color-text"><span>{_para(rng, 2)}</span></div>'
+            f'<div class="news-source_Xj4Dv"><span class="c-color-gray c-font-normal c-gap-right">{source}</span>'
+            f'<span class="c-color-gray2 c-font-normal">{rng.randint(1, 23)}小时前</span></div></div></div></div>')
+    out.append('</div></div></body></html>')
+    return ''.join(out)
+
+
+def sogou_page(base, query, page, pages):
+    """Sogou results for 1-based page; even results go through a redirect link."""
+    keyword = query.replace('site:sohu.com', '').strip()
+    rng = _rng('sogou', keyword, page)
+    count = RESULTS_PER_PAGE if page <= pages else 0
+    out = [_head(f'{query} - 搜狗搜索'), '<body><div id="main" class="main"><div class="results">']
+    for i in range(count):
+        item_id = f's{page}-{i}-{_digest(keyword)}'
+        href = f'{base}/sogou.com/link?url={item_id}' if i % 2 == 0 else f'{base}/article/{item_id}'
+        img = '' if i % 4 == 3 else f'<div class="img-layout"><img src="{base}/img/{item_id}.jpg"></div>'
+        out.append(
+            f'<div class="vrwrap">{img}<div class="text-layout"><h3 class="vr-title">'
+            f'<a target="_blank" href="{href}">{keyword}{rng.choice(TITLE_SUFFIXES)}</a></h3>'
+            f'<div class="fz-mid space-txt"><p class="st">{_para(rng, 2)}</p></div>'
+            f'<div class="fb"><cite>{rng.choice(SOHU_CHANNELS)}</cite></div></div></div>')
+    out.append('</div></div></body></html>')
+    return ''.join(out)
+
+
+def article_page(item_id):
+    """An article in a semantic (<article>) or a div-based layout, with navigation, comments and a sidebar."""
+    rng = _rng('article', item_id)
+    title = f'{_para(rng, 1)[:20]}（{item_id}）'
+    nav = '<nav class="main-nav">' + ''.join(f'<a href="/c/{i}">频道{i}</a>' for i in range(20)) + '</nav>'
+    side = '<div class="sidebar">' + ''.join(f'<div class="rec-item">{_para(rng, 1)[:20]}</div>' for _ in range(10)) + '</div>'
+    comments = '<div id="comment-area">' + ''.join(f'<p class="comment-item">{_para(rng, 1)}</p>' for _ in range(10)) + '</div>'
+    body = ''.join(f'<p>{_para(rng, rng.randint(2, 6))}</p>' for _ in range(rng.randint(8, 30)))
+    if rng.random() < 0.5:
+        return (_head(title, f'<meta property="og:title" content="{title}">') +
+                f'<body><header class="site-header">{nav}</header><main><article class="post"><h1>{title}</h1>'
+                f'<div class="post-body">{body}</div></article>{side}</main>{comments}'
+                '<footer class="site-footer">版权所有</footer></body></html>')
+    return (_head(title) + f'<body><div class="top-bar">{nav}</div><div class="wrap"><h1 id="news_title">{title}</h1>'
+            f'<div class="article-content" id="articleText">{body}</div>{comments}</div>{side}'
+            '<div class="footer">免责声明</div></body></html>')
+
+
+def sogou_redirect_page(target):
+    return ('<html><head><meta http-equiv="refresh" content="0;URL=\'' + target + '\'"></head><body>'
+            '<script>window.location.replace("' + target + '")</script></body></html>')
+
+
+class FakeSearchServer:
+    """
+    Args:
+        latency (float): Added delay per request (seconds).
+        jitter (float): Uniform random extra delay, up to this many seconds.
+        error_rate (float): Share of requests answered with a 500.
+        max_rps (float): Requests per second before answering 429; 0 disables throttling.
+        pages (int): Result pages available per keyword.
+        seed (int): Seed for the error draws, so runs are repeatable.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, max_rps=0, pages=5,
+                 seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self.pages = pages
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(max_rps)
+        self._refilled = time.monotonic()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self):
+        """Decide the fate of one request: (status or None, delay)."""
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.max_rps:
+                now = time.monotonic()
+                self._tokens = min(float(self.max_rps), self._tokens + (now - self._refilled) * self.max_rps)
+                self._refilled = now
+                if self._tokens < 1:
+                    return 429, 0.0
+                self._tokens -= 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500, delay
+            return None, delay
+
+    def _route(self, path, query):
+        """Returns (status, content type, body, extra headers)."""
+        base = self.url
+        if path == '/s':
+            pn = int(query.get('pn', ['0'])[0] or 0)
+            return 200, 'text/html; charset=utf-8', baidu_page(base, query.get('word', [''])[0], pn, self.pages), {}
+        if path == '/web':
+            page = int(query.get('page', ['1'])[0] or 1)
+            return 200, 'text/html; charset=utf-8', sogou_page(base, query.get('query', [''])[0], page, self.pages), {}
+        if path == '/link':
+            return 302, 'text/html', '', {'Location': f'{base}/article/{quote(query.get("url", [""])[0])}'}
+        if path == '/sogou.com/link':
+            return 200, 'text/html; charset=utf-8', sogou_redirect_page(f'{base}/article/{quote(query.get("url", [""])[0])}'), {}
+        if path.startswith('/article/'):
+            return 200, 'text/html; charset=utf-8', article_page(path[len('/article/'):]), {}
+        if path.startswith('/img/'):
+            return 200, 'image/gif', PIXEL, {'Cache-Control': 'max-age=86400'}
+        if path == '/__stats':
+            with self._lock:
+                stats = {f'{route} {status}': n for (route, status), n in sorted(self.stats.items())}
+            return 200, 'application/json', json.dumps(stats), {}
+        return 404, 'text/plain', 'not found', {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, head_only=False):
+                parts = urlsplit(self.path)
+                # Article and image paths are counted per route, not per ID
+                route = parts.path if parts.path.count('/') < 2 or 'link' in parts.path else parts.path.rsplit('/', 1)[0]
+                # The stats route is for the test driver and never delayed, failed or throttled
+                status, delay = server._admit() if parts.path != '/__stats' else (None, 0.0)
+                if delay:
+                    time.sleep(delay)
+                if status == 429:
+                    content_type, body, headers = 'text/plain', 'too many requests', {'Retry-After': '1'}
+                elif status == 500:
+                    content_type, body, headers = 'text/plain', 'internal error', {}
+                else:
+                    status, content_type, body, headers = server._route(parts.path, parse_qs(parts.query))
+                with server._lock:
+                    server.stats[(route, status)] += 1
+
+                data = body if isinstance(body, bytes) else body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if not head_only:
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond()
+
+            def do_HEAD(self):
+                self._respond(head_only=True)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve fake Baidu/Sogou search results and articles.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help='added delay per request (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra delay, up to (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 500')
+    parser.add_argument('--max-rps', type=float, default=0, help='requests per second before 429 (0: unlimited)')
+    parser.add_argument('--pages', type=int, default=5, help='result pages per keyword')
+    args = parser.parse_args(argv)
+
+    server = FakeSearchServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, max_rps=args.max_rps, pages=args.pages)
+    print(f'serving on {server.url}  (SCRAPER_BAIDU_URL={server.url}/s SCRAPER_SOHU_URL={server.url}/web)')
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+End-to-end load test of the scraping endpoints against the fake search server.
+
+    python -m benchmarks.load_test [--concurrency 8] [--requests 40] [--pages 2]
+                                   [--latency 0.05] [--jitter 0.05] [--error-rate 0] [--max-rps 0]
+                                   [--scenario NAME ...] [--output PATH]
+
+Starts benchmarks/fake_server.py and the Flask app (threaded werkzeug server,
+throwaway SQLite database, login disabled) in this process, points the
+scraper at the fake server and runs the scenarios one after the other, each
+with `concurrency` clients sending `requests` requests over HTTP:
+
+    scrape               POST /business/analysis, Baidu and Sohu alternately, items streamed one by one
+                         as the analysis page asks for them, read to the end of the stream
+    deep_crawl           POST /business/deep_crawl on scraped original URLs, as the analysis page does
+    save                 POST /business/save_data, scraped items in batches of 10
+    warehouse_deep_crawl POST /business/warehouse/deep-crawl, saved items in batches of 5
+    autosave             scrape with autosave=1: items stored by the app as they are found, the
+                         alternative to scrape followed by save (fresh keywords, same fake URLs)
+
+Each scenario reports throughput, latency percentiles and the error count
+(non-200, a non-zero code or an error event); scrape also reports the time to
+the first streamed line and to the first item. Sogou results whose original URL is still the
+JavaScript redirect page come back without content from deep_crawl and count
+as errors there, as they do for users. Results go to
+benchmarks/results/load-<commit>.json. Later scenarios use what the earlier
+ones produced, so select them in order.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.config import Config
+from app.models import OpinionData
+from benchmarks.fake_server import FakeSearchServer
+from benchmarks.run import RESULTS_DIR, git_revision
+
+SCENARIOS = ('scrape', 'deep_crawl', 'save', 'warehouse_deep_crawl', 'autosave')
+SAVE_BATCH = 10
+CRAWL_BATCH = 5
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def make_app(database_path, search_base):
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database_path
+        PAGE_ARCHIVE_DIR = os.path.join(os.path.dirname(database_path), 'archive')
+        LOGIN_DISABLED = True
+        WTF_CSRF_ENABLED = False
+        SCRAPER_BAIDU_URL = search_base + '/s'
+        SCRAPER_SOHU_URL = search_base + '/web'
+        SCRAPER_PAGE_DELAY_MIN = 0.0
+        SCRAPER_PAGE_DELAY_MAX = 0.0
+
+    app = create_app(LoadTestConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+class LoadTest:
+    def __init__(self, base_url, concurrency=8, requests_per_scenario=40, pages=2):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.requests = requests_per_scenario
+        self.pages = pages
+        self.items = []
+        self.saved_ids = []
+        self.first_items = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _run(self, name, jobs, call):
+        """
+        Run call(job) for every job on `concurrency` threads.
+
+        Returns:
+            dict: Scenario summary.
+        """
+        def timed(job):
+            started = time.perf_counter()
+            try:
+                ok, first = call(job, started)
+            except requests.RequestException:
+                ok, first = False, None
+            return ok, time.perf_counter() - started, first
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            outcomes = list(executor.map(timed, jobs))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency, _ in outcomes)
+        firsts = sorted(first for _, _, first in outcomes if first is not None)
+        summary = {
+            'requests': len(outcomes),
+            'errors': sum(1 for ok, _, _ in outcomes if not ok),
+            'concurrency': self.concurrency,
+            'wall_s': round(wall, 3),
+            'throughput_rps': round(len(outcomes) / wall, 2) if wall else None,
+        }
+        for label, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            value = percentile(latencies, q)
+            summary[f'{label}_ms'] = round(value * 1000, 1) if value is not None else None
+        summary['max_ms'] = round(latencies[-1] * 1000, 1) if latencies else None
+        if firsts:
+            summary['first_line_p50_ms'] = round(percentile(firsts, 0.5) * 1000, 1)
+            summary['first_line_p99_ms'] = round(percentile(firsts, 0.99) * 1000, 1)
+        if name == 'scrape' and self.first_items:
+            first_items = sorted(self.first_items)
+            summary['first_item_p50_ms'] = round(percentile(first_items, 0.5) * 1000, 1)
+            summary['first_item_p99_ms'] = round(percentile(first_items, 0.99) * 1000, 1)
+        print(f'{name:<22}{summary["requests"]:>6}{summary["errors"]:>7}{summary["throughput_rps"]:>10}'
+              f'{summary["p50_ms"]:>10}{summary["p99_ms"]:>10}')
+        return summary
+
+    def scrape(self, job, started, autosave=False):
+        keyword = f'自动入库{job}' if autosave else f'负载测试{job}'
+        source = 'sohu' if job % 2 else 'baidu'
+        data = {'keyword': keyword, 'source': source, 'pages': self.pages, 'stream': 'items'}
+        if autosave:
+            data['autosave'] = '1'
+        response = self.session.post(f'{self.base_url}/business/analysis', stream=True, data=data)
+        first = None
+        items = []
+        done = False
+        with response:
+            if response.status_code != 200:
+                return False, None
+            for line in response.iter_lines():
+                if first is None:
+                    first = time.perf_counter() - started
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event['type'] == 'error':
+                    return False, first
+                if event['type'] == 'item':
+                    if not items and not autosave:
+                        with self._lock:
+                            self.first_items.append(time.perf_counter() - started)
+                    items.append(dict(event['data'], keyword=keyword))
+                elif event['type'] == 'done':
+                    done = True
+        if not done or not items:
+            return False, first
+        if not autosave:
+            with self._lock:
+                self.items.extend(items)
+        return True, first
+
+    def autosave(self, job, started):
+        return self.scrape(job, started, autosave=True)
+
+    def deep_crawl(self, job, started):
+        item = self.items[job % len(self.items)]
+        response = self.session.post(f'{self.base_url}/business/deep_crawl', data={'url': item['original_url']})
+        return response.status_code == 200 and response.json().get('code') == 0 and \
+            bool(response.json().get('content')), None
+
+    def save(self, job, started):
+        batch = self.items[job * SAVE_BATCH:(job + 1) * SAVE_BATCH]
+        response = self.session.post(f'{self.base_url}/business/save_data', json={'items': batch})
+        return response.status_code == 200 and response.json().get('code') == 0, None
+
+    def warehouse_deep_crawl(self, job, started):
+        offset = (job * CRAWL_BATCH) % max(len(self.saved_ids), 1)
+        ids = self.saved_ids[offset:offset + CRAWL_BATCH]
+        response = self.session.post(f'{self.base_url}/business/warehouse/deep-crawl', json={'ids': ids})
+        return response.status_code == 200 and response.json().get('code') == 0, None
+
+    def run(self, app, scenarios=SCENARIOS):
+        print(f'{"scenario":<22}{"reqs":>6}{"errors":>7}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}')
+        results = {}
+        for name in scenarios:
+            if name in ('scrape', 'autosave'):
+                jobs = range(self.requests)
+            elif name == 'deep_crawl':
+                if not self.items:
+                    continue
+                jobs = range(self.requests)
+            elif name == 'save':
+                # Every item once, at most `requests` batches
+                jobs = range(min(self.requests, -(-len(self.items) // SAVE_BATCH)))
+            else:
+                with app.app_context():
+                    self.saved_ids = [row.id for row in db.session.query(OpinionData.id).order_by(OpinionData.id)]
+                if not self.saved_ids:
+                    continue
+                jobs = range(self.requests)
+            results[name] = self._run(name, jobs, getattr(self, name))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the scraping endpoints against the fake search server.')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=40, help='requests per scenario')
+    parser.add_argument('--pages', type=int, default=2, help='result pages per scrape')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake server delay per request (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='fake server random extra delay (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of fake server requests failing with 500')
+    parser.add_argument('--max-rps', type=float, default=0, help='fake server requests per second before 429')
+    parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<commit>.json)')
+    args = parser.parse_args(argv)
+    scenarios = [s for s in SCENARIOS if s in (args.scenarios or SCENARIOS)]
+
+    fake = FakeSearchServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            max_rps=args.max_rps, pages=max(args.pages, 1))
+    with tempfile.TemporaryDirectory() as tmp, fake:
+        app = make_app(os.path.join(tmp, 'load.db'), fake.url)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            test = LoadTest(f'http://127.0.0.1:{server.server_port}', concurrency=args.concurrency,
+                            requests_per_scenario=args.requests, pages=args.pages)
+            results = test.run(app, scenarios)
+        finally:
+            server.shutdown()
+        upstream = {f'{route} {status}': n for (route, status), n in sorted(fake.stats.items())}
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'scenarios')},
+        'scenarios': results,
+        'upstream_requests': upstream,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'load-{commit or "local"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'results written to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
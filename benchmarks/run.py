@@ -0,0 +1,296 @@
+"""
+Offline benchmarks of the scraper's parsers over the saved page corpus.
+
+    python -m benchmarks.run [--rounds N] [--min-time S] [--case NAME ...]
+                             [--output PATH] [--baseline PATH|COMMIT] [--thresholds PATH]
+
+Every case runs its parser over all corpus pages of one kind per round, with
+no network access: redirect links are left unresolved. Throughput comes from
+the fastest round, the one least disturbed by the rest of the machine (the
+median is reported alongside); peak memory from one extra round under
+tracemalloc (Python allocations only, so lxml's own C trees are not counted). Results are written
+as JSON, by default to benchmarks/results/<commit>.json, and checked against
+thresholds.json: absolute floors per case, plus the largest slowdown and
+memory growth allowed relative to a baseline result of the same corpus
+version. The corpus expectations in manifest.json are checked as well, so a
+parser that got faster by returning less also fails. Exit status is 1 on any
+failure.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from lxml import html as lxml_html
+
+from app.utils.scraper import (
+    extract_content, extract_with_rule, get_smart_xpath, parse_baidu_results, parse_sohu_results
+)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+THRESHOLDS = os.path.join(BENCH_DIR, 'thresholds.json')
+
+# A rule whose XPaths no longer match, as after a site redesign: exercises the fallback and rule update
+STALE_RULE = {'title_xpath': "//h1[@class='removed']", 'content_xpath': "//div[@id='removed']"}
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """
+    Returns:
+        tuple: (corpus version, manifest pages with the decoded page in 'html' and its size in 'bytes')
+    """
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    pages = []
+    for page in manifest['pages']:
+        with open(os.path.join(corpus_dir, page['file']), 'rb') as f:
+            raw = f.read()
+        pages.append(dict(page, html=raw.decode(page.get('encoding', 'utf-8')), bytes=len(raw)))
+    return manifest['version'], pages
+
+
+def _no_resolve(url):
+    return url
+
+
+def _of_kind(pages, kind):
+    return [p for p in pages if p['kind'] == kind]
+
+
+def build_cases(pages):
+    """
+    Returns:
+        dict: case name -> (unit, units per round, bytes per round, callable running one round)
+    """
+    baidu = _of_kind(pages, 'baidu')
+    sohu = _of_kind(pages, 'sohu')
+    articles = _of_kind(pages, 'article')
+    # get_smart_xpath works on parsed elements; parsing is not part of that case
+    elements = [el for p in articles for el in lxml_html.fromstring(p['html']).iter()
+                if isinstance(el.tag, str)]
+
+    def size(group):
+        return sum(p['bytes'] for p in group)
+
+    return {
+        'baidu_results': ('page', len(baidu), size(baidu),
+                          lambda: [parse_baidu_results(p['html'], resolve=_no_resolve) for p in baidu]),
+        'sohu_results': ('page', len(sohu), size(sohu),
+                         lambda: [parse_sohu_results(p['html'], resolve=_no_resolve) for p in sohu]),
+        'scrape_content': ('page', len(articles), size(articles),
+                           lambda: [extract_content(p['html']) for p in articles]),
+        'deep_crawl_content': ('page', len(articles), size(articles),
+                               lambda: [extract_with_rule(p['html'], p['rule']) for p in articles]),
+        'deep_crawl_fallback': ('page', len(articles), size(articles),
+                                lambda: [extract_with_rule(p['html'], STALE_RULE) for p in articles]),
+        'get_smart_xpath': ('element', len(elements), 0,
+                            lambda: [get_smart_xpath(el) for el in elements]),
+    }
+
+
+def check_corpus(pages):
+    """
+    Compare parser output with the manifest expectations.
+
+    Returns:
+        list: Failure messages.
+    """
+    failures = []
+    for page in pages:
+        name, expect = page['file'], page.get('expect', {})
+        if page['kind'] in ('baidu', 'sohu'):
+            parse = parse_baidu_results if page['kind'] == 'baidu' else parse_sohu_results
+            items = parse(page['html'], resolve=_no_resolve)
+            if len(items) != expect['items']:
+                failures.append(f'{name}: {len(items)} items, expected {expect["items"]}')
+            continue
+
+        text = extract_content(page['html'])
+        if len(text) < expect['min_chars']:
+            failures.append(f'{name}: scrape_content returned {len(text)} chars, expected >= {expect["min_chars"]}')
+        title, content, new_rule = extract_with_rule(page['html'], page['rule'])
+        if title != expect['title'] or len(content) < expect['min_chars'] or new_rule is not None:
+            failures.append(f'{name}: rule extraction gave title {title!r}, {len(content)} chars, rule update {new_rule}')
+        _, _, new_rule = extract_with_rule(page['html'], STALE_RULE)
+        xpath = new_rule['content_xpath'] if new_rule else None
+        if xpath != expect['stale_xpath']:
+            failures.append(f'{name}: stale rule updated to {xpath!r}, expected {expect["stale_xpath"]!r}')
+    return failures
+
+
+def measure(fn, rounds=5, min_time=0.5):
+    """
+    Time fn() until at least `rounds` rounds and `min_time` seconds have passed, after one warm-up round.
+
+    Returns:
+        dict: {'rounds', 'median_s', 'best_s', 'peak_kb'}
+    """
+    fn()
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < rounds or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+
+    # Garbage left by the timed rounds would otherwise be counted at random
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'rounds': len(durations),
+        'median_s': statistics.median(durations),
+        'best_s': min(durations),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(rounds=5, min_time=0.5, cases=None, corpus_dir=CORPUS_DIR):
+    """
+    Run the selected cases (all by default).
+
+    Returns:
+        dict: Result document, see the module docstring.
+    """
+    version, pages = load_corpus(corpus_dir)
+    available = build_cases(pages)
+    selected = cases or list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise ValueError(f'unknown case(s): {", ".join(unknown)}')
+
+    results = {}
+    for name in selected:
+        unit, units, size, fn = available[name]
+        m = measure(fn, rounds=rounds, min_time=min_time)
+        results[name] = dict(
+            m,
+            unit=unit,
+            units=units,
+            ops_per_sec=round(units / m['best_s'], 2),
+            mb_per_sec=round(size / m['best_s'] / 1e6, 3) if size else None,
+            median_s=round(m['median_s'], 6),
+            best_s=round(m['best_s'], 6),
+        )
+
+    commit, dirty = git_revision()
+    return {
+        'corpus_version': version,
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'cases': results,
+        'corpus_failures': check_corpus(pages),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(status)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(result, thresholds, baseline=None):
+    """
+    Check a result against absolute thresholds and, when given, a baseline result.
+
+    Returns:
+        list: Failure messages.
+    """
+    failures = list(result.get('corpus_failures', []))
+    max_slowdown = thresholds.get('max_slowdown')
+    max_growth = thresholds.get('max_memory_growth')
+    if baseline is not None and baseline.get('corpus_version') != result['corpus_version']:
+        # Numbers from another corpus are not comparable
+        baseline = None
+
+    for name, case in result['cases'].items():
+        limits = thresholds.get('cases', {}).get(name, {})
+        if 'min_ops_per_sec' in limits and case['ops_per_sec'] < limits['min_ops_per_sec']:
+            failures.append(f'{name}: {case["ops_per_sec"]} {case["unit"]}/s is below the floor of '
+                            f'{limits["min_ops_per_sec"]}')
+        if 'max_peak_kb' in limits and case['peak_kb'] > limits['max_peak_kb']:
+            failures.append(f'{name}: peak {case["peak_kb"]} KB is above the cap of {limits["max_peak_kb"]} KB')
+
+        before = (baseline or {}).get('cases', {}).get(name)
+        if not before:
+            continue
+        if max_slowdown is not None and case['ops_per_sec'] < before['ops_per_sec'] * (1 - max_slowdown):
+            failures.append(f'{name}: {case["ops_per_sec"]} {case["unit"]}/s vs {before["ops_per_sec"]} '
+                            f'at {baseline.get("commit")} (more than {max_slowdown:.0%} slower)')
+        if max_growth is not None and case['peak_kb'] > before['peak_kb'] * (1 + max_growth):
+            failures.append(f'{name}: peak {case["peak_kb"]} KB vs {before["peak_kb"]} KB '
+                            f'at {baseline.get("commit")} (more than {max_growth:.0%} growth)')
+    return failures
+
+
+def _load_baseline(value):
+    """A result file path, or a commit whose result is in benchmarks/results/."""
+    path = value if os.path.exists(value) else os.path.join(RESULTS_DIR, f'{value}.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _print_table(result, baseline=None):
+    before = (baseline or {}).get('cases', {})
+    print(f'corpus v{result["corpus_version"]}  commit {result["commit"]}{" (dirty)" if result["dirty"] else ""}')
+    print(f'{"case":<22}{"ops/s":>12}{"MB/s":>9}{"peak KB":>11}{"vs base":>10}')
+    for name, case in result['cases'].items():
+        change = ''
+        if name in before:
+            change = f'{case["ops_per_sec"] / before[name]["ops_per_sec"] - 1:+.1%}'
+        mb = f'{case["mb_per_sec"]:.2f}' if case['mb_per_sec'] is not None else '-'
+        print(f'{name:<22}{case["ops_per_sec"]:>12.1f}{mb:>9}{case["peak_kb"]:>11.1f}{change:>10}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the scraper parsers on the saved page corpus.')
+    parser.add_argument('--rounds', type=int, default=5, help='minimum timed rounds per case')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum timed seconds per case')
+    parser.add_argument('--case', action='append', dest='cases', help='run only this case (repeatable)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--baseline', help='earlier result file, or a commit with a result in benchmarks/results/')
+    parser.add_argument('--thresholds', default=THRESHOLDS, help='threshold file')
+    args = parser.parse_args(argv)
+
+    result = run(rounds=args.rounds, min_time=args.min_time, cases=args.cases)
+    with open(args.thresholds, encoding='utf-8') as f:
+        thresholds = json.load(f)
+    baseline = _load_baseline(args.baseline) if args.baseline else None
+    result['failures'] = compare(result, thresholds, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{result["commit"] or "local"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    _print_table(result, baseline)
+    print(f'results written to {output}')
+    for failure in result['failures']:
+        print(f'FAIL {failure}')
+    return 1 if result['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Cold start benchmark: how long a new worker or CLI process takes to be ready.
+
+    python -m benchmarks.startup [--rounds 7] [--case NAME ...] [--output PATH]
+
+Every round starts a fresh interpreter, so nothing is cached in-process
+(the OS file cache is warm after the first, untimed round):
+
+    create_app    import the app and build it, as a web worker does on boot
+    cli_routes    `flask routes`, a CLI command that only needs the app
+    cli_db_heads  `flask db heads`, which also loads Flask-Migrate and alembic
+
+Wall times are reported as the fastest and median round. One extra
+create_app run under -X importtime adds the module count, the import time and
+which of the heavy scraping and analysis packages (see
+app.utils.import_report.HEAVY_MODULES) were loaded at startup; there should be
+none. Results go to benchmarks/results/startup-<commit>.json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from app.utils.import_report import STARTUP_STATEMENT, heavy_loaded, project_root, run_importtime, total_us
+from benchmarks.run import RESULTS_DIR, git_revision
+
+CASES = {
+    'create_app': [sys.executable, '-c', STARTUP_STATEMENT],
+    'cli_routes': [sys.executable, '-m', 'flask', '--app', 'run', 'routes'],
+    'cli_db_heads': [sys.executable, '-m', 'flask', '--app', 'run', 'db', 'heads'],
+}
+
+
+def time_command(command, env):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=project_root(), env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def run_case(command, env, rounds):
+    time_command(command, env)
+    times = [time_command(command, env) for _ in range(rounds)]
+    return {
+        'rounds': rounds,
+        'best_ms': round(min(times) * 1000, 1),
+        'median_ms': round(statistics.median(times) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time cold starts of the app and its CLI.')
+    parser.add_argument('--rounds', type=int, default=7, help='timed rounds per case')
+    parser.add_argument('--case', action='append', dest='cases', choices=list(CASES),
+                        help='run only this case (repeatable)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/startup-<commit>.json)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+                   STATIC_BUILD_DIR=os.path.join(tmp, 'static_build'))
+        for name, command in CASES.items():
+            if args.cases and name not in args.cases:
+                continue
+            results[name] = run_case(command, env, args.rounds)
+            print(f"{name:14} best {results[name]['best_ms']:8.1f} ms  median {results[name]['median_ms']:8.1f} ms")
+        timings = run_importtime(env=env)
+
+    imports = {
+        'modules': len(timings),
+        'import_ms': round(total_us(timings) / 1000, 1),
+        'heavy_loaded': heavy_loaded(timings),
+    }
+    print(f"create_app imports {imports['modules']} modules in {imports['import_ms']} ms, "
+          f"heavy modules loaded: {', '.join(imports['heavy_loaded']) or 'none'}")
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'cases': results,
+        'imports': imports,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'startup-{commit or "local"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'results written to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+How many concurrent scrape streams one node sustains, and whether shutdown drains them.
+
+    python -m benchmarks.stream_capacity [--levels 8 16 32 64] [--pages 3] [--page-delay 0.5]
+                                         [--latency 0.05] [--probe-limit-ms 1000]
+                                         [--server auto|gunicorn|threaded] [--workers N] [--threads N]
+                                         [--drain-streams 16] [--drain-seconds 3] [--output PATH]
+
+Starts benchmarks/fake_server.py in this process and the app in production
+mode in a child process: gunicorn with gunicorn.conf.py when it is installed
+(--server auto), otherwise `python wsgi.py`. It uses a throwaway SQLite database
+with one user, and login stays on, as in production. Then:
+
+    levels  for each level, that many clients log in and open scrape streams
+            (POST /business/analysis, stream=items) at the same moment and read
+            them to the end. Meanwhile a probe requests the warehouse grid
+            over and over, as other users would. A level is sustained when
+            every stream ends with its done event and the probe's p99 stays
+            under --probe-limit-ms.
+    drain   --drain-streams long auto-saving streams are opened and the server
+            gets SIGTERM. Every stream should end with its done or draining
+            event, not a broken connection. Every streamed item should be in
+            the database, and the server should exit within
+            --drain-seconds plus the wrap-up time.
+
+Results go to benchmarks/results/streams-<commit>.json.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from app.utils.import_report import project_root
+from benchmarks.fake_server import FakeSearchServer
+from benchmarks.load_test import percentile
+from benchmarks.run import RESULTS_DIR, git_revision
+
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+DRAIN_PAGES = 100
+
+
+def _ms(value):
+    return round(value * 1000, 1) if value is not None else None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(path):
+    """Create the schema and the benchmark user in a fresh SQLite file."""
+    from app import create_app, db
+    from app.config import Config
+    from app.models.user import User
+
+    class SetupConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        STATIC_BUILD_DIR = ''
+
+    app = create_app(SetupConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username=USERNAME, email='bench@example.com')
+        user.password = PASSWORD
+        db.session.add(user)
+        db.session.commit()
+        db.engine.dispose()
+
+
+class Server:
+    """The app in production mode, in a child process."""
+
+    def __init__(self, kind, port, env, log_path, workers=None):
+        self.kind = kind
+        self.port = port
+        self.url = f'http://127.0.0.1:{port}'
+        if kind == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                       '--bind', f'127.0.0.1:{port}', 'wsgi:app']
+            if workers:
+                command[-1:-1] = ['--workers', str(workers)]
+        else:
+            command = [sys.executable, 'wsgi.py', '--port', str(port)]
+        self._log = open(log_path, 'wb')
+        self.process = subprocess.Popen(command, cwd=project_root(), env=env,
+                                        stdout=self._log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'server exited with status {self.process.returncode}')
+            try:
+                requests.get(f'{self.url}/auth/login', timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError('server did not come up')
+
+    def terminate(self, timeout=60):
+        """SIGTERM, then the seconds until the process exited (None if it had to be killed)."""
+        started = time.perf_counter()
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+            return time.perf_counter() - started
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            return None
+        finally:
+            self._log.close()
+
+
+class StreamClient:
+    def __init__(self, base_url, pages):
+        self.base_url = base_url
+        self.pages = pages
+        session = requests.Session()
+        response = session.post(f'{base_url}/auth/login', data={'username': USERNAME, 'password': PASSWORD},
+                                allow_redirects=False)
+        if response.status_code != 302 or 'session' not in session.cookies:
+            raise RuntimeError('login failed')
+        self.cookies = session.cookies.get_dict()
+
+    def stream(self, keyword, source, pages=None, autosave=False, on_first=None):
+        """
+        Returns:
+            dict: outcome ('done', 'draining', 'error' or 'broken'), seconds to the first line and to the
+            end, and the number of items received.
+        """
+        data = {'keyword': keyword, 'source': source, 'pages': pages or self.pages, 'stream': 'items'}
+        if autosave:
+            data['autosave'] = '1'
+        started = time.perf_counter()
+        result = {'outcome': 'broken', 'first_s': None, 'items': 0}
+        try:
+            with requests.post(f'{self.base_url}/business/analysis', data=data, cookies=self.cookies,
+                               stream=True, timeout=(10, 120)) as response:
+                if response.status_code != 200:
+                    result['outcome'] = 'error'
+                    return result
+                for line in response.iter_lines():
+                    if result['first_s'] is None:
+                        result['first_s'] = time.perf_counter() - started
+                        if on_first:
+                            on_first()
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event['type'] == 'item':
+                        result['items'] += 1
+                    elif event['type'] == 'done':
+                        result['outcome'] = 'done'
+                    elif event['type'] == 'error':
+                        result['outcome'] = 'draining' if event.get('draining') else 'error'
+        except (requests.RequestException, ValueError):
+            result['outcome'] = 'broken'
+        finally:
+            result['total_s'] = time.perf_counter() - started
+        return result
+
+    def probe(self, stop, interval=0.1):
+        """Request the warehouse grid until stop is set; [(seconds, ok)]."""
+        session = requests.Session()
+        session.cookies.update(self.cookies)
+        samples = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                response = session.get(f'{self.base_url}/business/warehouse/data', params={'page': 1, 'limit': 20},
+                                       timeout=30)
+                ok = response.status_code == 200 and response.json().get('code') == 0
+            except (requests.RequestException, ValueError):
+                ok = False
+            samples.append((time.perf_counter() - started, ok))
+            stop.wait(interval)
+        return samples
+
+
+def run_level(client, level, probe_limit_ms):
+    stop = threading.Event()
+    probe_samples = []
+    probe = threading.Thread(target=lambda: probe_samples.extend(client.probe(stop)))
+    probe.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as executor:
+        results = list(executor.map(
+            lambda job: client.stream(f'容量测试{level}-{job}', 'sohu' if job % 2 else 'baidu'), range(level)))
+    wall = time.perf_counter() - started
+    stop.set()
+    probe.join()
+
+    firsts = sorted(r['first_s'] for r in results if r['first_s'] is not None)
+    totals = sorted(r['total_s'] for r in results)
+    probe_times = sorted(t for t, _ in probe_samples)
+    summary = {
+        'streams': level,
+        'completed': sum(1 for r in results if r['outcome'] == 'done'),
+        'errors': sum(1 for r in results if r['outcome'] != 'done'),
+        'items': sum(r['items'] for r in results),
+        'wall_s': round(wall, 2),
+        'first_line_p50_ms': _ms(percentile(firsts, 0.5)),
+        'first_line_p99_ms': _ms(percentile(firsts, 0.99)),
+        'stream_p50_ms': _ms(percentile(totals, 0.5)),
+        'stream_p99_ms': _ms(percentile(totals, 0.99)),
+        'probe_requests': len(probe_samples),
+        'probe_errors': sum(1 for _, ok in probe_samples if not ok),
+        'probe_p50_ms': _ms(percentile(probe_times, 0.5)),
+        'probe_p99_ms': _ms(percentile(probe_times, 0.99)),
+    }
+    summary['sustained'] = (summary['errors'] == 0 and summary['probe_errors'] == 0
+                            and (summary['probe_p99_ms'] or 0) <= probe_limit_ms)
+    print(f"{level:>7}{summary['completed']:>10}{summary['errors']:>8}{summary['wall_s']:>9}"
+          f"{summary['first_line_p99_ms']!s:>12}{summary['stream_p99_ms']!s:>12}{summary['probe_p99_ms']!s:>12}"
+          f"{'yes' if summary['sustained'] else 'no':>11}")
+    return summary
+
+
+def run_drain(server, client, streams, database_path):
+    opened = threading.Semaphore(0)
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        futures = [executor.submit(client.stream, f'排空测试{job}', 'sohu' if job % 2 else 'baidu',
+                                   pages=DRAIN_PAGES, autosave=True, on_first=opened.release)
+                   for job in range(streams)]
+        for _ in range(streams):
+            opened.acquire(timeout=30)
+        # Let every stream get some items in
+        time.sleep(1.0)
+        exit_s = server.terminate()
+        results = [f.result() for f in futures]
+
+    with sqlite3.connect(database_path) as conn:
+        stored = conn.execute("SELECT count(*) FROM opinion_data WHERE keyword LIKE '排空测试%'").fetchone()[0]
+    outcomes = {}
+    for r in results:
+        outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+    summary = {
+        'streams': streams,
+        'outcomes': outcomes,
+        'items_streamed': sum(r['items'] for r in results),
+        'items_stored': stored,
+        'server_exit_s': round(exit_s, 2) if exit_s is not None else None,
+    }
+    summary['clean'] = (outcomes.get('broken', 0) == 0 and outcomes.get('error', 0) == 0
+                        and summary['items_stored'] >= summary['items_streamed'] and exit_s is not None)
+    print(f"drain: {streams} streams -> {outcomes}, {summary['items_streamed']} items streamed, "
+          f"{stored} stored, server exited after {summary['server_exit_s']}s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure concurrent scrape streams per node and shutdown draining.')
+    parser.add_argument('--levels', type=int, nargs='+', default=[8, 16, 32, 64], help='concurrent streams per level')
+    parser.add_argument('--pages', type=int, default=3, help='result pages per scrape')
+    parser.add_argument('--page-delay', type=float, default=0.5, help='SCRAPER_PAGE_DELAY_MIN/MAX (seconds)')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake server delay per request (seconds)')
+    parser.add_argument('--probe-limit-ms', type=float, default=1000, help='probe p99 a sustained level stays under')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'threaded'], default='auto',
+                        help='gunicorn when installed (auto), or wsgi.py\'s threaded server')
+    parser.add_argument('--workers', type=int, default=None, help='gunicorn workers (WEB_WORKERS)')
+    parser.add_argument('--threads', type=int, default=None, help='gunicorn threads per worker (WEB_THREADS)')
+    parser.add_argument('--drain-streams', type=int, default=16, help='streams open at SIGTERM (0 skips)')
+    parser.add_argument('--drain-seconds', type=int, default=3, help='SHUTDOWN_DRAIN_SECONDS for the server')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/streams-<commit>.json)')
+    args = parser.parse_args(argv)
+
+    kind = args.server
+    if kind == 'auto':
+        kind = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'threaded'
+
+    fake = FakeSearchServer(latency=args.latency, pages=max(args.pages, DRAIN_PAGES))
+    with tempfile.TemporaryDirectory() as tmp, fake:
+        database_path = os.path.join(tmp, 'streams.db')
+        prepare_database(database_path)
+        env = dict(os.environ,
+                   DATABASE_URL='sqlite:///' + database_path,
+                   SCRAPER_BAIDU_URL=fake.url + '/s', SCRAPER_SOHU_URL=fake.url + '/web',
+                   SCRAPER_PAGE_DELAY_MIN=str(args.page_delay), SCRAPER_PAGE_DELAY_MAX=str(args.page_delay),
+                   SHUTDOWN_DRAIN_SECONDS=str(args.drain_seconds),
+                   PAGE_ARCHIVE_DIR=os.path.join(tmp, 'archive'), COVER_CACHE_DIR='',
+                   STATIC_BUILD_DIR=os.path.join(tmp, 'static_build'), PROFILER_DIR=os.path.join(tmp, 'profiles'))
+        if args.threads:
+            env['WEB_THREADS'] = str(args.threads)
+
+        server = Server(kind, free_port(), env, os.path.join(tmp, 'server.log'), workers=args.workers)
+        try:
+            server.wait_ready()
+            client = StreamClient(server.url, args.pages)
+            print(f'server: {kind}')
+            print(f"{'streams':>7}{'completed':>10}{'errors':>8}{'wall s':>9}{'first p99':>12}{'stream p99':>12}"
+                  f"{'probe p99':>12}{'sustained':>11}")
+            levels = {str(level): run_level(client, level, args.probe_limit_ms) for level in args.levels}
+            drain = run_drain(server, client, args.drain_streams, database_path) if args.drain_streams else None
+        finally:
+            if server.process.poll() is None:
+                server.terminate()
+            with open(os.path.join(tmp, 'server.log'), 'rb') as f:
+                log_tail = f.read().decode('utf-8', 'replace').splitlines()[-20:]
+
+    sustained = [level for level, s in levels.items() if s['sustained']]
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'server': kind,
+        'cpus': os.cpu_count(),
+        'settings': {k: v for k, v in vars(args).items() if k != 'output'},
+        'levels': levels,
+        'max_sustained_streams': max(map(int, sustained)) if sustained else 0,
+        'drain': drain,
+        'server_log_tail': log_tail,
+    }
+    print(f"max sustained concurrent streams: {report['max_sustained_streams']}")
+    output = args.output or os.path.join(RESULTS_DIR, f'streams-{commit or "local"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'results written to {output}')
+    return 0 if drain is None or drain['clean'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
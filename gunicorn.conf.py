@@ -0,0 +1,72 @@
+"""
+Gunicorn settings for production:
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gthread workers: WEB_WORKERS processes (one per core, at least two, by
+default), each with WEB_THREADS threads. One thread serves one request, so
+that many streams can be open per worker; see app/utils/serving.py for why
+threads and not gevent. Workers are recycled after about WEB_MAX_REQUESTS
+requests; with two or more workers the others keep accepting while a recycled
+one drains.
+
+Background tasks are rows in the database (app/utils/tasks.py), so any worker
+answers a poll. Two things stay per worker: the burst detector only sees the
+items saved through its own worker, so a burst spread evenly over N workers
+needs about N times the rate to alert, and /metrics reports the counters of
+whichever worker answers the scrape (http_requests_in_flight included). Set
+WEB_WORKERS=1 where either matters more than drain-on-recycle.
+
+On SIGTERM, and when a worker is recycled, open streams run for up to
+SHUTDOWN_DRAIN_SECONDS. After that they are cut short at their next event.
+graceful_timeout leaves WRAP_UP_SECONDS on top of that before gunicorn kills
+the worker.
+"""
+import os
+
+from app.config import Config
+from app.utils.serving import WRAP_UP_SECONDS
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+# At least two, so another worker accepts while a recycled one drains
+workers = int(os.environ.get('WEB_WORKERS', max(2, os.cpu_count() or 1)))
+threads = int(os.environ.get('WEB_THREADS', 64))
+# gthread workers heartbeat from their main loop, so long streams do not trip this
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+keepalive = 5
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = Config.SHUTDOWN_DRAIN_SECONDS + WRAP_UP_SECONDS
+# Each worker builds its own app: SQLAlchemy pools and thread pools are not shared across fork
+preload_app = False
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+
+
+def _begin_drain(worker):
+    from app.utils.serving import get_serving
+
+    serving = get_serving(worker.wsgi)
+    if serving is not None:
+        serving.begin_drain()
+
+
+def post_worker_init(worker):
+    import signal
+
+    # Gunicorn's own SIGTERM handler stops the accept loop; start the drain clock as well
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        _begin_drain(worker)
+        previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def pre_request(worker, req):
+    # This request makes the worker reach max_requests: it stops accepting afterwards and exits
+    # once its open requests are done
+    if worker.nr + 1 >= worker.max_requests:
+        _begin_drain(worker)
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app import create_app, db
+from app.config import Config
+from app.utils.query_accounting import track
+
+
+class TestConfig(Config):
+    TESTING = True
+    LOGIN_DISABLED = True
+    WTF_CSRF_ENABLED = False
+    # Parse in the request thread; tests/test_crawl_pipeline.py covers the process pool
+    CRAWL_PARSE_WORKERS = 0
+    # Covers come from the local fake server; tests that want prefetching turn it on
+    COVER_ALLOW_PRIVATE_HOSTS = True
+    COVER_PREFETCH_WORKERS = 0
+    # Plain static serving; tests/test_static_assets.py builds its own
+    STATIC_BUILD_DIR = ''
+
+
+@pytest.fixture
+def app(tmp_path):
+    class _Config(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        PAGE_ARCHIVE_DIR = str(tmp_path / 'archive')
+        PROFILER_DIR = str(tmp_path / 'profiles')
+        COVER_CACHE_DIR = str(tmp_path / 'covers')
+
+    app = create_app(_Config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def db_client(app):
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Fail when a block runs more SQL statements than allowed:
+
+        with max_queries(4):
+            db_client.get('/admin/users')
+    """
+    @contextmanager
+    def check(limit):
+        with track() as log:
+            yield log
+        assert log.count <= limit, f'{log.count} statements, at most {limit} expected:\n{log.report()}'
+
+    return check
+
+
+class ChatStub:
+    """
+    Local stand-in for an OpenAI-compatible /chat/completions endpoint.
+    Tests may replace `reply` (payload -> content string), `status`, `delay` or `headers`.
+    Requests with "stream": true get server-sent events, one `token_size` slice every
+    `token_delay` seconds; `cancelled` counts streams the client dropped midway.
+    `cut_after` ends a stream after that many events, without [DONE].
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        self.delay = 0
+        self.headers = {}
+        self.reply = self.default_reply
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.token_size = 4
+        self.token_delay = 0
+        self.cancelled = 0
+        self.cut_after = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                with stub.lock:
+                    stub.requests.append(payload)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    if stub.status == 200 and payload.get('stream'):
+                        self.send_stream(payload)
+                        return
+                    if stub.status != 200:
+                        body = json.dumps({'error': {'message': 'stub error'}}).encode()
+                    else:
+                        content = stub.reply(payload)
+                        body = json.dumps({
+                            'id': 'chatcmpl-stub',
+                            'object': 'chat.completion',
+                            'model': payload.get('model'),
+                            'choices': [{'index': 0, 'finish_reason': 'stop',
+                                         'message': {'role': 'assistant', 'content': content}}],
+                            'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15},
+                        }, ensure_ascii=False).encode('utf-8')
+                    self.send_response(stub.status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    for key, value in stub.headers.items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def send_stream(self, payload):
+                content = stub.reply(payload)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                for key, value in stub.headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.close_connection = True
+                pieces = [content[i:i + stub.token_size] for i in range(0, len(content), stub.token_size)]
+                events = [{'choices': [{'index': 0, 'delta': {'content': piece}}]} for piece in pieces]
+                events.append({'choices': [], 'usage': {'prompt_tokens': 10, 'completion_tokens': len(pieces)}})
+                if stub.cut_after is not None:
+                    events = events[:stub.cut_after]
+                try:
+                    for event in events:
+                        self.wfile.write(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n\n')
+                        self.wfile.flush()
+                        if stub.token_delay:
+                            time.sleep(stub.token_delay)
+                    if stub.cut_after is not None:
+                        return
+                    self.wfile.write(b'data: [DONE]\n\n')
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with stub.lock:
+                        stub.cancelled += 1
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    @staticmethod
+    def default_reply(payload):
+        text = payload['messages'][-1]['content']
+        sentiment = 'negative' if '事故' in text else 'positive'
+        return json.dumps({'sentiment': sentiment, 'summary': text[:20], 'tags': ['测试']},
+                          ensure_ascii=False)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def chat_stub():
+    stub = ChatStub()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def make_chat_stub():
+    """Factory for extra stub endpoints, e.g. to test routing across engines."""
+    stubs = []
+
+    def make():
+        stub = ChatStub()
+        stubs.append(stub)
+        return stub
+
+    yield make
+    for stub in stubs:
+        stub.close()
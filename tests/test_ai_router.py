@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import db
+from app.models import AIEngine, OpinionData
+from app.utils.ai_client import AIClientError
+from app.utils.ai_router import EngineRouter, parse_duration
+
+MESSAGES = [{'role': 'user', 'content': '你好'}]
+
+
+def _engine(engine_id, stub, **kwargs):
+    return AIEngine(id=engine_id, provider='Stub', api_url=stub.url, api_key='sk-test',
+                    model_name=f'model-{engine_id}', **kwargs)
+
+
+def test_parse_duration():
+    assert parse_duration('2') == 2.0
+    assert parse_duration('6m0s') == 360.0
+    assert parse_duration('20ms') == pytest.approx(0.02)
+    assert parse_duration('soon') is None
+
+
+def test_spreads_load_within_caps(make_chat_stub):
+    fast, slow = make_chat_stub(), make_chat_stub()
+    fast.delay, slow.delay = 0.02, 0.1
+    router = EngineRouter()
+    router.sync([_engine(1, fast, max_concurrency=2), _engine(2, slow, max_concurrency=2)])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        replies = list(pool.map(lambda _: router.chat(MESSAGES), range(16)))
+
+    assert fast.max_in_flight <= 2 and slow.max_in_flight <= 2
+    assert len(fast.requests) + len(slow.requests) == 16
+    # The faster engine frees its slots sooner and so takes more of the work
+    assert len(fast.requests) > len(slow.requests) > 0
+    assert {r['engine_id'] for r in replies} == {1, 2}
+    stats = {s['engine_id']: s for s in router.stats()}
+    assert stats[2]['latency_p50'] > stats[1]['latency_p50']
+    assert stats[1]['outstanding'] == 0
+
+
+def test_fails_over_and_opens_circuit(make_chat_stub):
+    broken, healthy = make_chat_stub(), make_chat_stub()
+    broken.status = 503
+    router = EngineRouter()
+    router.sync([_engine(1, broken), _engine(2, healthy, weight=1)])
+
+    for _ in range(6):
+        assert router.chat(MESSAGES, engine_ids=[1, 2])['engine_id'] == 2
+
+    stats = {s['engine_id']: s for s in router.stats()}
+    assert stats[1]['circuit'] == 'open'
+    assert stats[1]['error_rate'] == 1.0
+    # Once open, the broken engine is no longer tried
+    assert len(broken.requests) == 3
+
+    with pytest.raises(AIClientError):
+        router.chat(MESSAGES, engine_ids=[1])
+
+
+def test_respects_rate_limits(make_chat_stub):
+    limited, other = make_chat_stub(), make_chat_stub()
+    limited.headers = {'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '30s'}
+    router = EngineRouter()
+    # Heavier weight makes the limited engine the first choice until it reports exhaustion
+    router.sync([_engine(1, limited, weight=5), _engine(2, other)])
+
+    engines = [router.chat(MESSAGES)['engine_id'] for _ in range(3)]
+    assert engines == [1, 2, 2]
+    assert {s['engine_id']: s for s in router.stats()}[1]['throttled_for'] > 20
+
+    other.status = 429
+    other.headers = {'Retry-After': '30'}
+    with pytest.raises(AIClientError):
+        router.chat(MESSAGES, timeout=0.2)
+
+
+def test_request_errors_are_not_failed_over(make_chat_stub):
+    first, second = make_chat_stub(), make_chat_stub()
+    first.status = 400
+    router = EngineRouter()
+    router.sync([_engine(1, first, weight=2), _engine(2, second)])
+    with pytest.raises(AIClientError) as info:
+        router.chat(MESSAGES)
+    assert info.value.status == 400
+    assert second.requests == []
+
+
+def test_analyze_fails_over_to_healthy_engine(app, db_client, make_chat_stub):
+    broken, healthy = make_chat_stub(), make_chat_stub()
+    broken.status = 500
+    for stub in (broken, healthy):
+        db.session.add(AIEngine(provider='Stub', api_url=stub.url, api_key='sk', model_name='m', is_active=True))
+    db.session.add_all([OpinionData(title=f'新闻{i}', content=f'内容{i}') for i in range(5)])
+    db.session.commit()
+
+    body = db_client.post('/business/warehouse/analyze', json={'ids': [1, 2, 3, 4, 5]}).get_json()
+    assert body['data']['analyzed'] == 5 and body['data']['errors'] == []
+    assert {r['engine_id'] for r in body['data']['results']} == {2}
+
+    stats = db_client.get('/business/ai_engines/stats').get_json()['data']
+    assert {s['engine_id'] for s in stats} >= {1, 2}
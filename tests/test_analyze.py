@@ -0,0 +1,158 @@
+import json
+import time
+
+from sqlalchemy import event
+
+from app import db
+from app.models import AIEngine, AnalysisResult, OpinionData, OpinionDetail
+from app.utils.ai_router import router_stats
+from app.utils.analyzer import parse_analysis
+
+
+def _seed(chat_stub, engines=1):
+    for i in range(engines):
+        db.session.add(AIEngine(provider='Stub', api_url=chat_stub.url, api_key='sk-test',
+                                model_name='stub-model', is_active=True))
+    items = [OpinionData(title=f'新闻{i}', content=f'内容{i}') for i in range(6)]
+    items[0].content = '工厂发生事故'
+    db.session.add_all(items)
+    db.session.flush()
+    db.session.add(OpinionDetail(opinion_id=items[1].id, title='详情', content='深度采集正文'))
+    db.session.commit()
+    return [item.id for item in items]
+
+
+def test_parse_analysis_tolerates_fences():
+    data = parse_analysis('```json\n{"sentiment": "NEGATIVE", "summary": "s", "tags": "a，b"}\n```')
+    assert data == {'sentiment': 'negative', 'summary': 's', 'tags': ['a', 'b']}
+    assert parse_analysis('no json here')['sentiment'] == 'neutral'
+
+
+def test_analyze_batches_and_caches(app, db_client, chat_stub):
+    app.config['AI_MAX_CONCURRENCY'] = 3
+    chat_stub.delay = 0.05
+    ids = _seed(chat_stub, engines=2)
+
+    rv = db_client.post('/business/warehouse/analyze', json={'ids': ids})
+    body = rv.get_json()
+    assert body['code'] == 0, body
+    assert body['data']['analyzed'] == 6
+    assert len(chat_stub.requests) == 6
+    assert 1 < chat_stub.max_in_flight <= 6
+    assert '深度采集正文' in ''.join(r['messages'][-1]['content'] for r in chat_stub.requests)
+
+    by_id = {r['opinion_id']: r for r in body['data']['results']}
+    assert by_id[ids[0]]['sentiment'] == 'negative'
+    assert by_id[ids[2]]['tags'] == ['测试']
+
+    # Unchanged content is served from the cache without calling the model again
+    rv = db_client.post('/business/warehouse/analyze', json={'ids': ids})
+    assert rv.get_json()['data']['cached'] == 6
+    assert len(chat_stub.requests) == 6
+
+    # Editing one item re-bills only that item
+    db_client.post('/business/warehouse/update', json={'id': ids[2], 'content': '修改后的内容'})
+    rv = db_client.post('/business/warehouse/analyze', json={'ids': ids})
+    assert rv.get_json()['data']['analyzed'] == 1
+    assert len(chat_stub.requests) == 7
+
+    rv = db_client.get(f'/business/warehouse/analysis/{ids[2]}')
+    assert rv.get_json()['data']['summary'].endswith('修改后的内容')
+
+
+def test_analyze_reports_upstream_errors(app, db_client, chat_stub):
+    ids = _seed(chat_stub)
+    chat_stub.status = 500
+    body = db_client.post('/business/warehouse/analyze', json={'id': ids[0]}).get_json()
+    assert body['code'] == 0
+    assert len(body['data']['errors']) == 1
+    assert AnalysisResult.query.count() == 0
+
+
+def test_analyze_without_engine(app, db_client):
+    db.session.add(OpinionData(title='t'))
+    db.session.commit()
+    body = db_client.post('/business/warehouse/analyze', json={'id': 1}).get_json()
+    assert body['code'] == 400
+
+
+def _events(rv):
+    return [json.loads(line) for line in rv.get_data(as_text=True).splitlines() if line]
+
+
+def test_analyze_stream_relays_tokens_and_persists(app, db_client, chat_stub):
+    ids = _seed(chat_stub)
+    rv = db_client.post('/business/warehouse/analyze/stream', json={'id': ids[0]})
+    assert rv.mimetype == 'application/x-ndjson'
+    events = _events(rv)
+    assert events[0]['type'] == 'start'
+    tokens = [e['content'] for e in events if e['type'] == 'token']
+    assert len(tokens) > 1
+    assert events[-1]['type'] == 'result' and events[-1]['data']['sentiment'] == 'negative'
+    assert chat_stub.requests[-1]['stream'] is True
+    assert AnalysisResult.query.filter_by(opinion_id=ids[0]).first().completion_tokens == len(tokens)
+
+    # A second request for unchanged content is answered from the cache
+    events = _events(db_client.post('/business/warehouse/analyze/stream', json={'id': ids[0]}))
+    assert [e['type'] for e in events] == ['result'] and events[0]['cached'] is True
+
+    rv = db_client.post('/business/warehouse/analyze/stream?format=sse', json={'id': ids[1]})
+    body = rv.get_data(as_text=True)
+    assert rv.mimetype == 'text/event-stream' and body.startswith('data: {"type": "start"')
+
+
+def test_analyze_stream_cancels_upstream_on_disconnect(app, db_client, chat_stub):
+    ids = _seed(chat_stub)
+    chat_stub.token_size = 1
+    chat_stub.token_delay = 0.02
+    rv = db_client.post('/business/warehouse/analyze/stream', json={'id': ids[2]}, buffered=False)
+    chunks = iter(rv.response)
+    assert json.loads(next(chunks))['type'] == 'start'
+    json.loads(next(chunks))
+    rv.close()
+
+    for _ in range(100):
+        if chat_stub.cancelled:
+            break
+        time.sleep(0.02)
+    assert chat_stub.cancelled == 1
+    assert AnalysisResult.query.count() == 0
+    assert all(s['outstanding'] == 0 for s in router_stats())
+
+
+def test_analyze_stream_stores_nothing_when_cut_off(app, db_client, chat_stub):
+    ids = _seed(chat_stub)
+    chat_stub.cut_after = 2
+    events = _events(db_client.post('/business/warehouse/analyze/stream', json={'id': ids[0]}))
+    assert [e['type'] for e in events] == ['start', 'token', 'token', 'error']
+    assert AnalysisResult.query.count() == 0
+    assert all(s['outstanding'] == 0 for s in router_stats())
+
+    # The retry goes to the model again instead of a cached partial result
+    chat_stub.cut_after = None
+    events = _events(db_client.post('/business/warehouse/analyze/stream', json={'id': ids[0]}))
+    assert events[-1]['type'] == 'result' and events[-1]['cached'] is False
+    assert len(chat_stub.requests) == 2
+
+
+def test_analyze_stream_reports_errors(app, db_client, chat_stub):
+    ids = _seed(chat_stub)
+    chat_stub.status = 500
+    events = _events(db_client.post('/business/warehouse/analyze/stream', json={'id': ids[0]}))
+    assert events[-1]['type'] == 'error'
+
+
+def test_deleting_an_engine_keeps_its_results(app, db_client, chat_stub):
+    # SQLite only enforces foreign keys when asked to, per connection
+    event.listen(db.engine, 'connect', lambda connection, _: connection.execute('PRAGMA foreign_keys=ON'))
+    db.session.remove()
+    db.engine.dispose()
+    ids = _seed(chat_stub)
+    engine_id = AIEngine.query.one().id
+    assert db_client.post('/business/warehouse/analyze', json={'id': ids[0]}).get_json()['code'] == 0
+
+    rv = db_client.post('/business/ai_engines/delete', json={'id': engine_id}).get_json()
+    assert rv['code'] == 0, rv
+    db.session.expire_all()
+    assert AIEngine.query.count() == 0
+    assert AnalysisResult.query.filter_by(opinion_id=ids[0]).one().engine_id is None
@@ -0,0 +1,46 @@
+import json
+
+from app.utils.scraper import parse_baidu_results, parse_sohu_results
+from benchmarks import run as bench
+
+
+def test_corpus_matches_expectations():
+    version, pages = bench.load_corpus()
+    assert version >= 1
+    assert {p['kind'] for p in pages} == {'baidu', 'sohu', 'article'}
+    assert bench.check_corpus(pages) == []
+
+
+def test_parsers_leave_redirect_links_to_resolver():
+    _, pages = bench.load_corpus()
+    baidu = next(p for p in pages if p['kind'] == 'baidu')
+    seen = []
+    items = parse_baidu_results(baidu['html'], resolve=lambda url: seen.append(url) or 'https://news.example.cn/x')
+    assert len(seen) == len(items) == 10
+    assert all(i['original_url'] == 'https://news.example.cn/x' for i in items)
+
+    sohu = next(p for p in pages if p['file'] == 'sohu/search_gaokao_p1.html')
+    items = parse_sohu_results(sohu['html'], resolve=lambda url: 'resolved')
+    redirected = [i for i in items if 'sogou.com/link' in i['url']]
+    assert redirected and all(i['original_url'] == 'resolved' for i in redirected)
+    assert all(i['original_url'] == i['url'] for i in items if i not in redirected)
+
+
+def test_run_writes_results_and_fails_on_regression(tmp_path):
+    output = tmp_path / 'result.json'
+    assert bench.main(['--rounds', '1', '--min-time', '0', '--case', 'get_smart_xpath',
+                       '--output', str(output)]) == 0
+    result = json.loads(output.read_text(encoding='utf-8'))
+    case = result['cases']['get_smart_xpath']
+    assert case['units'] > 0 and case['ops_per_sec'] > 0 and case['peak_kb'] >= 0
+    assert result['failures'] == []
+
+    # A baseline twice as fast and half the memory: both limits trip
+    baseline = dict(result, cases={'get_smart_xpath': dict(case, ops_per_sec=case['ops_per_sec'] * 2,
+                                                           peak_kb=case['peak_kb'] / 2 - 1)})
+    failures = bench.compare(result, {'max_slowdown': 0.25, 'max_memory_growth': 0.25}, baseline)
+    assert len(failures) == 2
+
+    # Results from another corpus version are not compared
+    assert bench.compare(result, {'max_slowdown': 0.25}, dict(baseline, corpus_version=0)) == []
+    assert bench.compare(result, {'cases': {'get_smart_xpath': {'min_ops_per_sec': 1e12}}}) != []
@@ -0,0 +1,60 @@
+import time
+
+from app.utils.bursts import BurstDetector, burst_detected, get_detector
+
+
+def test_detector_flags_spike_once_per_bucket():
+    detector = BurstDetector(bucket_seconds=60, window_buckets=10, alpha=0.2, threshold=3.0, min_count=5)
+    t0 = 1_000_000 * 60
+    for minute in range(12):
+        assert detector.observe('电池', '新华网', n=1, now=t0 + minute * 60) == []
+
+    received = []
+
+    def on_burst(sender, event):
+        received.append(event)
+
+    burst_detected.connect(on_burst)
+    try:
+        spike = t0 + 12 * 60
+        events = []
+        for _ in range(8):
+            events.extend(detector.observe('电池', '新华网', now=spike + 1))
+    finally:
+        burst_detected.disconnect(on_burst)
+
+    assert {(e['dimension'], e['value']) for e in events} == {('keyword', '电池'), ('source', '新华网')}
+    assert received == events
+    assert all(e['count'] == 5 and e['baseline'] < 2 for e in events)
+
+    # Window covers the last 10 buckets: 9 quiet ones plus the spike
+    series = detector.snapshot(dimension='keyword', now=spike + 1)
+    assert series[0]['window_count'] == 9 + 8
+
+    # A long gap empties the window and decays the baseline without replaying every bucket
+    later = spike + 10_000 * 60
+    assert detector.snapshot(now=later)[0]['window_count'] == 0
+
+
+def test_no_alert_before_warmup():
+    detector = BurstDetector(min_count=1)
+    assert detector.observe('k', 's', n=50, now=0) == []
+
+
+def test_save_data_feeds_detector(app, db_client):
+    detector = get_detector(app)
+    now = time.time()
+    for i in range(5, 0, -1):
+        detector.observe('突发', None, now=now - i * app.config['BURST_BUCKET_SECONDS'])
+
+    items = [{'title': f'标题 {i}', 'keyword': '突发', 'source': '人民网',
+              'original_url': f'http://example.com/{i}'} for i in range(8)]
+    db_client.post('/business/save_data', json={'items': items})
+
+    events = db_client.get('/business/bursts').get_json()['data']
+    assert [(e['dimension'], e['value']) for e in events] == [('keyword', '突发')]
+    assert db_client.get(f'/business/bursts?since={events[-1]["seq"]}').get_json()['data'] == []
+
+    series = db_client.get('/business/bursts/series?dimension=source').get_json()['data']
+    assert series == [dict(series[0], value='人民网', window_count=8, current=8)]
+    assert db_client.get('/business/bursts/series?dimension=x').get_json()['code'] == 400
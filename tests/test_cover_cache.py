@@ -0,0 +1,117 @@
+import socket
+import time
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from app.utils.cover_cache import ORIGINAL, CoverCache, CoverError, check_host, get_cover_cache, sniff_type
+from benchmarks.fake_server import PIXEL, FakeSearchServer
+
+
+@pytest.fixture
+def fake_search():
+    with FakeSearchServer(pages=1) as server:
+        yield server
+
+
+def _fetches(server, route='/img'):
+    return sum(n for key, n in requests.get(server.url + '/__stats').json().items() if key.startswith(route + ' '))
+
+
+def test_proxy_fetches_once_and_revalidates(db_client, fake_search):
+    url = fake_search.url + '/img/1.jpg'
+    res = db_client.get('/business/cover', query_string={'url': url})
+    assert res.status_code == 200 and res.data == PIXEL and res.content_type == 'image/gif'
+    assert 'immutable' in res.headers['Cache-Control'] and 'max-age=2592000' in res.headers['Cache-Control']
+    etag = res.headers['ETag']
+
+    res = db_client.get('/business/cover', query_string={'url': url, 'size': 'small'})
+    assert res.status_code == 200 and res.headers['ETag'] == etag
+    res = db_client.get('/business/cover', query_string={'url': url}, headers={'If-None-Match': etag})
+    assert res.status_code == 304 and res.data == b''
+    assert _fetches(fake_search) == 1
+
+
+def test_failures_fall_back_to_the_default_image(app, db_client, fake_search):
+    for _ in range(2):
+        res = db_client.get('/business/cover', query_string={'url': fake_search.url + '/missing.jpg'})
+        assert res.status_code == 302 and res.headers['Location'].endswith('/static/img/defalt_img.png')
+    # The failure is remembered
+    assert _fetches(fake_search, '/missing.jpg') == 1
+    # HTML is not an image
+    res = db_client.get('/business/cover', query_string={'url': fake_search.url + '/article/1'})
+    assert res.status_code == 302
+
+    assert db_client.get('/business/cover', query_string={'url': 'file:///etc/passwd'}).get_json()['code'] == 400
+    assert db_client.get('/business/cover', query_string={'url': fake_search.url + '/img/1.jpg',
+                                                          'size': 'huge'}).get_json()['code'] == 400
+
+
+def test_private_hosts_are_refused(tmp_path, fake_search):
+    cache = CoverCache(str(tmp_path))
+    with pytest.raises(CoverError):
+        cache.load(fake_search.url + '/img/1.jpg')
+    with pytest.raises(CoverError):
+        check_host('http://169.254.169.254/latest/meta-data')
+    assert _fetches(fake_search) == 0
+
+
+def test_hosts_rebinding_to_private_addresses_are_refused(tmp_path, fake_search, monkeypatch):
+    port = urlsplit(fake_search.url).port
+    resolve = socket.getaddrinfo
+    answers = []
+
+    def rebinding(host, *args, **kwargs):
+        if host != 'covers.example':
+            return resolve(host, *args, **kwargs)
+        # Public for the check, loopback for the connection
+        answers.append(host)
+        address = '93.184.216.34' if len(answers) == 1 else '127.0.0.1'
+        return resolve(address, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', rebinding)
+    cache = CoverCache(str(tmp_path))
+    with pytest.raises(CoverError, match='内网'):
+        cache.load(f'http://covers.example:{port}/img/1.jpg')
+    assert len(answers) == 2
+    assert cache.get(f'http://covers.example:{port}/img/1.jpg') is None
+
+
+def test_least_recently_served_files_are_evicted(tmp_path, fake_search):
+    cache = CoverCache(str(tmp_path), max_bytes=len(PIXEL) * 2 + 10, allow_private=True)
+    first, second, third = (f'{fake_search.url}/img/{i}.jpg' for i in range(3))
+    cache.load(first)
+    cache.load(second)
+    time.sleep(0.01)
+    assert cache.get(first) is not None
+    cache.load(third)
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.usage() == {'files': 2, 'bytes': len(PIXEL) * 2}
+
+
+def test_saved_items_prefetch_their_covers(app, db_client, fake_search):
+    app.config['COVER_PREFETCH_WORKERS'] = 1
+    covers = [f'{fake_search.url}/img/{i}.jpg' for i in range(3)]
+    items = [{'title': f'标题{i}', 'url': f'https://news.example.cn/{i}', 'original_url': f'https://news.example.cn/{i}',
+              'source': '新华网', 'keyword': '舆情', 'cover': cover} for i, cover in enumerate(covers)]
+    assert db_client.post('/business/save_data', json={'items': items}).get_json()['code'] == 0
+    cache = get_cover_cache(app)
+    cache.close()
+    assert all(cache.get(cover) is not None for cover in covers)
+    assert _fetches(fake_search) == 3
+
+
+def test_thumbnails_with_pillow(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    from io import BytesIO
+    from app.utils.cover_cache import make_thumbnails
+
+    buffer = BytesIO()
+    Image.new('RGBA', (1200, 800), (255, 0, 0, 128)).save(buffer, 'PNG')
+    thumbnails = make_thumbnails(buffer.getvalue())
+    assert ORIGINAL not in thumbnails
+    with Image.open(BytesIO(thumbnails['small'])) as small:
+        assert small.size == (120, 80) and sniff_type(thumbnails['small']) == 'image/jpeg'
+    assert make_thumbnails(b'not an image') == {ORIGINAL: b'not an image'}
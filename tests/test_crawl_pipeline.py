@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from app import db
+from app.models import OpinionData, OpinionDetail
+from app.utils.crawl_pipeline import crawl
+from app.utils.scraper import scrape_baidu_generator
+from benchmarks.fake_server import FakeSearchServer
+
+
+@pytest.fixture
+def fake_search():
+    with FakeSearchServer(pages=1) as server:
+        yield server
+
+
+@pytest.mark.parametrize('parse_workers', [0, 1])
+def test_crawl_yields_every_job(fake_search, parse_workers):
+    jobs = [(i, f'{fake_search.url}/article/{i}', None) for i in range(6)]
+    jobs.append(('missing', fake_search.url + '/nowhere', None))
+    results = {key: (extracted, error) for key, extracted, error in
+               crawl(jobs, fetch_workers=3, parse_workers=parse_workers, queue_size=2)}
+    assert set(results) == {0, 1, 2, 3, 4, 5, 'missing'}
+    for key in range(6):
+        (title, content, _), error = results[key]
+        assert error is None and title and len(content) > 200
+    (title, content, _), error = results['missing']
+    assert (title, content) == ('', '') and '404' in error
+
+
+def test_crawl_fetches_concurrently(fake_search):
+    fake_search.latency = 0.2
+    jobs = [(i, f'{fake_search.url}/article/{i}', None) for i in range(8)]
+    started = time.perf_counter()
+    results = list(crawl(jobs, fetch_workers=8, parse_workers=0))
+    assert len(results) == 8
+    # One after another this takes 1.6s
+    assert time.perf_counter() - started < 1.0
+
+
+def test_search_links_resolved_concurrently(fake_search):
+    events = list(scrape_baidu_generator('舆情', search_url=fake_search.url + '/s', page_delay=(0, 0),
+                                         resolve_workers=4))
+    items = next(e['data'] for e in events if e['type'] == 'result')
+    assert len(items) == 10
+    assert all(i['original_url'].startswith(fake_search.url + '/article/') for i in items)
+
+
+def test_warehouse_deep_crawl_pipeline(app, db_client, fake_search):
+    items = [OpinionData(title=f'标题{i}', url=f'{fake_search.url}/article/{i}', source='新华网', keyword='舆情')
+             for i in range(5)]
+    items.append(OpinionData(title='失效', url=fake_search.url + '/nowhere', source='新华网', keyword='舆情'))
+    db.session.add_all(items)
+    db.session.commit()
+
+    res = db_client.post('/business/warehouse/deep-crawl', json={'ids': [i.id for i in items]}).get_json()
+    assert res['code'] == 0 and '成功 5 条' in res['msg']
+    assert OpinionDetail.query.count() == 5
+    assert OpinionData.query.filter_by(is_deep_crawled=True).count() == 5
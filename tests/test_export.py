@@ -0,0 +1,66 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+from app import db
+from app.models import OpinionData, OpinionDetail
+
+
+@pytest.fixture
+def seeded(app):
+    rows = [
+        OpinionData(keyword='新能源', title='新能源汽车销量', source='新华网', original_url='http://a/1',
+                    created_at=datetime(2025, 12, 1, 8, 0, 0)),
+        OpinionData(keyword='新能源', title='电池技术突破', source='人民网', original_url='http://a/2',
+                    created_at=datetime(2025, 12, 2, 9, 0, 0)),
+        OpinionData(keyword='教育', title='高考改革', source='新华网', original_url='http://a/3',
+                    created_at=datetime(2025, 12, 3, 10, 0, 0)),
+    ]
+    db.session.add_all(rows)
+    db.session.flush()
+    db.session.add(OpinionDetail(opinion_id=rows[0].id, title='详情标题', content='详情正文'))
+    db.session.commit()
+    return rows
+
+
+def test_export_csv(db_client, seeded):
+    rv = db_client.get('/business/warehouse/export?format=csv&source=新华网')
+    assert rv.status_code == 200
+    assert 'attachment' in rv.headers['Content-Disposition']
+    reader = list(csv.DictReader(io.StringIO(rv.data.decode('utf-8-sig'))))
+    assert [r['title'] for r in reader] == ['新能源汽车销量', '高考改革']
+    assert reader[0]['detail_content'] == '详情正文'
+    assert reader[1]['detail_content'] == ''
+
+
+def test_export_jsonl_gzip_date_filter(db_client, seeded):
+    rv = db_client.get('/business/warehouse/export?format=jsonl&compress=gzip'
+                       '&date_from=2025-12-02&date_to=2025-12-02')
+    assert rv.status_code == 200
+    lines = gzip.decompress(rv.data).decode('utf-8').splitlines()
+    assert [json.loads(line)['title'] for line in lines] == ['电池技术突破']
+
+
+def test_export_parquet(db_client, seeded):
+    pq = pytest.importorskip('pyarrow.parquet')
+    rv = db_client.get('/business/warehouse/export?format=parquet&keyword=新能源')
+    assert rv.status_code == 200
+    table = pq.read_table(io.BytesIO(rv.data))
+    assert table.column('title').to_pylist() == ['新能源汽车销量', '电池技术突破']
+
+
+def test_export_invalid_format(db_client, seeded):
+    rv = db_client.get('/business/warehouse/export?format=xlsx')
+    assert rv.get_json()['code'] == 400
+
+
+def test_export_cli(app, seeded, tmp_path):
+    output = tmp_path / 'out.jsonl.gz'
+    result = app.test_cli_runner().invoke(args=['export-data', '--format', 'jsonl', '--gzip',
+                                                '--batch-size', '1', '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    lines = gzip.decompress(output.read_bytes()).decode('utf-8').splitlines()
+    assert len(lines) == 3
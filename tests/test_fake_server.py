@@ -0,0 +1,139 @@
+import json
+import threading
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+from app.models import OpinionData
+from app.views.business.analysis import autosave_events
+from app.utils.scraper import deep_crawl_content, scrape_baidu_generator, scrape_sohu_generator
+from benchmarks.fake_server import FakeSearchServer
+from benchmarks.load_test import LoadTest, percentile
+
+
+@pytest.fixture
+def fake_search():
+    with FakeSearchServer(pages=2) as server:
+        yield server
+
+
+def _result(events):
+    return next(e['data'] for e in events if e['type'] == 'result')
+
+
+def test_scrapers_follow_configured_endpoints(fake_search):
+    events = list(scrape_baidu_generator('舆情', pages=3, search_url=fake_search.url + '/s', page_delay=(0, 0)))
+    items = _result(events)
+    # Two pages of results, then an empty page ends the crawl
+    assert len(items) == 20
+    assert all(i['original_url'].startswith(fake_search.url + '/article/') for i in items)
+
+    items = _result(scrape_sohu_generator('舆情', search_url=fake_search.url + '/web', page_delay=(0, 0)))
+    assert len(items) == 10
+    redirect = next(i for i in items if 'sogou.com/link' in i['url'])
+    title, content, _ = deep_crawl_content(redirect['original_url'])
+    assert title and len(content) > 200
+
+
+def test_items_stream_with_incremental_limit(fake_search):
+    events = list(scrape_baidu_generator('舆情', pages=3, limit=13, search_url=fake_search.url + '/s',
+                                         page_delay=(0, 0), stream_items=True))
+    types = [e['type'] for e in events]
+    assert types.count('item') == 13 and 'result' not in types
+    assert events[-1]['type'] == 'done' and events[-1]['count'] == 13
+    # The second page's progress event comes after the first page's items
+    assert types.index('item') < [i for i, t in enumerate(types) if t == 'progress'][1]
+    assert events[-1]['stats']['pages'] == 2
+
+    before = requests.get(fake_search.url + '/__stats').json().get('/link 302', 0)
+    events = list(scrape_baidu_generator('舆情', pages=3, limit=3, search_url=fake_search.url + '/s',
+                                         page_delay=(0, 0), resolve_workers=1, stream_items=True))
+    assert [e['type'] for e in events].count('item') == 3
+    # Links past the limit are never resolved
+    assert requests.get(fake_search.url + '/__stats').json()['/link 302'] - before < 10
+
+
+def test_analysis_view_streams_items(app, db_client, fake_search):
+    app.config.update(SCRAPER_SOHU_URL=fake_search.url + '/web', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+    response = db_client.post('/business/analysis', data={'keyword': '舆情', 'source': 'sohu', 'pages': 2,
+                                                          'stream': 'items'})
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [e['type'] for e in events].count('item') == 20
+    assert events[-1] == dict(events[-1], type='done', count=20)
+
+
+def test_analysis_view_autosaves_items(app, db_client, fake_search):
+    app.config.update(SCRAPER_BAIDU_URL=fake_search.url + '/s', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0,
+                      AUTOSAVE_BATCH_SIZE=4)
+    data = {'keyword': '舆情', 'pages': 2, 'stream': 'items', 'autosave': '1'}
+    events = [json.loads(line) for line in db_client.post('/business/analysis', data=data).data.decode().splitlines()]
+    saved = [e for e in events if e['type'] == 'saved']
+    # Batches of 4 within each page of 10, the rest when the page ends
+    assert [e['saved'] for e in saved] == [4, 8, 10, 14, 18, 20]
+    assert [e['type'] for e in events].count('item') == 20
+    assert events[-1]['type'] == 'done' and events[-1]['saved'] == {'saved': 20, 'duplicates': 0}
+    assert OpinionData.query.filter_by(keyword='舆情', content='').count() == 20
+
+    # The same results again are all duplicates; without stream=items they come back in one result event
+    data = {'keyword': '舆情', 'pages': 2, 'autosave': '1'}
+    events = [json.loads(line) for line in db_client.post('/business/analysis', data=data).data.decode().splitlines()]
+    assert 'item' not in [e['type'] for e in events]
+    assert len(_result(events)) == 20 and events[-1]['saved'] == {'saved': 0, 'duplicates': 20}
+    assert OpinionData.query.count() == 20
+
+
+def test_autosave_keeps_items_when_the_stream_is_closed(app, fake_search):
+    events = autosave_events(scrape_baidu_generator('舆情', pages=2, search_url=fake_search.url + '/s',
+                                                    page_delay=(0, 0), stream_items=True), '舆情', batch_size=50)
+    taken = 0
+    for event in events:
+        taken += event['type'] == 'item'
+        if taken == 3:
+            break
+    assert OpinionData.query.count() == 0
+    events.close()
+    assert OpinionData.query.count() == 3
+
+
+def test_fake_server_errors_and_throttling(fake_search):
+    fake_search.error_rate = 1.0
+    events = list(scrape_baidu_generator('舆情', search_url=fake_search.url + '/s', page_delay=(0, 0)))
+    assert any(e['type'] == 'error' for e in events)
+
+    fake_search.error_rate = 0.0
+    fake_search.max_rps = 2
+    fake_search._tokens = 2
+    statuses = [requests.get(fake_search.url + '/s').status_code for _ in range(4)]
+    assert statuses[:2] == [200, 200] and 429 in statuses
+    stats = requests.get(fake_search.url + '/__stats').json()
+    assert stats['/s 500'] == 1 and stats['/s 429'] >= 1
+
+
+def test_analysis_view_uses_scraper_config(app, db_client, fake_search):
+    app.config.update(SCRAPER_BAIDU_URL=fake_search.url + '/s', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+    response = db_client.post('/business/analysis', data={'keyword': '舆情', 'pages': 1})
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert len(_result(events)) == 10
+
+
+def test_load_test_scenarios(app, fake_search):
+    app.config.update(SCRAPER_BAIDU_URL=fake_search.url + '/s', SCRAPER_SOHU_URL=fake_search.url + '/web',
+                      SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        test = LoadTest(f'http://127.0.0.1:{server.server_port}', concurrency=2, requests_per_scenario=2, pages=1)
+        results = test.run(app, ('scrape', 'save'))
+    finally:
+        server.shutdown()
+    assert results['scrape']['errors'] == 0 and results['scrape']['first_line_p50_ms'] is not None
+    assert results['scrape']['first_item_p50_ms'] is not None
+    assert results['save']['errors'] == 0
+    assert OpinionData.query.count() == 20
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+    assert percentile([1, 2, 3, 4], 0.99) == 4
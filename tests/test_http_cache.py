@@ -0,0 +1,101 @@
+import gzip
+import json
+import zlib
+
+from app import db
+from app.models import OpinionData, ScrapingRule
+from app.models.ai_engine import AIEngine
+from benchmarks.fake_server import FakeSearchServer
+
+
+def _seed(n=30):
+    db.session.add_all([OpinionData(title=f'标题{i}', keyword='舆情', source='新华网', content='内容' * 20)
+                        for i in range(n)])
+    db.session.commit()
+
+
+def test_lists_answer_304_until_the_table_changes(app, db_client, max_queries):
+    _seed()
+    res = db_client.get('/business/warehouse/data?page=1&limit=10')
+    etag = res.headers['ETag']
+    assert etag.startswith('W/') and 'no-cache' in res.headers['Cache-Control']
+
+    # One aggregate per table, no page query
+    with max_queries(2):
+        res = db_client.get('/business/warehouse/data?page=1&limit=10', headers={'If-None-Match': etag})
+    assert res.status_code == 304 and res.data == b''
+    # Another page is another ETag
+    assert db_client.get('/business/warehouse/data?page=2&limit=10', headers={'If-None-Match': etag}).status_code == 200
+
+    item = db.session.get(OpinionData, 1)
+    item.sentiment_score = 0.5
+    db.session.commit()
+    res = db_client.get('/business/warehouse/data?page=1&limit=10', headers={'If-None-Match': etag})
+    assert res.status_code == 200 and res.headers['ETag'] != etag
+    etag = res.headers['ETag']
+
+    db.session.delete(db.session.get(OpinionData, 2))
+    db.session.commit()
+    assert db_client.get('/business/warehouse/data?page=1&limit=10',
+                         headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_rule_and_engine_lists_are_conditional(app, db_client):
+    db.session.add(ScrapingRule(site_name='新华网', title_xpath='//h1', content_xpath='//article'))
+    db.session.add(AIEngine(provider='OpenAI', api_url='http://127.0.0.1:1/v1', api_key='k', model_name='m'))
+    db.session.commit()
+    for url in ('/business/rules/data', '/business/ai_engines/list'):
+        etag = db_client.get(url).headers['ETag']
+        assert db_client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    db.session.add(ScrapingRule(site_name='人民网', title_xpath='//h1', content_xpath='//article'))
+    db.session.commit()
+    assert db_client.get('/business/rules/data', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_json_is_compressed_when_accepted(app, db_client):
+    _seed()
+    plain = db_client.get('/business/warehouse/data?limit=30')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    res = db_client.get('/business/warehouse/data?limit=30', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(res.data)) == plain.get_json()
+    assert len(res.data) < len(plain.data) / 3
+    # Small responses are sent as they are
+    res = db_client.get('/business/bursts', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in res.headers
+
+
+def test_ndjson_stream_is_compressed_event_by_event(app, db_client):
+    with FakeSearchServer(pages=2) as server:
+        app.config.update(SCRAPER_BAIDU_URL=server.url + '/s', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+        res = db_client.post('/business/analysis', data={'keyword': '舆情', 'pages': 2, 'stream': 'items'},
+                             headers={'Accept-Encoding': 'gzip'}, buffered=False)
+        assert res.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in res.headers
+        decompressor = zlib.decompressobj(31)
+        chunks = iter(res.response)
+        # The first event can be decoded before the stream ends
+        first = decompressor.decompress(next(chunks)).decode()
+        assert json.loads(first)['type'] == 'progress'
+        rest = first + b''.join(decompressor.decompress(c) for c in chunks).decode()
+        res.close()
+    events = [json.loads(line) for line in rest.splitlines()]
+    assert events[-1]['type'] == 'done' and [e['type'] for e in events].count('item') == 20
+
+
+def test_sentiment_backfill_changes_the_etag(app, db_client):
+    from app.utils.sentiment import backfill_sentiment
+
+    _seed(5)
+    url = '/business/warehouse/data?page=1&limit=10&sentiment=neutral'
+    etag = db_client.get(url).headers['ETag']
+    assert db_client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # Scores are written with updated_at kept; the explicit table version still moves
+    before = [(o.id, o.updated_at) for o in OpinionData.query.order_by(OpinionData.id)]
+    assert backfill_sentiment(workers=0) == 5
+    db.session.expire_all()
+    assert [(o.id, o.updated_at) for o in OpinionData.query.order_by(OpinionData.id)] == before
+    res = db_client.get(url, headers={'If-None-Match': etag})
+    assert res.status_code == 200 and res.headers['ETag'] != etag
+    assert db_client.get(url, headers={'If-None-Match': res.headers['ETag']}).status_code == 304
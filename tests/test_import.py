@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import io
+import json
+
+from app import db
+from app.models import IndexDocument, OpinionData
+from app.utils.importer import insert_items, normalize_url
+from app.utils.text import item_text
+
+
+def _line(**fields):
+    item = {'title': '标题', 'source': '新华网', 'cover': 'http://img/1.png', 'summary': '摘要'}
+    item.update(fields)
+    return json.dumps(item, ensure_ascii=False)
+
+
+def _events(rv):
+    return [json.loads(line) for line in rv.data.decode('utf-8').splitlines()]
+
+
+def test_normalize_url():
+    assert normalize_url(' HTTP://News.Example.com/a?id=1&utm_source=x#top ') == 'http://news.example.com/a?id=1'
+
+
+def test_import_ndjson_dedups_and_rejects(app, db_client):
+    db.session.add(OpinionData(title='已有', original_url='http://example.com/1'))
+    db.session.commit()
+
+    body = '\n'.join([
+        _line(original_url='http://example.com/1'),          # already stored
+        _line(original_url='http://example.com/2'),
+        _line(original_url='http://EXAMPLE.com/2#comments'),  # same as previous after normalization
+        _line(original_url='http://example.com/3', keyword='kw'),
+        '{not json',
+        json.dumps({'title': '只有标题'}),                      # too few valid fields
+    ])
+    rv = db_client.post('/business/warehouse/import?keyword=default', data=body.encode('utf-8'),
+                        content_type='application/x-ndjson')
+    result = _events(rv)[-1]
+
+    assert result['type'] == 'result'
+    assert result['inserted'] == 2
+    assert result['duplicates'] == 2
+    assert result['rejected'] == 2
+    assert [r['line'] for r in result['rejects']] == [5, 6]
+    keywords = {o.original_url: o.keyword for o in OpinionData.query.all()}
+    assert keywords['http://example.com/2'] == 'default'
+    assert keywords['http://example.com/3'] == 'kw'
+
+
+def test_import_csv_upload_gzip(app, db_client):
+    csv_text = 'title,original_url,source,cover_url,content\n' \
+               '标题一,http://example.com/a,人民网,http://img/a.png,正文\n' \
+               '标题二,http://example.com/b,人民网,http://img/b.png,正文\n'
+    data = {'file': (io.BytesIO(gzip.compress(csv_text.encode('utf-8'))), 'archive.csv.gz')}
+    rv = db_client.post('/business/warehouse/import', data=data, content_type='multipart/form-data')
+    assert rv.get_json()['data']['inserted'] == 2
+    assert OpinionData.query.count() == 2
+
+
+def test_import_cli(app, tmp_path):
+    path = tmp_path / 'archive.ndjson'
+    path.write_text('\n'.join(_line(original_url=f'http://example.com/{i}') for i in range(25)),
+                    encoding='utf-8')
+    result = app.test_cli_runner().invoke(args=['import-data', str(path), '--chunk-size', '10'])
+    assert result.exit_code == 0, result.output
+    assert OpinionData.query.count() == 25
+
+
+def test_insert_items_without_returning(app, monkeypatch):
+    # MySQL cannot RETURNING from an executemany; ids are read back instead
+    monkeypatch.setattr(db.session.get_bind().dialect, 'insert_executemany_returning_sort_by_parameter_order', False)
+    items = [{'title': '城市暴雨', 'original_url': 'http://example.com/a'},
+             {'title': '高考招生'},
+             {'title': '芯片出口', 'original_url': 'http://example.com/c'}]
+    assert insert_items(items) == 3
+    db.session.commit()
+    # Each id got the index entry of its own row
+    expected = {o.id: hashlib.sha1(item_text(o.title, o.content).encode('utf-8')).hexdigest()
+                for o in OpinionData.query}
+    assert {d.opinion_id: d.content_hash for d in IndexDocument.query} == expected
+    assert len(expected) == 3
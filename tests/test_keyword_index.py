@@ -0,0 +1,85 @@
+from app import db
+from app.models import IndexTerm, OpinionData
+from app.utils import keyword_index
+from app.utils.keyword_index import index_documents, rebuild_index, related_articles, top_keywords
+from app.utils.text import tokenize
+
+
+def _add(title, content):
+    item = OpinionData(title=title, content=content)
+    db.session.add(item)
+    db.session.flush()
+    return item.id
+
+
+def test_tokenize_fallback_bigrams():
+    tokens = tokenize('新能源汽车的销量 EV market')
+    assert '汽车' in tokens
+    assert 'ev' in tokens and 'market' in tokens
+    assert not any('的' in t for t in tokens)
+
+
+def test_keywords_and_related(app, db_client):
+    a = _add('新能源汽车销量大涨', '新能源汽车 电池 续航 新能源汽车 补贴')
+    b = _add('新能源汽车电池技术', '电池 续航 快充 新能源汽车')
+    c = _add('高考改革方案公布', '高考 招生 改革 教育部')
+    index_documents([(a, '新能源汽车销量大涨 新能源汽车 电池 续航 新能源汽车 补贴'),
+                     (b, '新能源汽车电池技术 电池 续航 快充 新能源汽车'),
+                     (c, '高考改革方案公布 高考 招生 改革 教育部')])
+    db.session.commit()
+
+    terms = [k['term'] for k in top_keywords(c, k=5)]
+    assert '高考' in terms
+
+    related = related_articles(a)
+    assert [r['id'] for r in related] == [b]
+
+    rv = db_client.get(f'/business/warehouse/related/{b}')
+    assert rv.get_json()['data'][0]['id'] == a
+    rv = db_client.get(f'/business/warehouse/preview/{a}')
+    assert '相关文章' in rv.data.decode('utf-8')
+
+
+def test_incremental_updates_maintain_df(app, db_client):
+    db_client.post('/business/save_data', json={'items': [
+        {'title': '城市暴雨内涝', 'original_url': 'http://example.com/1'},
+        {'title': '暴雨预警升级', 'original_url': 'http://example.com/2'},
+    ]})
+    term = IndexTerm.query.filter_by(term='暴雨').one()
+    assert term.df == 2
+
+    ids = [o.id for o in OpinionData.query.order_by(OpinionData.id)]
+    db_client.post('/business/warehouse/update', json={'id': ids[1], 'title': '台风登陆'})
+    db.session.expire_all()
+    assert IndexTerm.query.filter_by(term='暴雨').one().df == 1
+
+    db_client.post('/business/warehouse/delete', json={'ids': [ids[0]]})
+    db.session.expire_all()
+    assert IndexTerm.query.filter_by(term='暴雨').one().df == 0
+    assert top_keywords(ids[0]) == []
+
+
+def test_rebuild_index(app):
+    for i in range(5):
+        _add(f'科技创新{i}', '人工智能 芯片')
+    db.session.commit()
+    assert rebuild_index(batch_size=2) == 5
+    assert IndexTerm.query.filter_by(term='芯片').one().df == 5
+
+
+def test_term_ids_tolerates_terms_created_concurrently(app, monkeypatch):
+    db.session.add(IndexTerm(term='芯片', df=3))
+    db.session.flush()
+    # The first lookup misses '芯片', as if another indexer created it right after
+    lookups = []
+    chunks = keyword_index._chunks
+
+    def late_chunks(items):
+        lookups.append(items)
+        return chunks(items) if len(lookups) > 1 else []
+
+    monkeypatch.setattr(keyword_index, '_chunks', late_chunks)
+    ids = keyword_index._term_ids(['芯片', '光刻'])
+    existing = IndexTerm.query.filter_by(term='芯片').one()
+    assert ids['芯片'] == existing.id and existing.df == 3
+    assert ids['光刻'] == IndexTerm.query.filter_by(term='光刻').one().id
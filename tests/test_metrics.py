@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from app.utils.metrics import Counter, Histogram
+from app.utils.scraper import FETCH_SECONDS, ITEMS, scrape_baidu_generator
+from benchmarks.fake_server import FakeSearchServer
+
+
+@pytest.fixture
+def fake_search():
+    with FakeSearchServer(pages=2) as server:
+        yield server
+
+
+def test_text_format():
+    counter = Counter('test_things_total', 'Things', ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='a"b')
+    histogram = Histogram('test_wait_seconds', 'Waits', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    text = counter.render() + '\n' + histogram.render()
+    assert '# TYPE test_things_total counter' in text
+    assert 'test_things_total{kind="a"} 1' in text
+    assert 'test_things_total{kind="a\\"b"} 2' in text
+    assert 'test_wait_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_wait_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_wait_seconds_bucket{le="+Inf"} 3' in text
+    assert 'test_wait_seconds_sum 5.55' in text and 'test_wait_seconds_count 3' in text
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+
+
+def test_progress_events_carry_stage_stats(fake_search):
+    host = fake_search.url.split('//')[1]
+    fetches = FETCH_SECONDS.count(host=host, kind='search')
+    kept = ITEMS.value(source='baidu', outcome='kept')
+
+    events = list(scrape_baidu_generator('舆情', pages=2, search_url=fake_search.url + '/s', page_delay=(0.01, 0.01)))
+    progress = [e for e in events if e['type'] == 'progress']
+    assert progress[0]['stats']['pages'] == 0
+    assert progress[1]['stats']['pages'] == 1 and progress[1]['stats']['kept'] == 10
+    stats = events[-1]['stats']
+    assert stats['pages'] == 2 and stats['kept'] == 20 and stats['links'] == 20
+    assert stats['bytes'] > 0
+    assert stats['seconds']['sleep'] == pytest.approx(0.01, abs=0.001)
+    assert all(stats['seconds'][stage] > 0 for stage in ('fetch', 'parse', 'resolve'))
+
+    assert FETCH_SECONDS.count(host=host, kind='search') == fetches + 2
+    assert ITEMS.value(source='baidu', outcome='kept') == kept + 20
+
+
+def test_metrics_endpoint(app, db_client, fake_search):
+    app.config.update(SCRAPER_BAIDU_URL=fake_search.url + '/s', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+    lines = db_client.post('/business/analysis', data={'keyword': '舆情', 'pages': 1}).data.decode().splitlines()
+    assert 'stats' in json.loads(lines[-1])
+
+    res = db_client.get('/metrics')
+    assert res.status_code == 200 and res.content_type.startswith('text/plain; version=0.0.4')
+    text = res.data.decode()
+    assert 'http_request_duration_seconds_count{endpoint="business.analysis",method="POST",status="200"}' in text
+    assert 'scraper_stage_seconds_count{source="baidu",stage="parse"}' in text
+    assert 'scraper_items_total{source="baidu",outcome="kept"}' in text
+
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert db_client.get('/metrics').status_code == 401
+    assert db_client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
@@ -0,0 +1,106 @@
+import gzip
+import time
+
+from app import db
+from app.models import OpinionData, OpinionDetail, ScrapingRule
+from app.utils.page_archive import PageArchive, get_archive
+from app.utils.reextract import reextract
+from app.utils.tasks import get_task
+from benchmarks.fake_server import FakeSearchServer, article_page
+
+PAGE = ('<html><head><title>页面标题</title></head><body><h1>新标题</h1>'
+        '<div id="main">' + '<p>这是正文段落，用来测试重新抽取。</p>' * 10 + '</div></body></html>')
+
+
+def test_archive_roundtrip_and_rollover(tmp_path):
+    archive = PageArchive(str(tmp_path / 'a'), segment_bytes=300)
+    first = archive.append('http://a.example/1', '<p>一</p>', fetched_at=1700000000)
+    archive.append('http://a.example/2', '<p>二</p>')
+    archive.append('http://a.example/1', '<p>一（更新）</p>', final_url='http://a.example/1?x')
+
+    page = archive.get('http://a.example/1')
+    assert page.html == '<p>一（更新）</p>' and page.final_url == 'http://a.example/1?x'
+    assert archive.read(first).html == '<p>一</p>'
+    assert archive.get('http://a.example/none') is None
+    assert archive.stats()['records'] == 3 and archive.stats()['urls'] == 2
+    # Small segments roll over, and every segment is a plain .warc.gz
+    assert archive.stats()['segments'] > 1
+    data = gzip.decompress((tmp_path / 'a' / 'segment-000001.warc.gz').read_bytes())
+    assert data.startswith(b'WARC/1.1\r\nWARC-Type: resource')
+
+    # Another reader (e.g. another worker process) sees later appends
+    other = PageArchive(str(tmp_path / 'a'))
+    assert other.get('http://a.example/2').html == '<p>二</p>'
+    archive.append('http://a.example/3', '<p>三</p>')
+    assert other.get('http://a.example/3').html == '<p>三</p>'
+
+
+def test_deep_crawl_archives_fetched_pages(app, db_client):
+    with FakeSearchServer() as server:
+        url = f'{server.url}/link?url=x1'
+        item = OpinionData(keyword='k', title='t', url=url, original_url=url, source='新华网')
+        db.session.add(item)
+        db.session.commit()
+        res = db_client.post('/business/warehouse/deep-crawl', json={'ids': [item.id]}).get_json()
+        assert res['code'] == 0
+
+        res = db_client.post('/business/deep_crawl', data={'url': f'{server.url}/article/x2'}).get_json()
+        assert res['code'] == 0
+
+    archive = get_archive(app)
+    page = archive.get(url)
+    assert page.html == article_page('x1') and page.final_url.endswith('/article/x1')
+    assert archive.get(f'{server.url}/article/x2') is not None
+
+
+def _seed(archive, n=3):
+    rule = ScrapingRule(site_name='新华网', title_xpath='//h2', content_xpath="//div[@id='gone']")
+    db.session.add(rule)
+    items = [OpinionData(keyword='k', title=f't{i}', url=f'http://a.example/{i}', original_url=f'http://a.example/{i}',
+                         source='新华网 2025-12-01') for i in range(n)]
+    items.append(OpinionData(keyword='k', title='other', url='http://b.example/1', source='人民网'))
+    db.session.add_all(items)
+    db.session.commit()
+    for item in items[:n]:
+        archive.append(item.url, PAGE)
+    return rule, items
+
+
+def test_reextract_applies_fixed_rule_offline(app):
+    archive = get_archive(app)
+    rule, items = _seed(archive)
+
+    stats = reextract(archive, rule_id=rule.id, workers=0)
+    assert stats['scanned'] == 3 and stats['archived'] == 3 and stats['updated'] == 3
+    # The stale rule fell back to the heuristics
+    assert stats['stale'] == 3
+    detail = OpinionDetail.query.filter_by(opinion_id=items[0].id).first()
+    assert detail.title == '页面标题' and '重新抽取' in detail.content
+    assert db.session.get(OpinionData, items[0].id).is_deep_crawled
+
+    rule.title_xpath = '//h1'
+    rule.content_xpath = "//div[@id='main']"
+    db.session.commit()
+    stats = reextract(archive, rule_id=rule.id, workers=0, dry_run=True)
+    assert stats['updated'] == 3 and stats['stale'] == 0
+    assert OpinionDetail.query.filter_by(opinion_id=items[0].id).first().title == '页面标题'
+
+    stats = reextract(archive, rule_id=rule.id, workers=1)
+    assert stats['updated'] == 3
+    db.session.expire_all()
+    assert OpinionDetail.query.filter_by(opinion_id=items[0].id).first().title == '新标题'
+    assert reextract(archive, workers=0)['unchanged'] == 3
+
+
+def test_reextract_endpoint_runs_in_background(app, db_client):
+    rule, items = _seed(get_archive(app), n=2)
+    res = db_client.post('/business/rules/reextract', json={'id': rule.id}).get_json()
+    assert res['code'] == 0
+    for _ in range(100):
+        task = get_task(res['data']['task_id'])
+        if task['status'] in ('success', 'failed'):
+            break
+        time.sleep(0.1)
+    assert task['status'] == 'success' and task['result']['updated'] == 2
+
+    assert db_client.post('/business/rules/reextract', json={'id': 999}).get_json()['code'] == 404
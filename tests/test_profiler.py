@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from app import db
+from app.models import OpinionData
+from app.models.user import Role, User
+from app.utils.profiler import normalize_sql
+
+
+@pytest.fixture
+def admin_client(app, db_client):
+    role = Role(name='Admin')
+    user = User(username='admin', email='admin@example.com', role=role)
+    user.password = 'secret'
+    db.session.add_all([role, user])
+    db.session.commit()
+    db_client.post('/auth/login', data={'username': 'admin', 'password': 'secret'})
+    return db_client
+
+
+def _seed(n=3):
+    db.session.add_all([OpinionData(title=f'标题{i}', keyword='舆情', source='新华网') for i in range(n)])
+    db.session.commit()
+
+
+def test_only_admins_can_ask_for_a_profile(app, db_client):
+    _seed()
+    res = db_client.get('/business/warehouse/data', headers={'X-Profile': '1'})
+    assert res.status_code == 200 and 'X-Profile-Id' not in res.headers
+    assert not os.path.exists(app.config['PROFILER_DIR'])
+
+
+@pytest.mark.parametrize('mode, raw', [('1', '.folded'), ('cprofile', '.prof')])
+def test_profile_is_stored_and_browsable(app, admin_client, mode, raw):
+    _seed()
+    res = admin_client.get(f'/business/warehouse/data?_profile={mode}')
+    assert res.status_code == 200
+    profile_id = res.headers['X-Profile-Id']
+    assert os.path.exists(os.path.join(app.config['PROFILER_DIR'], profile_id + raw))
+
+    listing = admin_client.get('/admin/profiles?endpoint=business.warehouse_data').data.decode()
+    assert profile_id in listing
+    detail = admin_client.get(f'/admin/profiles/{profile_id}').data.decode()
+    assert 'FROM opinion_data' in detail
+    # A fast request may finish before the first stack sample
+    assert admin_client.get(f'/admin/profiles/{profile_id}/download').status_code == 200
+    assert admin_client.get('/admin/profiles/../../etc/passwd').status_code == 404
+
+
+def test_sample_rate_and_retention(app, db_client):
+    app.config.update(PROFILER_SAMPLE_RATE=1.0, PROFILER_KEEP=2)
+    for _ in range(3):
+        assert 'X-Profile-Id' in db_client.get('/business/warehouse/data').headers
+    assert len([n for n in os.listdir(app.config['PROFILER_DIR']) if n.endswith('.json')]) == 2
+
+
+def test_failed_saves_are_logged(app, db_client, tmp_path, caplog):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    app.config.update(PROFILER_SAMPLE_RATE=1.0, PROFILER_DIR=str(blocker / 'profiles'))
+    res = db_client.get('/business/warehouse/data')
+    assert res.status_code == 200 and 'X-Profile-Id' in res.headers
+    assert f"Error saving profile {res.headers['X-Profile-Id']}" in caplog.text
+
+
+def test_normalize_sql():
+    assert normalize_sql('SELECT *\n  FROM t WHERE id IN (?, ?, ?)') == 'SELECT * FROM t WHERE id IN (?, ...)'
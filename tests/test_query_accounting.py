@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+
+from app import db
+from app.models import OpinionData, OpinionDetail, ScrapingRule
+from app.models.user import Role, User
+from app.utils.query_accounting import track
+from benchmarks.fake_server import FakeSearchServer
+
+
+@pytest.fixture
+def admin_client(app, db_client):
+    roles = [Role(name='Admin')] + [Role(name=f'Role{i}') for i in range(4)]
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', role=roles[i % 5]) for i in range(10)]
+    users[0].password = 'secret'
+    db.session.add_all(roles + users)
+    db.session.commit()
+    db_client.post('/auth/login', data={'username': 'user0', 'password': 'secret'})
+    return db_client
+
+
+def _items(n, base='https://news.example.cn'):
+    return [{'title': f'标题{i}', 'url': f'{base}/article/{i}', 'original_url': f'{base}/article/{i}',
+             'source': '新华网', 'keyword': '舆情', 'cover': ''} for i in range(n)]
+
+
+def test_repeated_shapes_are_flagged(app):
+    with track(repeat_threshold=3) as log:
+        for i in range(5):
+            db.session.get(OpinionData, i + 1)
+        OpinionData.query.filter(OpinionData.id.in_([1, 2, 3])).all()
+        OpinionData.query.filter(OpinionData.id.in_([1, 2])).all()
+    assert log.count == 7
+    shape, runs = log.repeated(3)[0]
+    assert runs == 5 and 'WHERE opinion_data.id = ?' in shape
+    # Expanded IN lists of any length are one shape
+    assert any(n == 2 and 'IN (?, ...)' in s for s, n in log.shapes.items())
+    assert 'test_query_accounting.py' in log.offenders[shape]
+    assert '<frozen' not in log.offenders[shape]
+
+
+def test_request_budget_is_logged(app, db_client, caplog):
+    app.config.update(QUERY_BUDGET=1)
+    with caplog.at_level(logging.WARNING):
+        db_client.get('/business/warehouse/data')
+    assert any('SQL statements (budget 1)' in r.getMessage() for r in caplog.records)
+
+
+def test_save_data_checks_duplicates_once(db_client, max_queries):
+    db_client.post('/business/save_data', json={'items': _items(2)})
+    # One INSERT per new item (the ORM's flush on SQLite), a fixed number of other statements
+    with max_queries(28 + 12) as log:
+        res = db_client.post('/business/save_data', json={'items': _items(30)}).get_json()
+    assert res['msg'] == '成功保存 28 条数据'
+    assert log.repeated(3) == []
+    assert OpinionData.query.count() == 30
+
+
+def test_deep_crawl_query_count_is_flat(app, db_client, max_queries):
+    db.session.add(ScrapingRule(site_name='新华网', title_xpath='//h1', content_xpath='//article'))
+    with FakeSearchServer() as server:
+        items = [OpinionData(title=f'标题{i}', url=f'{server.url}/article/{i}', source='新华网 2024-05-01',
+                             keyword='舆情') for i in range(12)]
+        db.session.add_all(items)
+        db.session.commit()
+        ids = [i.id for i in items]
+        # One INSERT per new detail, no per-item rule or detail lookups
+        with max_queries(12 + 16) as log:
+            res = db_client.post('/business/warehouse/deep-crawl', json={'ids': ids}).get_json()
+    assert '成功 12 条' in res['msg']
+    assert log.repeated(3) == []
+    assert OpinionDetail.query.count() == 12
+
+
+def test_user_list_query_count(admin_client, max_queries):
+    with max_queries(6) as log:
+        res = admin_client.get('/admin/users')
+    assert res.status_code == 200 and b'user9' in res.data
+    assert log.repeated(3) == []
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import OpinionData, OpinionRollup
+from app.utils.rollups import RollupDelta, rebuild_rollups
+from app.utils.sentiment import backfill_sentiment
+
+
+def _snapshot():
+    rows = db.session.execute(select(
+        OpinionRollup.granularity, OpinionRollup.bucket, OpinionRollup.keyword, OpinionRollup.source,
+        OpinionRollup.item_count, OpinionRollup.deep_count, OpinionRollup.sentiment_sum,
+        OpinionRollup.sentiment_count)).all()
+    return {r[:4]: (r[4], r[5], round(r[6], 6), r[7]) for r in rows if r[4] or r[7]}
+
+
+def test_incremental_rollups_match_rebuild(app, db_client):
+    items = [{'title': f'经济增长 成功 {i}', 'keyword': '经济', 'source': '新华网',
+              'original_url': f'http://example.com/a{i}'} for i in range(4)]
+    items += [{'title': f'事故 伤亡 {i}', 'keyword': '安全', 'source': '人民网',
+               'original_url': f'http://example.com/b{i}'} for i in range(3)]
+    db_client.post('/business/save_data', json={'items': items})
+
+    body = '{"title": "导入 支持", "url": "http://example.com/c1", "source": "新华网"}\n'
+    db_client.post('/business/warehouse/import?keyword=经济', data=body.encode('utf-8'),
+                   content_type='application/x-ndjson').get_data()
+
+    ids = [i for (i,) in db.session.execute(select(OpinionData.id).order_by(OpinionData.id))]
+    db_client.post('/business/warehouse/update', json={'id': ids[0], 'title': '暴跌 亏损', 'source': '财经网'})
+    item = db.session.get(OpinionData, ids[1])
+    item.is_deep_crawled = True
+    db.session.commit()
+    db_client.post('/business/warehouse/delete', json={'ids': ids[-2:]})
+    db.session.delete(db.session.get(OpinionData, ids[2]))
+    db.session.commit()
+    backfill_sentiment(only_missing=False, workers=0)
+    db.session.expire_all()
+
+    trend = db_client.get('/dashboard/api/trend?granularity=hour&keyword=经济').get_json()
+    assert trend['code'] == 0
+    assert sum(b['count'] for b in trend['data']) == 3
+    assert sum(b['deep_count'] for b in trend['data']) == 1
+    assert len(trend['data']) == 30
+
+    by_source = db_client.get('/dashboard/api/breakdown?by=source').get_json()['data']
+    assert {row['name']: row['count'] for row in by_source} == {'新华网': 2, '人民网': 2, '财经网': 1}
+    negative = next(row for row in by_source if row['name'] == '财经网')
+    assert negative['sentiment_avg'] < 0
+
+    incremental = _snapshot()
+    rebuild_rollups()
+    assert incremental == _snapshot()
+
+
+def test_rollup_sentiment_sums_follow_updates(app, db_client):
+    db_client.post('/business/save_data', json={'items': [
+        {'title': '成功 满意', 'keyword': 'k', 'source': 's', 'original_url': 'http://example.com/1'},
+        {'title': '普通 消息', 'keyword': 'k', 'source': 's', 'original_url': 'http://example.com/2'},
+    ]})
+    item_id = db.session.scalar(select(OpinionData.id).order_by(OpinionData.id))
+    db_client.post('/business/warehouse/update', json={'id': item_id, 'title': '失败 愤怒'})
+    incremental = _snapshot()
+    rebuild_rollups()
+    assert incremental == _snapshot()
+
+
+def test_trend_rejects_unknown_granularity(app, db_client):
+    rv = db_client.get('/dashboard/api/trend?granularity=week').get_json()
+    assert rv['code'] == 400
+
+
+def test_trend_rejects_ranges_with_too_many_buckets(app, db_client):
+    rv = db_client.get('/dashboard/api/trend?granularity=hour&date_from=2000-01-01').get_json()
+    assert rv['code'] == 400
+    rv = db_client.get('/dashboard/api/trend?granularity=day&date_from=2000-01-01&date_to=2000-12-31').get_json()
+    assert rv['code'] == 0
+    assert len(rv['data']) == 366
+
+
+def test_trend_rejects_invalid_dates(app, db_client):
+    rv = db_client.get('/dashboard/api/trend?date_from=yesterday').get_json()
+    assert rv['code'] == 400
+
+
+def test_delta_adds_to_rows_written_by_another_writer(app):
+    created_at = datetime(2024, 5, 1, 10, 30)
+    first, second = RollupDelta(), RollupDelta()
+    first.add('经济', '新华网', created_at, True, 0.5)
+    second.add('经济', '新华网', created_at, False, None)
+    second.add('经济', '新华网', created_at, False, -0.25)
+    first.apply(db.session.connection())
+    second.apply(db.session.connection())
+
+    assert db.session.scalar(select(func.count()).select_from(OpinionRollup)) == 2
+    assert _snapshot()[('day', datetime(2024, 5, 1), '经济', '新华网')] == (3, 1, 0.25, 2)
+    assert _snapshot()[('hour', datetime(2024, 5, 1, 10), '经济', '新华网')] == (3, 1, 0.25, 2)
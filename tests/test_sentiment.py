@@ -0,0 +1,58 @@
+import numpy as np
+
+from app import db
+from app.models import OpinionData, OpinionDetail
+from app.utils.sentiment import SentimentScorer, backfill_sentiment
+
+
+def test_negation_and_degree():
+    scorer = SentimentScorer()
+    assert scorer.score('服务很好') > scorer.score('服务好') > 0
+    assert scorer.score('服务不好') < 0
+    # Modifiers do not leak across clause boundaries
+    assert scorer.score('不，服务好') == scorer.score('服务好')
+    assert scorer.score('工厂发生爆炸事故') < 0
+    assert scorer.score('今天天气') == 0
+
+
+def test_score_batch_matches_single():
+    scorer = SentimentScorer()
+    texts = ['经济稳定增长', '', '严重污染问题引发不满', '没有问题']
+    batch = scorer.score_batch(texts)
+    assert np.allclose(batch, [scorer.score(t) for t in texts])
+    assert batch[1] == 0
+    assert batch[3] > 0
+
+
+def test_backfill_and_warehouse_filter(app, db_client):
+    items = [OpinionData(title='经济稳定增长'), OpinionData(title='工厂发生事故'), OpinionData(title='天气预报')]
+    db.session.add_all(items)
+    db.session.flush()
+    db.session.add(OpinionDetail(opinion_id=items[2].id, content='各方满意，非常成功'))
+    db.session.commit()
+
+    assert backfill_sentiment(batch_size=2, workers=0) == 3
+    assert backfill_sentiment(batch_size=2, workers=0) == 0
+
+    rv = db_client.get('/business/warehouse/data?sentiment=negative')
+    assert [d['title'] for d in rv.get_json()['data']] == ['工厂发生事故']
+
+    rv = db_client.get('/business/warehouse/data?field=sentiment_score&order=desc')
+    scores = [d['sentiment_score'] for d in rv.get_json()['data']]
+    assert scores == sorted(scores, reverse=True)
+    assert rv.get_json()['data'][0]['title'] == '天气预报'
+
+
+def test_save_data_scores_new_items(app, db_client):
+    db_client.post('/business/save_data', json={'items': [
+        {'title': '市民纷纷点赞', 'original_url': 'http://example.com/1'},
+    ]})
+    assert OpinionData.query.one().sentiment_score > 0
+
+
+def test_backfill_cli_process_pool(app):
+    db.session.add_all([OpinionData(title=f'问题{i}') for i in range(5)])
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['sentiment-backfill', '--workers', '2', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert OpinionData.query.filter(OpinionData.sentiment_score < 0).count() == 5
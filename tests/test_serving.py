@@ -0,0 +1,70 @@
+import json
+import threading
+
+import pytest
+
+from app.models import OpinionData
+from app.utils.serving import DRAINED_EVENT, REQUESTS_IN_FLIGHT, Serving, get_serving, until_drained
+from benchmarks.fake_server import FakeSearchServer
+
+
+def _events(closed):
+    try:
+        for i in range(10):
+            yield {'type': 'progress', 'n': i}
+    finally:
+        closed.append(True)
+
+
+def test_until_drained_passes_events_until_the_drain_period_ends(app):
+    closed = []
+    events = until_drained(_events(closed), app)
+    assert [e['n'] for e in events] == list(range(10)) and closed
+
+    closed = []
+    events = until_drained(_events(closed), app)
+    assert next(events)['n'] == 0
+    get_serving(app).begin_drain(0)
+    # Closed before the final event, so a scrape saves its results first
+    assert next(events) == DRAINED_EVENT and closed
+    assert list(events) == []
+
+
+def test_drain_period_and_wait_idle():
+    serving = Serving(drain_seconds=0.05)
+    serving.enter()
+    serving.begin_drain()
+    assert serving.draining and not serving.stop.is_set()
+    assert serving.stop.wait(2)
+    assert serving.wait_idle(0.01) is False
+    threading.Timer(0.05, serving.exit).start()
+    assert serving.wait_idle(2) and serving.active == 0
+
+
+def test_streams_count_in_flight_until_closed(app, db_client):
+    serving = get_serving(app)
+    before = REQUESTS_IN_FLIGHT.value()
+    response = db_client.get('/business/warehouse/export?format=jsonl', buffered=False)
+    assert response.status_code == 200 and response.is_streamed
+    assert serving.active == 1 and REQUESTS_IN_FLIGHT.value() == before + 1
+    response.get_data()
+    response.close()
+    assert serving.active == 0 and REQUESTS_IN_FLIGHT.value() == before
+
+
+@pytest.fixture
+def fake_search():
+    with FakeSearchServer(pages=2) as server:
+        yield server
+
+
+def test_analysis_stream_is_cut_short_after_the_drain_period(app, db_client, fake_search):
+    app.config.update(SCRAPER_BAIDU_URL=fake_search.url + '/s', SCRAPER_PAGE_DELAY_MIN=0, SCRAPER_PAGE_DELAY_MAX=0)
+    get_serving(app).begin_drain(0)
+    data = {'keyword': '舆情', 'pages': 2, 'stream': 'items', 'autosave': '1'}
+    events = [json.loads(line) for line in db_client.post('/business/analysis', data=data).data.decode().splitlines()]
+    assert events[-1] == DRAINED_EVENT
+    assert 'done' not in [e['type'] for e in events]
+    # What was streamed before the cut is stored
+    streamed = [e for e in events if e['type'] == 'item']
+    assert OpinionData.query.count() == len(streamed) < 20
@@ -0,0 +1,38 @@
+import os
+
+from app.utils.import_report import heavy_loaded, parse_importtime, run_importtime, total_us
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 | _io
+import time:       300 |        500 |   requests.adapters
+import time:       900 |       1400 | requests
+import time:        50 |         50 | json
+Traceback (most recent call last):
+"""
+
+
+def test_parse_importtime():
+    timings = parse_importtime(SAMPLE)
+    assert [(t.module, t.depth) for t in timings] == [('_io', 0), ('requests.adapters', 1), ('requests', 0),
+                                                     ('json', 0)]
+    assert timings[1].self_us == 300 and timings[1].cumulative_us == 500
+    assert total_us(timings) == 120 + 1400 + 50
+    assert heavy_loaded(timings) == ['requests']
+
+
+def test_create_app_does_not_load_heavy_modules(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}", STATIC_BUILD_DIR='')
+    timings = run_importtime(env=env)
+    modules = {t.module for t in timings}
+    assert 'app.views.business.analysis' in modules
+    # Scraping, analysis and migrations are loaded on first use
+    assert heavy_loaded(timings) == []
+    assert 'app.utils.scraper' not in modules and 'app.utils.clustering' not in modules
+
+
+def test_import_report_command(app):
+    result = app.test_cli_runner().invoke(args=['import-report', '--top', '5',
+                                                '--statement', 'import app.utils.scraper'])
+    assert result.exit_code == 0, result.output
+    assert 'app.utils.scraper' in result.output
+    assert 'Loaded at startup: requests, bs4, lxml' in result.output
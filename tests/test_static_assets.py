@@ -0,0 +1,80 @@
+import gzip
+import os
+import posixpath
+import re
+
+import pytest
+
+from app import create_app, db
+from app.utils.static_assets import build, load_or_build
+from tests.conftest import TestConfig
+
+LAYUI = 'layui-v2.13.2/layui'
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    class _Config(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        STATIC_BUILD_DIR = str(tmp_path / 'static_build')
+
+    app = create_app(_Config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def _hashed_url(html, name):
+    return re.search(r'(/static/' + re.escape(name) + r'\.[0-9a-f]{12}\.' + r'(?:js|css))"', html).group(1)
+
+
+def test_pages_link_fingerprinted_assets(static_app):
+    client = static_app.test_client()
+    html = client.get('/auth/login').data.decode()
+    script = _hashed_url(html, f'{LAYUI}/layui')
+    original = open(os.path.join(static_app.static_folder, LAYUI, 'layui.js'), 'rb').read()
+
+    res = client.get(script, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert res.status_code == 200 and res.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in res.headers['Cache-Control'] and 'max-age=31536000' in res.headers['Cache-Control']
+    assert 'Accept-Encoding' in res.headers['Vary']
+    assert res.content_type.startswith(('application/javascript', 'text/javascript'))
+    assert gzip.decompress(res.data) == original and len(res.data) < len(original) / 2
+
+    res = client.get(script)
+    assert 'Content-Encoding' not in res.headers and res.data == original
+    assert client.get(script, headers={'If-None-Match': res.headers['ETag']}).status_code == 304
+
+    # Unhashed names are still served the usual way
+    res = client.get(f'/static/{LAYUI}/layui.js')
+    assert res.status_code == 200 and 'immutable' not in res.headers.get('Cache-Control', '')
+
+
+def test_stylesheet_fonts_are_fingerprinted(static_app):
+    client = static_app.test_client()
+    html = client.get('/auth/login').data.decode()
+    css = client.get(_hashed_url(html, f'{LAYUI}/css/layui')).data.decode()
+    font = re.search(r'url\((\.\./font/iconfont\.[0-9a-f]{12}\.woff2)\?v=293\)', css).group(1)
+    res = client.get(posixpath.normpath(f'/static/{LAYUI}/css/{font}'))
+    assert res.status_code == 200 and 'immutable' in res.headers['Cache-Control']
+    # Already compressed formats have no precompressed variant
+    assert 'Content-Encoding' not in res.headers
+
+
+def test_rebuilds_when_sources_change(tmp_path):
+    static, out = tmp_path / 'static', str(tmp_path / 'build')
+    (static / 'css').mkdir(parents=True)
+    (static / 'font.ttf').write_bytes(b'a' * 2000)
+    (static / 'css' / 'site.css').write_text('@font-face{src:url("../font.ttf#x")} a{background:url(data:x)}')
+    first = build(str(static), out)
+    assert first['encodings'][first['files']['font.ttf']] == ['gzip']
+    css = (tmp_path / 'build' / first['files']['css/site.css']).read_text()
+    assert f'url("../{first["files"]["font.ttf"]}#x")' in css and 'url(data:x)' in css
+
+    assert load_or_build(str(static), out) == first
+    (static / 'font.ttf').write_bytes(b'b' * 2000)
+    second = load_or_build(str(static), out)
+    assert second['files']['font.ttf'] != first['files']['font.ttf']
+    # The stylesheet's hash follows the font it points at
+    assert second['files']['css/site.css'] != first['files']['css/site.css']
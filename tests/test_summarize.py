@@ -0,0 +1,97 @@
+import json
+
+from app import db
+from app.models import AIEngine, OpinionData, OpinionDetail, SummaryChunk
+from app.utils.summarizer import MAP_PROMPT, estimate_tokens, split_chunks
+
+
+def _paragraph(i):
+    return f'第{i}段' + '新能源汽车销量持续增长' * 4 + '。'
+
+
+def _reply(payload):
+    system, text = payload['messages'][0]['content'], payload['messages'][-1]['content']
+    if '正文摘要' in text:
+        return '{"sentiment": "positive", "summary": "ok", "tags": []}'
+    if system == MAP_PROMPT:
+        return '要点' + text[:4]
+    return '总结(' + str(text.count('\n') + 1) + ')'
+
+
+def test_split_chunks_respects_budget_and_paragraphs():
+    text = '\n\n'.join(_paragraph(i) for i in range(6))
+    chunks = split_chunks(text, 100)
+    assert len(chunks) == 3
+    assert all(estimate_tokens(c) <= 100 for c in chunks)
+    assert chunks[0].startswith('第0段') and chunks[1].startswith('第2段')
+
+    huge = '很长的句子' * 100
+    pieces = split_chunks(huge, 60)
+    assert ''.join(pieces) == huge
+    assert all(estimate_tokens(p) <= 60 for p in pieces)
+
+
+def test_summarize_caches_chunks(app, db_client, chat_stub):
+    app.config['SUMMARY_CHUNK_TOKENS'] = 60
+    chat_stub.reply = _reply
+    chat_stub.delay = 0.05
+    db.session.add(AIEngine(provider='Stub', api_url=chat_stub.url, api_key='sk', model_name='m', is_active=True))
+    item = OpinionData(title='报道', content='摘要')
+    db.session.add(item)
+    db.session.flush()
+    paragraphs = [_paragraph(i) for i in range(6)]
+    db.session.add(OpinionDetail(opinion_id=item.id, content='\n'.join(paragraphs)))
+    db.session.commit()
+
+    body = db_client.post('/business/warehouse/summarize', json={'id': item.id}).get_json()
+    assert body['code'] == 0, body
+    result = body['data']['results'][0]
+    assert result['chunks'] == 6 and result['summary'] == '总结(6)'
+    assert len(chat_stub.requests) == 7
+    assert chat_stub.max_in_flight > 1
+
+    # Editing one paragraph re-runs its chunk and the reduce step only
+    paragraphs[2] = '第2段' + '充电桩建设明显提速' * 4 + '。'
+    OpinionDetail.query.filter_by(opinion_id=item.id).first().content = '\n'.join(paragraphs)
+    db.session.commit()
+    body = db_client.post('/business/warehouse/summarize', json={'id': item.id}).get_json()
+    assert body['data']['calls'] == 2 and body['data']['cached'] == 5
+    assert SummaryChunk.query.filter_by(stage='map').count() == 7
+
+    # Analysis sends the condensed body instead of a truncated one
+    body = db_client.post('/business/warehouse/analyze', json={'id': item.id}).get_json()
+    assert body['data']['results'][0]['summary'] == 'ok'
+
+
+def test_stream_reports_summarizing_and_skips_it_for_cached_items(app, db_client, chat_stub):
+    app.config['SUMMARY_CHUNK_TOKENS'] = 60
+    chat_stub.reply = _reply
+    db.session.add(AIEngine(provider='Stub', api_url=chat_stub.url, api_key='sk', model_name='m', is_active=True))
+    item = OpinionData(title='报道', content='摘要')
+    db.session.add(item)
+    db.session.flush()
+    db.session.add(OpinionDetail(opinion_id=item.id, content='\n'.join(_paragraph(i) for i in range(3))))
+    db.session.commit()
+
+    def events():
+        rv = db_client.post('/business/warehouse/analyze/stream', json={'id': item.id})
+        return [json.loads(line) for line in rv.get_data(as_text=True).splitlines() if line]
+
+    first = events()
+    assert [e['type'] for e in first[:2]] == ['summarizing', 'start']
+    assert first[-1]['type'] == 'result' and first[-1]['data']['summary'] == 'ok'
+    calls = len(chat_stub.requests)
+
+    # The cache is keyed by the raw body: no map-reduce before the cached answer
+    second = events()
+    assert [e['type'] for e in second] == ['result'] and second[0]['cached'] is True
+    assert len(chat_stub.requests) == calls
+
+
+def test_summarize_reports_failures(app, db_client, chat_stub):
+    chat_stub.status = 500
+    db.session.add(AIEngine(provider='Stub', api_url=chat_stub.url, api_key='sk', model_name='m', is_active=True))
+    db.session.add(OpinionData(title='t', content='一段正文'))
+    db.session.commit()
+    body = db_client.post('/business/warehouse/summarize', json={'id': 1}).get_json()
+    assert body['data']['results'] == [] and body['data']['errors'][0]['id'] == 1
@@ -0,0 +1,51 @@
+import time
+
+from app import create_app, db
+from app.models import BackgroundTask
+from app.utils import tasks
+
+
+def _job(ctx, n):
+    ctx.progress(n, n, '完成')
+    return {'n': n}
+
+
+def _failing_job(ctx):
+    raise ValueError('出错了')
+
+
+def _wait(task_id):
+    for _ in range(100):
+        task = tasks.get_task(task_id)
+        if task['status'] in ('success', 'failed'):
+            return task
+        time.sleep(0.05)
+    raise AssertionError('task did not finish')
+
+
+def test_tasks_are_visible_to_other_workers(app):
+    task_id = tasks.submit(app, 'demo', _job, 3)
+    task = _wait(task_id)
+    assert task['status'] == 'success' and task['result'] == {'n': 3}
+    assert task['progress'] == 3 and task['total'] == 3 and task['msg'] == '完成'
+
+    # A second app on the same database stands in for another gunicorn worker
+    other = create_app(type('OtherConfig', (), dict(app.config)))
+    with other.app_context():
+        assert tasks.get_task(task_id)['result'] == {'n': 3}
+        assert tasks.get_task('missing') is None
+        db.session.remove()
+
+    failed = _wait(tasks.submit(app, 'demo', _failing_job))
+    assert failed['status'] == 'failed' and failed['error'] == '出错了'
+
+
+def test_finished_tasks_are_pruned(app, monkeypatch):
+    monkeypatch.setattr(tasks, 'MAX_FINISHED_TASKS', 2)
+    ids = []
+    for i in range(4):
+        ids.append(tasks.submit(app, 'demo', _job, i))
+        _wait(ids[-1])
+    tasks.submit(app, 'demo', _job, 4)
+    remaining = {t.id for t in BackgroundTask.query}
+    assert ids[0] not in remaining and ids[-1] in remaining
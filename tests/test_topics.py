@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+
+from app import db
+from app.models import OpinionData, TopicCluster
+from app.utils.clustering import MiniBatchKMeans, hash_vectors
+
+CAR = '新能源汽车 电池 续航 充电桩'
+EXAM = '高考 招生 分数线 志愿填报'
+
+
+def _wait(client, task_id):
+    for _ in range(100):
+        task = client.get(f'/business/tasks/{task_id}').get_json()['data']
+        if task['status'] in ('success', 'failed'):
+            return task
+        time.sleep(0.05)
+    raise AssertionError('task did not finish')
+
+
+def test_minibatch_kmeans_separates_groups():
+    vectors = [{1: 1.0, 2: 0.5}] * 5 + [{7: 1.0, 9: 0.5}] * 5
+    X = hash_vectors(vectors, 64)
+    model = MiniBatchKMeans(2, 64, seed=1)
+    labels = model.partial_fit(X)
+    assert len(set(labels[:5])) == 1 and len(set(labels[5:])) == 1
+    assert labels[0] != labels[5]
+    assert np.allclose(model.counts.sum(), 10)
+
+
+def test_cluster_task_and_incremental_assignment(app, db_client):
+    items = [{'title': f'{CAR} {i}', 'keyword': '舆情', 'original_url': f'http://example.com/car{i}'}
+             for i in range(6)]
+    items += [{'title': f'{EXAM} {i}', 'keyword': '舆情', 'original_url': f'http://example.com/exam{i}'}
+              for i in range(6)]
+    db_client.post('/business/save_data', json={'items': items})
+
+    rv = db_client.post('/business/warehouse/topics/cluster', json={'keyword': '舆情', 'k': 2})
+    task = _wait(db_client, rv.get_json()['data']['task_id'])
+    assert task['status'] == 'success', task
+
+    db.session.expire_all()
+    topics = db_client.get('/business/warehouse/topics?keyword=舆情').get_json()
+    assert [t['size'] for t in topics['data']] == [6, 6]
+    labels = ' '.join(t['label'] for t in topics['data'])
+    assert '高考' in labels and '能源' in labels
+
+    # A new item joins the matching cluster without a refit
+    db_client.post('/business/save_data', json={'items': [
+        {'title': f'{CAR} 新车', 'keyword': '舆情', 'original_url': 'http://example.com/car-new'}]})
+    db.session.expire_all()
+    new_item = OpinionData.query.filter_by(original_url='http://example.com/car-new').one()
+    car_topic = OpinionData.query.filter_by(original_url='http://example.com/car0').one().topic_id
+    assert new_item.topic_id == car_topic
+    assert db.session.get(TopicCluster, car_topic).size == 7
+
+    rv = db_client.get(f'/business/warehouse/data?topic_id={car_topic}&limit=50')
+    assert rv.get_json()['count'] == 7
+
+    db_client.post('/business/warehouse/delete', json={'ids': [new_item.id]})
+    db.session.expire_all()
+    assert db.session.get(TopicCluster, car_topic).size == 6
+
+
+def test_cluster_without_data_fails(app, db_client):
+    rv = db_client.post('/business/warehouse/topics/cluster', json={'keyword': '无', 'k': 3})
+    assert _wait(db_client, rv.get_json()['data']['task_id'])['status'] == 'failed'
+
+
+def test_global_fit_leaves_keyword_models_alone(app, db_client):
+    def save(keyword, prefix):
+        items = [{'title': f'{text} {i}', 'keyword': keyword, 'original_url': f'http://example.com/{prefix}{text[:2]}{i}'}
+                 for text in (CAR, EXAM) for i in range(3)]
+        db_client.post('/business/save_data', json={'items': items})
+
+    def fit(keyword):
+        rv = db_client.post('/business/warehouse/topics/cluster', json={'keyword': keyword, 'k': 2})
+        assert _wait(db_client, rv.get_json()['data']['task_id'])['status'] == 'success'
+        db.session.expire_all()
+
+    def members(keyword):
+        topics = db_client.get('/business/warehouse/topics' + (f'?keyword={keyword}' if keyword else '')).get_json()
+        counts = [db_client.get(f"/business/warehouse/data?topic_id={t['id']}&limit=50").get_json()['count']
+                  for t in topics['data']]
+        return [t['size'] for t in topics['data']], counts
+
+    save('舆情', 'a')
+    save('其他', 'b')
+    fit('舆情')
+    fit(None)
+    # The global model only takes the items no keyword model claims
+    assert members('舆情') == ([3, 3], [3, 3])
+    assert members(None) == ([3, 3], [3, 3])
+
+    # A keyword fit takes its items over from the global model, whose sizes follow
+    fit('其他')
+    assert members('其他') == ([3, 3], [3, 3])
+    assert members(None) == ([0, 0], [0, 0])
+    assert members('舆情') == ([3, 3], [3, 3])
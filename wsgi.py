@@ -0,0 +1,33 @@
+"""
+Production entry point (run.py is the debug server for development).
+
+    gunicorn -c gunicorn.conf.py wsgi:app        # threaded workers, see gunicorn.conf.py
+    python wsgi.py [--host 0.0.0.0] [--port 8000] # one threaded process, without gunicorn
+
+Both drain open streams on SIGTERM, see app/utils/serving.py.
+"""
+import argparse
+import logging
+
+from app import create_app
+
+app = create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the app on a threaded server with graceful shutdown.')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--drain-seconds', type=int, default=None,
+                        help='how long open streams may run after SIGTERM (default: SHUTDOWN_DRAIN_SECONDS)')
+    args = parser.parse_args(argv)
+
+    from app.utils.serving import serve
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    app.logger.setLevel(logging.INFO)
+    serve(app, host=args.host, port=args.port, drain_seconds=args.drain_seconds)
+
+
+if __name__ == '__main__':
+    main()